@@ -0,0 +1,380 @@
+"""
+Benchmark the matcher stage by stage on a synthetic catalogue.
+
+Reports descriptions per second, p50/p95/p99 latency and peak Python memory for
+attribute extraction, candidate retrieval and scoring separately, and for the
+whole match. Runs against an in-memory stand-in for the database by default, or
+against a local Postgres with --postgres, where the synthetic catalogue is
+loaded into its own `bench` schema and the application tables are left alone.
+
+Usage:
+    python benchmarks/bench_matcher.py --vehicles 100000 --descriptions 5000
+    python benchmarks/bench_matcher.py --postgres --vehicles 10000 --json report.json
+    python benchmarks/bench_matcher.py --compare report.json   # exit 1 on regression
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+from synthetic_data import generate_catalogue, generate_descriptions, load_aliases  # noqa: E402
+from db_client import DatabaseClient  # noqa: E402
+from listing_counts import ListingCountStore, VIEW_NAME  # noqa: E402
+from vehicle import Vehicle  # noqa: E402
+from vehicle_catalogue import CATALOGUE_SQL, INDEXED_ATTRIBUTES, MATERIALISED_CATALOGUE_SQL  # noqa: E402
+from vehicle_matcher import VehicleMatcher  # noqa: E402
+
+BENCH_SCHEMA = "bench"
+
+BENCH_TABLES_SQL = f"""
+CREATE SCHEMA IF NOT EXISTS {BENCH_SCHEMA};
+DROP TABLE IF EXISTS {BENCH_SCHEMA}.listing, {BENCH_SCHEMA}.vehicle CASCADE;
+CREATE TABLE {BENCH_SCHEMA}.vehicle (
+  id TEXT NOT NULL PRIMARY KEY,
+  make TEXT NOT NULL,
+  model TEXT NOT NULL,
+  badge TEXT NOT NULL,
+  transmission_type TEXT NOT NULL,
+  fuel_type TEXT NOT NULL,
+  drive_type TEXT NOT NULL
+);
+CREATE TABLE {BENCH_SCHEMA}.listing (
+  id TEXT NOT NULL PRIMARY KEY,
+  vehicle_id TEXT NOT NULL REFERENCES {BENCH_SCHEMA}.vehicle(id),
+  url TEXT NOT NULL,
+  price INT NOT NULL,
+  kms INT NOT NULL
+);
+"""
+
+STAGES = ["attributes", "retrieval", "scoring", "match"]
+
+
+@dataclass
+class StageReport:
+    """
+    Throughput, latency and memory of one benchmarked stage.
+
+    Attributes:
+        stage (str): Name of the stage.
+        count (int): Number of descriptions the stage processed.
+        per_second (float): Descriptions processed per second.
+        p50_ms (float): Median latency in milliseconds.
+        p95_ms (float): 95th percentile latency in milliseconds.
+        p99_ms (float): 99th percentile latency in milliseconds.
+        peak_memory_kb (float): Peak Python memory allocated during the stage, in KiB.
+    """
+    stage: str
+    count: int
+    per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    peak_memory_kb: float = 0.0
+
+
+class InMemoryDatabaseClient:
+    """
+    Stand-in for DatabaseClient that serves a synthetic catalogue from memory.
+
+    Answers only the queries needed to build a VehicleMatcher with
+    `use_catalogue=True`: the distinct attribute values, the catalogue itself and
+    the freshness check of the materialised listing counts (reported missing).
+    """
+
+    def __init__(self, vehicles: List[Vehicle]):
+        self.vehicles = vehicles
+
+    def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+        if sql in (CATALOGUE_SQL, MATERIALISED_CATALOGUE_SQL):
+            return [asdict(vehicle) for vehicle in self.vehicles]
+        for attribute_type in INDEXED_ATTRIBUTES:
+            if sql.startswith(f"SELECT DISTINCT {attribute_type} FROM vehicle"):
+                values = dict.fromkeys(getattr(vehicle, attribute_type) for vehicle in self.vehicles)
+                return [{attribute_type: value} for value in values]
+        if VIEW_NAME in sql:
+            return [{"age": None}]
+        raise NotImplementedError(f"The in-memory database cannot answer: {sql.strip()}")
+
+    def close(self) -> None:
+        pass
+
+
+def load_postgres(vehicles: List[Vehicle], materialised_counts: bool) -> DatabaseClient:
+    """
+    Load the catalogue and its listings into the `bench` schema.
+
+    Args:
+        vehicles: The synthetic catalogue.
+        materialised_counts: Also create the materialised listing counts.
+
+    Returns:
+        DatabaseClient: A client whose connections resolve tables in the `bench` schema.
+    """
+    with DatabaseClient() as setup_client:
+        setup_client.query(BENCH_TABLES_SQL)
+        with setup_client.connection() as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(
+                    f"COPY {BENCH_SCHEMA}.vehicle (id, make, model, badge, transmission_type, "
+                    f"fuel_type, drive_type) FROM STDIN",
+                    _copy_buffer(
+                        (v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type)
+                        for v in vehicles
+                    ),
+                )
+                cur.copy_expert(
+                    f"COPY {BENCH_SCHEMA}.listing (id, vehicle_id, url, price, kms) FROM STDIN",
+                    _copy_buffer(
+                        (f"{v.id}-{n}", v.id, f"https://example.com/{v.id}/{n}", 20000 + n, 1000 * n)
+                        for v in vehicles for n in range(v.listing_count)
+                    ),
+                )
+                cur.execute(f"ANALYZE {BENCH_SCHEMA}.vehicle; ANALYZE {BENCH_SCHEMA}.listing")
+            conn.commit()
+        dsn = setup_client.dsn
+    db_client = DatabaseClient(dsn=f"{dsn} options='-c search_path={BENCH_SCHEMA}'")
+    ListingCountStore(db_client).migrate()
+    if not materialised_counts:
+        db_client.query(f"DROP MATERIALIZED VIEW {VIEW_NAME}")
+    return db_client
+
+
+def _copy_buffer(rows) -> io.StringIO:
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write("\t".join(str(value) for value in row))
+        buffer.write("\n")
+    buffer.seek(0)
+    return buffer
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+
+    Args:
+        sorted_values: Values in ascending order.
+        fraction: Percentile as a fraction, e.g. 0.95.
+
+    Returns:
+        float: The percentile, or 0.0 for no values.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def measure(stage: str, func: Callable[[Any], Any], items: Sequence[Any],
+            track_memory: bool = True) -> Tuple[StageReport, List[Any]]:
+    """
+    Time `func` on every item, then optionally measure its peak memory in a second pass.
+
+    Memory is measured separately because tracing allocations slows the timed pass.
+
+    Args:
+        stage: Name of the stage.
+        func: Function run once per item.
+        items: Inputs of the stage.
+        track_memory: Whether to measure peak memory.
+
+    Returns:
+        Tuple[StageReport, List[Any]]: The report and the outputs of the timed pass.
+    """
+    outputs = []
+    latencies = []
+    started = time.perf_counter()
+    for item in items:
+        item_started = time.perf_counter()
+        outputs.append(func(item))
+        latencies.append(time.perf_counter() - item_started)
+    total = time.perf_counter() - started
+    latencies.sort()
+    report = StageReport(
+        stage=stage,
+        count=len(items),
+        per_second=len(items) / total if total > 0 else 0.0,
+        p50_ms=percentile(latencies, 0.50) * 1000,
+        p95_ms=percentile(latencies, 0.95) * 1000,
+        p99_ms=percentile(latencies, 0.99) * 1000,
+    )
+    if track_memory:
+        tracemalloc.start()
+        for item in items:
+            func(item)
+        report.peak_memory_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+    return report, outputs
+
+
+def run_benchmark(matcher: VehicleMatcher, descriptions: List[str],
+                  track_memory: bool = True) -> List[StageReport]:
+    """
+    Benchmark each stage of matching the descriptions, feeding each stage the
+    outputs of the previous one.
+
+    Args:
+        matcher: The matcher to benchmark. Its result cache should be disabled.
+        descriptions: The descriptions to match.
+        track_memory: Whether to measure peak memory per stage.
+
+    Returns:
+        List[StageReport]: One report per stage, in STAGES order.
+    """
+    state = matcher._state
+    attributes_report, matched = measure(
+        "attributes", state.vehicle_attributes.find_matching_attributes, descriptions, track_memory
+    )
+    with_attributes = [(d, m) for d, m in zip(descriptions, matched) if m]
+    retrieval_report, candidates = measure(
+        "retrieval", lambda item: matcher._find_candidates(state, item[1]), with_attributes,
+        track_memory,
+    )
+    scoring_report, _ = measure(
+        "scoring", lambda item: matcher._select_best_vehicle(state, item[0][0], item[1], item[0][1]),
+        list(zip(with_attributes, candidates)), track_memory,
+    )
+    match_report, _ = measure(
+        "match", matcher.find_best_matching_vehicle, descriptions, track_memory
+    )
+    return [attributes_report, retrieval_report, scoring_report, match_report]
+
+
+def accuracy(matcher: VehicleMatcher, descriptions: List[str], vehicle_ids: List[str]) -> float:
+    """
+    Fraction of descriptions matched to the vehicle they were generated from.
+    """
+    results = matcher.match_descriptions(descriptions)
+    correct = sum(
+        1 for result, vehicle_id in zip(results, vehicle_ids)
+        if result.vehicle is not None and result.vehicle.id == vehicle_id
+    )
+    return correct / len(descriptions) if descriptions else 0.0
+
+
+def compare(reports: List[StageReport], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Find the stages whose throughput fell more than `tolerance` below the baseline.
+
+    Args:
+        reports: Reports of this run.
+        baseline: A report previously written with --json.
+        tolerance: Allowed fractional drop in descriptions per second.
+
+    Returns:
+        List[str]: A message for every regressed stage.
+    """
+    baseline_stages = {stage["stage"]: stage for stage in baseline["stages"]}
+    regressions = []
+    for report in reports:
+        previous = baseline_stages.get(report.stage)
+        if previous and report.per_second < previous["per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{report.stage}: {report.per_second:,.0f}/s vs {previous['per_second']:,.0f}/s baseline"
+            )
+    return regressions
+
+
+def print_reports(reports: List[StageReport]) -> None:
+    """Print the stage reports as a table."""
+    print(f"{'stage':<12}{'count':>8}{'desc/s':>12}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'peak KiB':>12}")
+    for r in reports:
+        print(f"{r.stage:<12}{r.count:>8}{r.per_second:>12,.0f}{r.p50_ms:>10.3f}{r.p95_ms:>10.3f}"
+              f"{r.p99_ms:>10.3f}{r.peak_memory_kb:>12,.0f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point.
+
+    Returns:
+        int: Exit status; 1 if --compare found a regression.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the vehicle matcher on synthetic data.")
+    parser.add_argument("--vehicles", type=int, default=10000,
+                        help="synthetic catalogue size (default: 10000)")
+    parser.add_argument("--descriptions", type=int, default=2000,
+                        help="number of descriptions to match (default: 2000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--listing-skew", type=float, default=1.2,
+                        help="Pareto shape of listing counts; lower is more skewed (default: 1.2)")
+    parser.add_argument("--aliases", default=str(ROOT / "vehicle_aliases.yaml"))
+    parser.add_argument("--postgres", action="store_true",
+                        help="load the catalogue into the local Postgres 'bench' schema")
+    parser.add_argument("--catalogue", action="store_true",
+                        help="with --postgres, retrieve candidates from the in-memory catalogue "
+                             "instead of querying per description")
+    parser.add_argument("--materialised-counts", action="store_true",
+                        help="with --postgres, read listing counts from the materialised view")
+    parser.add_argument("--no-memory", action="store_true", help="skip peak memory measurement")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="report written by an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed throughput drop against --compare (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    aliases = load_aliases(args.aliases)
+    vehicles = generate_catalogue(args.vehicles, seed=args.seed, listing_skew=args.listing_skew)
+    samples = list(generate_descriptions(vehicles, args.descriptions, aliases, seed=args.seed))
+    descriptions = [sample.description for sample in samples]
+
+    started = time.perf_counter()
+    if args.postgres:
+        db_client = load_postgres(vehicles, args.materialised_counts)
+        print(f"Loaded {len(vehicles):,} vehicles into Postgres schema '{BENCH_SCHEMA}' "
+              f"in {time.perf_counter() - started:.1f}s")
+    else:
+        db_client = InMemoryDatabaseClient(vehicles)
+
+    try:
+        tracemalloc.start()
+        started = time.perf_counter()
+        matcher = VehicleMatcher(db_client, yaml_file=args.aliases,
+                                 use_catalogue=args.catalogue or not args.postgres)
+        load_seconds = time.perf_counter() - started
+        load_peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+        print(f"Matcher loaded in {load_seconds:.2f}s, peak {load_peak_kb:,.0f} KiB "
+              f"({len(vehicles):,} vehicles, {len(matcher.vehicle_attributes.term_matcher):,} terms)")
+
+        reports = run_benchmark(matcher, descriptions, track_memory=not args.no_memory)
+        match_accuracy = accuracy(matcher, descriptions, [sample.vehicle_id for sample in samples])
+    finally:
+        db_client.close()
+
+    print_reports(reports)
+    print(f"Accuracy: {match_accuracy:.1%} of descriptions matched their source vehicle")
+
+    report = {
+        "vehicles": args.vehicles,
+        "descriptions": args.descriptions,
+        "seed": args.seed,
+        "postgres": args.postgres,
+        "load_seconds": load_seconds,
+        "load_peak_memory_kb": load_peak_kb,
+        "accuracy": match_accuracy,
+        "stages": [asdict(r) for r in reports],
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(reports, json.loads(Path(args.compare).read_text()), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
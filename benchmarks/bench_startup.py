@@ -0,0 +1,189 @@
+"""
+Benchmark how quickly the command line runner starts, against a time budget.
+
+Every measurement runs in a fresh interpreter, as the CLI does when it is called
+from a shell pipeline:
+
+- import: time to `import main`, measured inside the interpreter.
+- help: wall time of `src/main.py --help`, interpreter start-up included.
+- empty_input: wall time of matching an empty input, which should not load the
+  matcher at all.
+- first_result: wall time from starting `src/main.py - --format jsonl` until the
+  result of a single description is written. This needs the database.
+
+The median of `--repeat` runs of each is compared with the budget in the
+`[tool.autograb.startup_budget]` table of pyproject.toml (in milliseconds), and the
+benchmark exits 1 if any is over.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --json startup.json
+    python benchmarks/bench_startup.py --no-database   # skip first_result
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN = ROOT / "src" / "main.py"
+
+# Used when pyproject.toml has no budget table, or cannot be read
+DEFAULT_BUDGET_MS = {
+    "import": 100.0,
+    "help": 200.0,
+    "empty_input": 200.0,
+    "first_result": 1500.0,
+}
+
+IMPORT_SCRIPT = (
+    "import time; started = time.perf_counter(); import main; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def load_budget(pyproject: Path) -> Dict[str, float]:
+    """
+    Read the startup budget from pyproject.toml.
+
+    Args:
+        pyproject: Path to pyproject.toml.
+
+    Returns:
+        Dict[str, float]: Milliseconds allowed per measurement. Measurements missing
+        from the table keep their DEFAULT_BUDGET_MS.
+    """
+    budget = dict(DEFAULT_BUDGET_MS)
+    if tomllib is None or not pyproject.exists():
+        return budget
+    with open(pyproject, "rb") as file:
+        table = tomllib.load(file).get("tool", {}).get("autograb", {}).get("startup_budget", {})
+    budget.update({name.removesuffix("_ms"): float(ms) for name, ms in table.items()})
+    return budget
+
+
+def _run(args: List[str], stdin: str = "") -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], input=stdin, capture_output=True, text=True,
+                          cwd=ROOT, env={**os.environ, "PYTHONPATH": str(ROOT / "src")}, check=True)
+
+
+def measure_import() -> float:
+    """Milliseconds taken by `import main` in a fresh interpreter."""
+    return float(_run(["-c", IMPORT_SCRIPT]).stdout)
+
+
+def measure_help() -> float:
+    """Wall milliseconds of `main.py --help`."""
+    started = time.perf_counter()
+    _run([str(MAIN), "--help"])
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_empty_input() -> float:
+    """Wall milliseconds of matching an empty input read from stdin."""
+    started = time.perf_counter()
+    _run([str(MAIN), "-", "--format", "jsonl"])
+    return (time.perf_counter() - started) * 1000
+
+
+def measure_first_result(description: str = "Toyota Camry Hybrid") -> float:
+    """
+    Wall milliseconds from starting the CLI until the result of one description is
+    written.
+
+    Raises:
+        RuntimeError: If the CLI writes no result, e.g. without a database.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(MAIN), "-", "--format", "jsonl"], cwd=ROOT, text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    process.stdin.write(description + "\n")
+    process.stdin.close()
+    line = process.stdout.readline()
+    elapsed = (time.perf_counter() - started) * 1000
+    process.stdout.read()
+    stderr = process.stderr.read()
+    process.wait()
+    if not line:
+        raise RuntimeError(f"No result was written: {stderr.strip()}")
+    return elapsed
+
+
+def run_benchmark(measurements: Dict[str, Callable[[], float]], repeat: int) -> Dict[str, float]:
+    """
+    Run each measurement `repeat` times.
+
+    Args:
+        measurements: Functions returning milliseconds, by name.
+        repeat: Number of runs of each.
+
+    Returns:
+        Dict[str, float]: Median milliseconds of each measurement.
+    """
+    return {name: statistics.median(measure() for _ in range(repeat))
+            for name, measure in measurements.items()}
+
+
+def over_budget(results: Dict[str, float], budget: Dict[str, float]) -> List[str]:
+    """
+    Describe every measurement that took longer than its budget.
+
+    Returns:
+        List[str]: One line per measurement over budget.
+    """
+    return [f"{name}: {ms:.1f}ms, budget {budget[name]:.0f}ms"
+            for name, ms in results.items() if name in budget and ms > budget[name]]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Command line entry point.
+
+    Returns:
+        int: 0 if every measurement is within budget, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark CLI start-up against a time budget.")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (default: 5)")
+    parser.add_argument("--no-database", action="store_true",
+                        help="skip the first_result measurement, which needs the database")
+    parser.add_argument("--pyproject", type=Path, default=ROOT / "pyproject.toml",
+                        help="file holding the [tool.autograb.startup_budget] table")
+    parser.add_argument("--json", help="write the results and budget to this file")
+    args = parser.parse_args(argv)
+
+    measurements: Dict[str, Callable[[], float]] = {
+        "import": measure_import,
+        "help": measure_help,
+        "empty_input": measure_empty_input,
+    }
+    if not args.no_database:
+        measurements["first_result"] = measure_first_result
+    budget = load_budget(args.pyproject)
+    results = run_benchmark(measurements, args.repeat)
+
+    print(f"{'measurement':<14}{'median ms':>12}{'budget ms':>12}")
+    for name, ms in results.items():
+        print(f"{name:<14}{ms:>12.1f}{budget.get(name, float('nan')):>12.0f}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"results_ms": results, "budget_ms": budget}, indent=2))
+    failures = over_budget(results, budget)
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Synthetic vehicle catalogues and noisy descriptions for benchmarking the matcher.
+
+Catalogues follow the shape of `data.sql` at any size: a few dozen makes, each
+with generated model names, badges and drivetrain variants, and listing counts
+drawn from a heavy-tailed distribution so a few vehicles carry most listings.
+Descriptions are written the way sellers write them: aliases instead of
+canonical names, typos, attributes left out, shuffled word order and noise words.
+"""
+
+import random
+import string
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+import yaml
+from vehicle import Vehicle
+
+MAKES = [
+    "Toyota", "Volkswagen", "Ford", "Holden", "Mazda", "Hyundai", "Kia", "Nissan",
+    "Mitsubishi", "Subaru", "Honda", "Suzuki", "Isuzu", "Audi", "BMW", "Mercedes-Benz",
+    "Volvo", "Peugeot", "Renault", "Skoda", "Jeep", "Lexus", "Porsche", "Tesla",
+    "Land Rover", "Jaguar", "Mini", "Fiat", "Alfa Romeo", "Citroen",
+]
+
+BADGES = [
+    "GL", "GLX", "GLS", "GT", "GTS", "GTI", "SE", "SL", "SX", "LX", "ST", "RS",
+    "Sport", "Ascent", "Ascent Sport", "Limited", "Premium", "Elite", "Titanium",
+    "Trend", "Highline", "Comfortline", "Trendline", "Active", "Touring", "Platinum",
+]
+
+TRANSMISSION_TYPES = ["Automatic", "Manual"]
+FUEL_TYPES = ["Petrol", "Diesel", "Hybrid-Petrol", "Electric"]
+DRIVE_TYPES = ["Front Wheel Drive", "Rear Wheel Drive", "Four Wheel Drive", "All Wheel Drive"]
+
+NOISE_WORDS = [
+    "2019", "2021", "low kms", "one owner", "full service history", "rego", "must sell",
+    "immaculate", "sedan", "hatch", "wagon", "ute", "white", "black", "silver", "$23,990",
+]
+
+_CONSONANTS = "bcdfgklmnprstvz"
+_VOWELS = "aeiou"
+
+
+@dataclass
+class SyntheticDescription:
+    """
+    A generated description together with the vehicle it was written from.
+
+    Attributes:
+        description (str): The noisy description.
+        vehicle_id (str): Id of the vehicle the description was generated from.
+    """
+    description: str
+    vehicle_id: str
+
+
+def load_aliases(yaml_file: str) -> Dict[str, List[str]]:
+    """
+    Read the aliases of every attribute value from an aliases YAML file.
+
+    Args:
+        yaml_file: Path to a file in the format of `vehicle_aliases.yaml`.
+
+    Returns:
+        Dict[str, List[str]]: Aliases keyed by canonical attribute value.
+    """
+    with open(yaml_file, "r") as file:
+        yaml_data = yaml.safe_load(file) or {}
+    return {
+        attribute["name"]: list(attribute.get("aliases", []))
+        for attributes in yaml_data.values()
+        for attribute in attributes
+    }
+
+
+def generate_catalogue(vehicle_count: int, seed: int = 0, listing_skew: float = 1.2,
+                       max_listings: int = 5000) -> List[Vehicle]:
+    """
+    Generate a catalogue of distinct vehicles with skewed listing counts.
+
+    Args:
+        vehicle_count: Number of vehicles to generate.
+        seed: Seed for the random generator; equal seeds give equal catalogues.
+        listing_skew: Pareto shape of the listing count distribution. Lower values
+            concentrate more listings on fewer vehicles.
+        max_listings: Upper bound on the listings of a single vehicle.
+
+    Returns:
+        List[Vehicle]: The generated vehicles, with unique ids and listing counts.
+    """
+    rng = random.Random(seed)
+    # Roughly 8 variants per badge and 4 badges per model, as in data.sql
+    model_count = max(1, vehicle_count // 32)
+    model_names = _unique_words(rng, model_count)
+    vehicles: List[Vehicle] = []
+    seen = set()
+    while len(vehicles) < vehicle_count:
+        model_index = rng.randrange(model_count)
+        attributes = (
+            MAKES[model_index % len(MAKES)],
+            model_names[model_index],
+            rng.choice(BADGES),
+            rng.choice(TRANSMISSION_TYPES),
+            rng.choice(FUEL_TYPES),
+            rng.choice(DRIVE_TYPES),
+        )
+        if attributes in seen:
+            continue
+        seen.add(attributes)
+        listing_count = min(int(rng.paretovariate(listing_skew)) - 1, max_listings)
+        vehicles.append(Vehicle(str(1_000_000 + len(vehicles)), *attributes, listing_count))
+    return vehicles
+
+
+def generate_descriptions(vehicles: List[Vehicle], count: int,
+                          aliases: Optional[Dict[str, List[str]]] = None, seed: int = 0,
+                          alias_rate: float = 0.4, typo_rate: float = 0.05,
+                          drop_rate: float = 0.25, noise_rate: float = 0.3) -> Iterator[SyntheticDescription]:
+    """
+    Generate noisy descriptions of vehicles drawn in proportion to their listings.
+
+    Args:
+        vehicles: Catalogue to describe.
+        count: Number of descriptions to generate.
+        aliases: Aliases keyed by canonical value, used in place of the value.
+        seed: Seed for the random generator.
+        alias_rate: Probability of writing an aliased value as one of its aliases.
+        typo_rate: Probability of a typo in each word.
+        drop_rate: Probability of leaving out each attribute other than the model.
+        noise_rate: Probability of adding a noise word such as a year or colour.
+
+    Yields:
+        SyntheticDescription: Each description and the vehicle it describes.
+    """
+    rng = random.Random(seed)
+    aliases = aliases or {}
+    weights = [vehicle.listing_count + 1 for vehicle in vehicles]
+    for vehicle in rng.choices(vehicles, weights=weights, k=count):
+        words = []
+        for attribute in ("make", "model", "badge", "transmission_type", "fuel_type", "drive_type"):
+            value = getattr(vehicle, attribute)
+            if attribute != "model" and rng.random() < drop_rate:
+                continue
+            if value in aliases and aliases[value] and rng.random() < alias_rate:
+                value = rng.choice(aliases[value])
+            words.append(value)
+        if rng.random() < noise_rate:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(NOISE_WORDS))
+        if rng.random() < 0.2:
+            rng.shuffle(words)
+        words = [_typo(rng, word) if rng.random() < typo_rate else word for word in words]
+        description = " ".join(words)
+        if rng.random() < 0.3:
+            description = description.lower()
+        yield SyntheticDescription(description, vehicle.id)
+
+
+def _unique_words(rng: random.Random, count: int) -> List[str]:
+    words = []
+    seen = set()
+    while len(words) < count:
+        syllables = rng.randint(2, 3)
+        word = "".join(rng.choice(_CONSONANTS) + rng.choice(_VOWELS) for _ in range(syllables))
+        if rng.random() < 0.2:
+            word += str(rng.randint(1, 9))
+        if word not in seen:
+            seen.add(word)
+            words.append(word.capitalize())
+    return words
+
+
+def _typo(rng: random.Random, word: str) -> str:
+    if len(word) < 3:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.randrange(4)
+    if kind == 0:
+        return word[:i] + word[i + 1:]
+    if kind == 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == 2:
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    return word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
@@ -0,0 +1,19 @@
+-- Index listings by vehicle and materialise the per-vehicle listing count used to
+-- break ties between equally good matches.
+--
+-- Refresh with: python src/listing_counts.py refresh
+-- (or: REFRESH MATERIALIZED VIEW CONCURRENTLY vehicle_listing_count;)
+
+CREATE INDEX IF NOT EXISTS listing_vehicle_id_idx ON listing (vehicle_id);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS vehicle_listing_count AS
+SELECT v.id AS vehicle_id,
+       COUNT(l.id) AS listing_count,
+       now() AS refreshed_at
+FROM vehicle v
+LEFT JOIN listing l ON v.id = l.vehicle_id
+GROUP BY v.id;
+
+-- Required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS vehicle_listing_count_vehicle_id_idx
+    ON vehicle_listing_count (vehicle_id);
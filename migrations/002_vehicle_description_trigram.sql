@@ -0,0 +1,19 @@
+-- Store each vehicle's description and index it by trigrams, so candidates can be
+-- ranked by similarity to a description inside the database.
+--
+-- Apply with: python src/trigram_index.py migrate
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- The same text as Vehicle.get_description: the non-empty attributes, lowercased
+ALTER TABLE vehicle ADD COLUMN IF NOT EXISTS description TEXT GENERATED ALWAYS AS (
+    lower(btrim(regexp_replace(
+        make || ' ' || model || ' ' || badge || ' ' || transmission_type || ' ' ||
+        fuel_type || ' ' || drive_type,
+        ' {2,}', ' ', 'g'
+    )))
+) STORED;
+
+-- GiST rather than GIN, as only GiST can return rows in order of trigram distance
+CREATE INDEX IF NOT EXISTS vehicle_description_trgm_idx
+    ON vehicle USING gist (description gist_trgm_ops);
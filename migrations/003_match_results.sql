@@ -0,0 +1,32 @@
+-- Staging and results tables for writing match results back in bulk.
+--
+-- Results are copied into match_result_staging in batches, then merged into
+-- match_result (or listing.vehicle_id) with one statement per run.
+--
+-- Apply with: python src/result_store.py migrate
+
+CREATE TABLE IF NOT EXISTS match_result_staging (
+  id BIGSERIAL PRIMARY KEY,
+  run_id TEXT NOT NULL,
+  input_key TEXT NOT NULL,
+  description TEXT NOT NULL,
+  vehicle_id TEXT,
+  confidence INT NOT NULL,
+  candidate_count INT NOT NULL,
+  matched_attributes JSONB NOT NULL
+);
+
+-- Finds the rows of a run, and the inputs it has already staged when it resumes
+CREATE INDEX IF NOT EXISTS match_result_staging_run_idx
+    ON match_result_staging (run_id, input_key);
+
+CREATE TABLE IF NOT EXISTS match_result (
+  input_key TEXT NOT NULL PRIMARY KEY,
+  description TEXT NOT NULL,
+  vehicle_id TEXT,
+  confidence INT NOT NULL,
+  candidate_count INT NOT NULL,
+  matched_attributes JSONB NOT NULL,
+  run_id TEXT NOT NULL,
+  matched_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
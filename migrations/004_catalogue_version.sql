@@ -0,0 +1,34 @@
+-- A version number bumped by every statement that changes `vehicle`, so checking
+-- whether a snapshot of the catalogue is current reads one row instead of hashing the
+-- table. Writes to `listing` are left alone: listing counts are versioned by the
+-- refresh time of the `vehicle_listing_count` materialised view instead.
+--
+-- Apply with: python src/catalogue_changes.py migrate
+
+CREATE TABLE IF NOT EXISTS catalogue_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    -- New whenever the table is recreated, so versions from before can never match
+    epoch UUID NOT NULL DEFAULT gen_random_uuid(),
+    version BIGINT NOT NULL DEFAULT 0,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO catalogue_version DEFAULT VALUES ON CONFLICT DO NOTHING;
+
+-- Runs in the writing transaction, so the new version becomes visible together with
+-- the rows it covers. Concurrent writers of `vehicle` queue on the single row until
+-- they commit; vehicles change rarely, unlike listings.
+CREATE OR REPLACE FUNCTION bump_catalogue_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalogue_version SET version = version + 1, changed_at = now();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Per statement rather than per row, so a bulk load bumps the version once
+CREATE OR REPLACE TRIGGER vehicle_catalogue_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON vehicle
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_catalogue_version();
+
+-- Installed by an earlier version of this migration
+DROP TRIGGER IF EXISTS listing_catalogue_version ON listing;
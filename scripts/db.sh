@@ -59,6 +59,11 @@ case "$1" in
         $DOCKER_COMPOSE exec postgres psql -U autograb_user -d autograb -f /docker-entrypoint-initdb.d/01-init.sql
         echo "Database seeded successfully!"
         ;;
+    "refresh-counts")
+        echo "Refreshing materialised vehicle listing counts..."
+        $DOCKER_COMPOSE exec postgres psql -U autograb_user -d autograb -c "REFRESH MATERIALIZED VIEW CONCURRENTLY vehicle_listing_count"
+        echo "Listing counts refreshed!"
+        ;;
     "seed-fresh")
         echo "Resetting and seeding database with fresh data..."
         $DOCKER_COMPOSE down -v
@@ -72,7 +77,7 @@ case "$1" in
         $DOCKER_COMPOSE ps
         ;;
     *)
-        echo "Usage: $0 {start|stop|restart|reset|logs|connect|seed|seed-fresh|status}"
+        echo "Usage: $0 {start|stop|restart|reset|logs|connect|seed|refresh-counts|seed-fresh|status}"
         echo ""
         echo "Commands:"
         echo "  start      - Start the database"
@@ -82,6 +87,7 @@ case "$1" in
         echo "  logs       - Show database logs"
         echo "  connect    - Connect to database with psql"
         echo "  seed       - Seed database with sample data"
+        echo "  refresh-counts - Refresh the materialised vehicle listing counts"
         echo "  seed-fresh - Reset and seed database with fresh data"
         echo "  status     - Show database status"
         exit 1
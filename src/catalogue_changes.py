@@ -0,0 +1,284 @@
+"""
+Detection of changes to the alias file and the `vehicle` table since they were last loaded.
+
+Usage:
+    python src/catalogue_changes.py migrate   # create the catalogue version table and triggers
+    python src/catalogue_changes.py status    # show the current catalogue version
+"""
+
+import argparse
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Collection, Dict, List, Optional, Set, Tuple
+import psycopg2
+from db_client import DatabaseClient
+from listing_counts import VIEW_NAME
+from vehicle import Vehicle
+
+# One hash per vehicle row, optionally of some makes only, so changed rows can be found
+# without fetching the table
+ROW_HASHES_SQL = (
+    "SELECT v.id, hashtextextended(v::text, 0) AS row_hash FROM vehicle v "
+    "WHERE %s::text[] IS NULL OR v.make = ANY(%s)"
+)
+
+# The same, with each vehicle's materialised listing count. Live counts are not
+# tracked, as counting every listing on every check would cost more than a reload.
+MATERIALISED_ROW_HASHES_SQL = """
+SELECT v.id, hashtextextended(v::text, 0) AS row_hash, COALESCE(vlc.listing_count, 0) AS listing_count
+FROM vehicle v
+LEFT JOIN vehicle_listing_count vlc ON v.id = vlc.vehicle_id
+WHERE %s::text[] IS NULL OR v.make = ANY(%s)
+"""
+
+CHANGED_VEHICLES_SQL = """
+SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       COUNT(l.id) as listing_count
+FROM vehicle v
+LEFT JOIN listing l ON v.id = l.vehicle_id
+WHERE v.id = ANY(%s)
+GROUP BY v.id
+ORDER BY v.id
+"""
+
+MATERIALISED_CHANGED_VEHICLES_SQL = """
+SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       COALESCE(vlc.listing_count, 0) as listing_count
+FROM vehicle v
+LEFT JOIN vehicle_listing_count vlc ON v.id = vlc.vehicle_id
+WHERE v.id = ANY(%s)
+ORDER BY v.id
+"""
+
+MIGRATION_FILE = Path(__file__).resolve().parent.parent / "migrations" / "004_catalogue_version.sql"
+
+# Kept up to date by triggers on `vehicle`
+VERSION_MARKER_SQL = "SELECT epoch, version, changed_at FROM catalogue_version"
+
+# Changes whenever a vehicle row changes. Used when the version table has not been
+# migrated, at the cost of reading the table.
+CATALOGUE_VERSION_SQL = """
+SELECT COUNT(*) AS vehicles, COALESCE(SUM(hashtextextended(v::text, 0)), 0) AS vehicle_hash
+FROM vehicle v
+"""
+
+# Every row of the materialised listing counts carries the time of the refresh
+COUNTS_REFRESHED_SQL = f"SELECT refreshed_at FROM {VIEW_NAME} LIMIT 1"
+
+
+def catalogue_version(db_client: DatabaseClient) -> str:
+    """
+    Version the `vehicle` table and the materialised listing counts.
+
+    Vehicles are versioned by the single row of the `catalogue_version` table if it
+    has been migrated, and otherwise by fingerprinting the table, which scans it. The
+    two kinds of version never compare equal. Listing counts are versioned by the
+    refresh time of the `vehicle_listing_count` materialised view, so writes to
+    `listing` alone do not change the version: counts drift until the view is
+    refreshed or a vehicle changes.
+
+    Args:
+        db_client: Client used to query the database.
+
+    Returns:
+        str: A version that changes whenever a vehicle is added, modified or removed,
+        or the listing counts are refreshed.
+    """
+    try:
+        rows = db_client.query(VERSION_MARKER_SQL)
+    except psycopg2.Error:
+        rows = []
+    if rows:
+        vehicles = f"{rows[0]['epoch']}:{rows[0]['version']}"
+    else:
+        row = db_client.query(CATALOGUE_VERSION_SQL)[0]
+        vehicles = f"{row['vehicles']}:{row['vehicle_hash']}"
+    try:
+        rows = db_client.query(COUNTS_REFRESHED_SQL)
+    except psycopg2.Error:
+        rows = []
+    counts = rows[0]['refreshed_at'].isoformat() if rows else "live"
+    return f"{vehicles}:{counts}"
+
+
+def migrate(db_client: DatabaseClient) -> None:
+    """
+    Create the `catalogue_version` table and the triggers that keep it current, if
+    missing.
+
+    Args:
+        db_client: Client used to run the migration.
+    """
+    db_client.query(MIGRATION_FILE.read_text())
+
+
+@dataclass
+class CatalogueChanges:
+    """
+    What changed since the last accepted snapshot.
+
+    Attributes:
+        aliases_changed (bool): Whether the alias file was modified.
+        upserted (List[Vehicle]): Added and modified vehicles, as now stored.
+        removed_ids (List[str]): Ids of deleted vehicles.
+        recounted (List[Vehicle]): Otherwise unchanged vehicles whose listing count
+            changed, as now stored.
+    """
+    aliases_changed: bool = False
+    upserted: List[Vehicle] = field(default_factory=list)
+    removed_ids: List[str] = field(default_factory=list)
+    recounted: List[Vehicle] = field(default_factory=list)
+    _version: Optional[str] = None
+    _yaml_mtime: Optional[int] = None
+    _row_hashes: Dict[str, int] = field(default_factory=dict, repr=False)
+    _listing_counts: Dict[str, int] = field(default_factory=dict, repr=False)
+
+    @property
+    def catalogue_changed(self) -> bool:
+        """Whether any vehicle was added, modified or removed."""
+        return bool(self.upserted or self.removed_ids)
+
+    @property
+    def stale_ids(self) -> Set[str]:
+        """Ids of the vehicles whose previously loaded rows or counts are no longer current."""
+        return {vehicle.id for vehicle in self.upserted + self.recounted} | set(self.removed_ids)
+
+    def __bool__(self) -> bool:
+        return self.aliases_changed or self.catalogue_changed or bool(self.recounted)
+
+
+class ChangeTracker:
+    """
+    Remembers the catalogue version, the alias file's modification time, a hash of
+    every vehicle row and, if they are materialised, every vehicle's listing count,
+    and reports what changed since.
+
+    Rows are only hashed again once `catalogue_version` has moved on, so checking an
+    unchanged catalogue reads a single row.
+    """
+
+    def __init__(self, db_client: DatabaseClient, yaml_file: Optional[str] = None,
+                 makes: Optional[Collection[str]] = None, materialised_counts: bool = False):
+        """
+        Initialize the ChangeTracker and record the current state as its baseline.
+
+        Args:
+            db_client: Client used to hash and fetch vehicle rows.
+            yaml_file: Optional path to the YAML file of attribute aliases.
+            makes: If given, track only the vehicles of these makes. A vehicle whose
+                make changes to one outside them is reported as removed.
+            materialised_counts: Track the listing counts of the
+                `vehicle_listing_count` materialised view. Live counts are not tracked.
+        """
+        self.db_client = db_client
+        self.yaml_file = yaml_file
+        self.makes: Optional[List[str]] = sorted(makes) if makes is not None else None
+        # Read before the rows, so a change made in between is looked for again
+        self._version = catalogue_version(db_client)
+        self._yaml_mtime = self._current_yaml_mtime()
+        self._row_hashes, self._listing_counts = self._current_rows(materialised_counts)
+
+    def detect(self, materialised_counts: bool = False) -> CatalogueChanges:
+        """
+        Compare the alias file, vehicle rows and listing counts with the baseline.
+
+        The baseline is left unchanged until the changes are passed to `accept`.
+        Vehicle rows are compared only if the catalogue version has changed.
+
+        Args:
+            materialised_counts: Compare the listing counts of the
+                `vehicle_listing_count` materialised view. Live counts are not compared.
+
+        Returns:
+            CatalogueChanges: The differences, falsy if there are none.
+        """
+        version = catalogue_version(self.db_client)
+        yaml_mtime = self._current_yaml_mtime()
+        if version == self._version:
+            return CatalogueChanges(
+                aliases_changed=yaml_mtime != self._yaml_mtime,
+                _version=version,
+                _yaml_mtime=yaml_mtime,
+                _row_hashes=self._row_hashes,
+                _listing_counts=self._listing_counts,
+            )
+        row_hashes, listing_counts = self._current_rows(materialised_counts)
+        changed_ids = {vehicle_id for vehicle_id, row_hash in row_hashes.items()
+                       if self._row_hashes.get(vehicle_id) != row_hash}
+        recounted_ids = {vehicle_id for vehicle_id, listing_count in listing_counts.items()
+                         if vehicle_id not in changed_ids
+                         and self._listing_counts.get(vehicle_id) != listing_count}
+        removed_ids = [vehicle_id for vehicle_id in self._row_hashes if vehicle_id not in row_hashes]
+        vehicles: List[Vehicle] = []
+        if changed_ids or recounted_ids:
+            rows = self.db_client.query(
+                MATERIALISED_CHANGED_VEHICLES_SQL if materialised_counts else CHANGED_VEHICLES_SQL,
+                (sorted(changed_ids | recounted_ids),),
+            )
+            vehicles = [Vehicle.from_db_row(row) for row in rows]
+        return CatalogueChanges(
+            aliases_changed=yaml_mtime != self._yaml_mtime,
+            upserted=[vehicle for vehicle in vehicles if vehicle.id in changed_ids],
+            removed_ids=removed_ids,
+            recounted=[vehicle for vehicle in vehicles if vehicle.id in recounted_ids],
+            _version=version,
+            _yaml_mtime=yaml_mtime,
+            _row_hashes=row_hashes,
+            _listing_counts=listing_counts,
+        )
+
+    def accept(self, changes: CatalogueChanges) -> None:
+        """
+        Make the state the changes were detected against the new baseline.
+
+        Args:
+            changes: Changes returned by `detect` and since applied.
+        """
+        self._version = changes._version
+        self._yaml_mtime = changes._yaml_mtime
+        self._row_hashes = changes._row_hashes
+        self._listing_counts = changes._listing_counts
+
+    def _current_yaml_mtime(self) -> Optional[int]:
+        if not self.yaml_file:
+            return None
+        try:
+            return os.stat(self.yaml_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _current_rows(self, materialised_counts: bool) -> Tuple[Dict[str, int], Dict[str, int]]:
+        if not materialised_counts:
+            rows = self.db_client.query(ROW_HASHES_SQL, (self.makes, self.makes))
+            return {row['id']: row['row_hash'] for row in rows}, {}
+        rows = self.db_client.query(MATERIALISED_ROW_HASHES_SQL, (self.makes, self.makes))
+        return ({row['id']: row['row_hash'] for row in rows},
+                {row['id']: row['listing_count'] for row in rows})
+
+
+def main() -> None:
+    """
+    Command line entry point for managing the catalogue version table.
+    """
+    parser = argparse.ArgumentParser(description="Manage the catalogue version table.")
+    parser.add_argument("command", choices=["migrate", "status"])
+    args = parser.parse_args()
+
+    with DatabaseClient() as db_client:
+        if args.command == "migrate":
+            migrate(db_client)
+            print("Created catalogue_version and its triggers (if missing)")
+        try:
+            rows = db_client.query(VERSION_MARKER_SQL)
+        except psycopg2.Error:
+            rows = []
+        if rows:
+            print(f"catalogue version {rows[0]['version']} (epoch {rows[0]['epoch']}), "
+                  f"changed at {rows[0]['changed_at']}")
+        else:
+            print("catalogue_version is missing; versions are computed by scanning the tables")
+
+
+if __name__ == "__main__":
+    main()
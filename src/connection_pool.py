@@ -0,0 +1,225 @@
+"""
+Thread-safe pool of reusable psycopg2 connections.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Iterator, Tuple
+import psycopg2
+
+
+class ConnectionPoolError(Exception):
+    """Raised when a connection cannot be checked out of the pool."""
+
+
+@dataclass
+class PoolStats:
+    """
+    Counters describing how a ConnectionPool has been used.
+
+    Attributes:
+        checkouts (int): Number of connections handed out.
+        waits (int): Number of checkouts that had to wait for a connection to be returned.
+        reconnects (int): Number of connections found broken, either by the checkout
+            health check or because they were closed when returned. Each one is
+            replaced by a new connection on a later checkout.
+        opened (int): Number of connections opened.
+        closed (int): Number of connections closed, including idle evictions.
+    """
+    checkouts: int = 0
+    waits: int = 0
+    reconnects: int = 0
+    opened: int = 0
+    closed: int = 0
+
+
+class ConnectionPool:
+    """
+    Bounded pool of psycopg2 connections that is safe to share across threads.
+
+    Connections are opened on demand up to `max_size`, reused most-recently-returned
+    first, and closed once they have been idle for longer than `idle_timeout` while
+    more than `min_size` connections are open.
+    """
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10,
+                 idle_timeout: float = 300.0, checkout_timeout: float = 30.0,
+                 health_check_interval: float = 5.0):
+        """
+        Initialize the ConnectionPool.
+
+        Args:
+            dsn: The PostgreSQL DSN string.
+            min_size: Number of connections kept open even when idle.
+            max_size: Maximum number of connections open at once.
+            idle_timeout: Seconds a connection may sit idle before it is closed.
+            checkout_timeout: Seconds to wait for a free connection before giving up.
+            health_check_interval: Connections idle for longer than this many seconds
+                are checked with `SELECT 1` on checkout. Use 0 to check every checkout.
+
+        Raises:
+            ValueError: If the pool sizes are inconsistent.
+        """
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(
+                f"Invalid pool sizes: min_size={min_size}, max_size={max_size}"
+            )
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._idle: Deque[Tuple[Any, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._stats = PoolStats()
+        self._condition = threading.Condition()
+
+    @property
+    def stats(self) -> PoolStats:
+        """Return a snapshot of the pool counters."""
+        with self._condition:
+            return replace(self._stats)
+
+    @property
+    def size(self) -> int:
+        """Return the number of connections currently open (idle or checked out)."""
+        with self._condition:
+            return self._size
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        """
+        Check out a connection for the duration of the `with` block.
+
+        Any open transaction is rolled back when the connection is returned, and
+        connections found closed are discarded rather than reused.
+
+        Yields:
+            A live psycopg2 connection.
+
+        Raises:
+            ConnectionPoolError: If the pool is closed or no connection became free
+                within `checkout_timeout`.
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        with self._condition:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._stats.closed += len(idle)
+            self._condition.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def _checkout(self) -> Any:
+        deadline = time.monotonic() + self.checkout_timeout
+        waited = False
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise ConnectionPoolError("Connection pool is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, last_used = None, 0.0
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionPoolError(
+                        f"Timed out after {self.checkout_timeout}s waiting for one of "
+                        f"{self.max_size} connections"
+                    )
+                waited = True
+                self._condition.wait(remaining)
+            self._stats.checkouts += 1
+            if waited:
+                self._stats.waits += 1
+
+        if conn is None:
+            return self._open()
+        if self._is_healthy(conn, time.monotonic() - last_used):
+            return conn
+        self._close_quietly(conn)
+        with self._condition:
+            self._stats.closed += 1
+            self._stats.reconnects += 1
+        return self._open()
+
+    def _open(self) -> Any:
+        """Open a connection for a slot already reserved in `_size`."""
+        try:
+            conn = psycopg2.connect(self.dsn)
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._stats.opened += 1
+        return conn
+
+    def _is_healthy(self, conn: Any, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release(self, conn: Any) -> None:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                self._close_quietly(conn)
+        with self._condition:
+            if conn.closed or self._closed:
+                if conn.closed:
+                    self._stats.reconnects += 1
+                self._size -= 1
+                self._stats.closed += 1
+                discard = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                discard = False
+            self._condition.notify()
+        if discard:
+            self._close_quietly(conn)
+
+    def _evict_idle_locked(self) -> None:
+        """Close connections idle for longer than `idle_timeout`, oldest first."""
+        now = time.monotonic()
+        while (self._idle and self._size > self.min_size
+               and now - self._idle[0][1] > self.idle_timeout):
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats.closed += 1
+            self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn: Any) -> None:
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
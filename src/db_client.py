@@ -1,18 +1,66 @@
 import os
+import threading
+import weakref
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
-from typing import Any, Tuple, List, Dict, Optional
+from typing import Any, Tuple, List, Dict, Optional, Set
+from connection_pool import ConnectionPool, PoolStats
+
+
+@dataclass(frozen=True)
+class PreparedStatement:
+    """
+    A statement prepared once per pooled connection and then executed by name, so
+    that Postgres parses it only once per connection and can reuse its plans.
+
+    Attributes:
+        name (str): Name of the statement on the server; unique per SQL text.
+        sql (str): The statement, with $1, $2, ... placeholders.
+        parameter_types (Tuple[str, ...]): Postgres types of the placeholders, in
+            order, e.g. ('text[]', 'int').
+    """
+    name: str
+    sql: str
+    parameter_types: Tuple[str, ...] = ()
+
+    @property
+    def prepare_sql(self) -> str:
+        """Return the PREPARE command creating the statement."""
+        types = f" ({', '.join(self.parameter_types)})" if self.parameter_types else ""
+        return f"PREPARE {self.name}{types} AS {self.sql}"
+
+    @property
+    def execute_sql(self) -> str:
+        """Return the EXECUTE command, with a %s placeholder per parameter."""
+        if not self.parameter_types:
+            return f"EXECUTE {self.name}"
+        return f"EXECUTE {self.name} ({', '.join(['%s'] * len(self.parameter_types))})"
+
 
 class DatabaseClient:
     """
     Simple database client for querying PostgreSQL using psycopg2.
+
+    Connections are drawn from a thread-safe pool and reused across queries, so a
+    single client can be shared by every matcher and thread in the process. Call
+    `close()` (or use the client as a context manager) to release them.
     """
-    def __init__(self, dsn: Optional[str] = None):
+    def __init__(self, dsn: Optional[str] = None, min_connections: int = 1,
+                 max_connections: int = 10, idle_timeout: float = 300.0,
+                 checkout_timeout: float = 30.0, health_check_interval: float = 5.0):
         """
         Initialize the DatabaseClient.
         Args:
             dsn: The PostgreSQL DSN string. If not provided, loads from environment variables.
+            min_connections: Number of pooled connections kept open even when idle.
+            max_connections: Maximum number of pooled connections open at once.
+            idle_timeout: Seconds a pooled connection may sit idle before it is closed.
+            checkout_timeout: Seconds to wait for a free pooled connection.
+            health_check_interval: Pooled connections idle for longer than this many
+                seconds are checked with `SELECT 1` before being reused.
         """
         load_dotenv()
         if dsn is not None:
@@ -25,17 +73,115 @@ class DatabaseClient:
                 f"password={os.getenv('PGPASSWORD', 'autograb_password')} "
                 f"port={os.getenv('PGPORT', 5432)}"
             )
+        self.pool = ConnectionPool(
+            self.dsn,
+            min_size=min_connections,
+            max_size=max_connections,
+            idle_timeout=idle_timeout,
+            checkout_timeout=checkout_timeout,
+            health_check_interval=health_check_interval,
+        )
+        # Names of the statements prepared on each pooled connection
+        self._prepared: "weakref.WeakKeyDictionary[Any, Set[str]]" = weakref.WeakKeyDictionary()
+        self._prepared_lock = threading.Lock()
+
+    @property
+    def stats(self) -> PoolStats:
+        """Return a snapshot of the connection pool counters."""
+        return self.pool.stats
+
+    def connection(self) -> AbstractContextManager:
+        """
+        Check out a pooled connection for the duration of a `with` block.
+        Returns:
+            Context manager yielding a psycopg2 connection
+        """
+        return self.pool.connection()
 
     def query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
         """
         Execute a SQL query and return the results as a list of dictionaries.
+
+        If the pooled connection turns out to be broken, the query is retried once on a
+        fresh connection.
         Args:
             sql: The SQL query string
             params: Query parameters as a tuple
         Returns:
             List of result rows as dictionaries
+        Raises:
+            psycopg2.Error: If the query fails.
+            ConnectionPoolError: If no pooled connection is available.
+        """
+        with self.pool.connection() as conn:
+            try:
+                return self._execute(conn, sql, params)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                # Only a dropped connection is worth retrying; anything else
+                # (a timeout, a bad statement) would fail again.
+                if not conn.closed:
+                    raise
+        with self.pool.connection() as conn:
+            return self._execute(conn, sql, params)
+
+    def execute_prepared(self, statement: PreparedStatement,
+                         params: Tuple[Any, ...] = ()) -> List[Tuple[Any, ...]]:
         """
-        with psycopg2.connect(self.dsn) as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(sql, params)
-                return cur.fetchall() 
\ No newline at end of file
+        Execute a prepared statement and return the result rows as tuples.
+
+        The statement is prepared on a pooled connection the first time it runs there,
+        and executed by name from then on. Rows are fetched as plain tuples, in the
+        statement's column order, which is cheaper than building a dictionary per row.
+        As with `query`, the statement is retried once on a fresh connection if the
+        pooled one turns out to be broken.
+        Args:
+            statement: The statement to execute.
+            params: One value per placeholder; Python lists are sent as arrays and
+                None as NULL.
+        Returns:
+            List of result rows as tuples
+        Raises:
+            psycopg2.Error: If preparing or executing the statement fails.
+            ConnectionPoolError: If no pooled connection is available.
+        """
+        with self.pool.connection() as conn:
+            try:
+                return self._execute_prepared(conn, statement, params)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if not conn.closed:
+                    raise
+        with self.pool.connection() as conn:
+            return self._execute_prepared(conn, statement, params)
+
+    def _execute_prepared(self, conn: Any, statement: PreparedStatement,
+                          params: Tuple[Any, ...]) -> List[Tuple[Any, ...]]:
+        with self._prepared_lock:
+            prepared = self._prepared.setdefault(conn, set())
+        # A checked out connection is used by one thread only, so its set needs no lock
+        with conn.cursor() as cur:
+            if statement.name not in prepared:
+                # Prepared statements outlive the transaction, even if it is rolled back
+                cur.execute(statement.prepare_sql)
+                prepared.add(statement.name)
+            cur.execute(statement.execute_sql, params)
+            rows = cur.fetchall() if cur.description is not None else []
+        conn.commit()
+        return rows
+
+    @staticmethod
+    def _execute(conn: Any, sql: str, params: Tuple[Any, ...]) -> List[Dict[str, Any]]:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall() if cur.description is not None else []
+        conn.commit()
+        return rows
+
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self.pool.close()
+
+    def __enter__(self) -> "DatabaseClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
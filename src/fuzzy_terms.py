@@ -0,0 +1,142 @@
+"""
+Typo-tolerant lookup of attribute terms using a symmetric-delete index.
+"""
+
+import re
+from typing import Dict, Iterable, List, Set, Tuple
+from rapidfuzz.distance import OSA
+from term_matcher import TermMatch
+
+# Words of a description; punctuation that separates words is not part of them
+_WORD = re.compile(r"[^\s,;:()\"']+")
+
+
+def deletes(text: str, max_deletes: int) -> Set[str]:
+    """
+    Every string obtained by deleting up to `max_deletes` characters from the text.
+
+    Args:
+        text: The text.
+        max_deletes: Maximum number of characters deleted.
+
+    Returns:
+        Set[str]: The variants, including the text itself.
+    """
+    variants = {text}
+    frontier = {text}
+    for _ in range(max_deletes):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        variants |= frontier
+    return variants
+
+
+class FuzzyTermIndex:
+    """
+    Finds vocabulary terms written with typos in a description.
+
+    Symmetric-delete index: every term is stored under each string obtained by
+    deleting up to its allowed number of characters, and a stretch of the
+    description is looked up by its own deletions. Two strings within edit distance
+    k share a deletion of at most k characters, so a lookup touches only the handful
+    of terms that can be close, independently of the vocabulary's size; those are
+    then verified with the optimal string alignment distance (Levenshtein distance
+    plus adjacent transpositions).
+
+    Short terms are not fuzzy matched at all, as nearly every short word is within
+    one edit of some short term: terms of at least `min_length` characters tolerate
+    one edit and terms of at least `long_length` characters two.
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, str, str]], min_length: int = 5,
+                 long_length: int = 9):
+        """
+        Build the index.
+
+        Args:
+            terms: (attribute_type, canonical name, term) triples, as for TermMatcher.
+                Term indexes in matches refer to their position.
+            min_length: Minimum length of a term tolerating one edit.
+            long_length: Minimum length of a term tolerating two edits.
+        """
+        self.terms: List[Tuple[str, str, str]] = list(terms)
+        self.min_length = min_length
+        self.long_length = long_length
+        self._keys: List[str] = []
+        self._deletes: Dict[str, List[int]] = {}
+        # Number of words of the indexed terms, e.g. 3 for 'rear wheel drive'
+        self._word_counts: Set[int] = set()
+        self._max_key_length = 0
+        for term_index, (_, _, term) in enumerate(self.terms):
+            key = " ".join(_WORD.findall(term.lower()))
+            self._keys.append(key)
+            max_distance = self.max_distance(key)
+            if not max_distance:
+                continue
+            self._word_counts.add(key.count(" ") + 1)
+            self._max_key_length = max(self._max_key_length, len(key))
+            for variant in deletes(key, max_distance):
+                self._deletes.setdefault(variant, []).append(term_index)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def max_distance(self, text: str) -> int:
+        """
+        Return the number of edits tolerated in a term of the text's length.
+        """
+        if len(text) >= self.long_length:
+            return 2
+        return 1 if len(text) >= self.min_length else 0
+
+    def find_all(self, text: str, exclude: Iterable[Tuple[int, int]] = ()) -> List[TermMatch]:
+        """
+        Find the terms that appear in the text with at least one and at most their
+        tolerated number of edits.
+
+        Args:
+            text: The text to scan. Matching is case-insensitive.
+            exclude: (start, end) spans of the text not to consider, e.g. those of
+                exact matches.
+
+        Returns:
+            List[TermMatch]: The closest term(s) for every run of words that is within
+            reach of one, with `distance` set to the edit distance. Ordered by end
+            offset, then distance.
+        """
+        text = text.lower()
+        words = [(match.start(), match.end()) for match in _WORD.finditer(text)]
+        excluded = list(exclude)
+        matches = []
+        for word_count in sorted(self._word_counts):
+            for first in range(len(words) - word_count + 1):
+                start, end = words[first][0], words[first + word_count - 1][1]
+                if any(start < excluded_end and excluded_start < end
+                       for excluded_start, excluded_end in excluded):
+                    continue
+                window = " ".join(text[s:e] for s, e in words[first:first + word_count])
+                matches.extend(self._lookup(window, start, end))
+        matches.sort(key=lambda match: (match.end, match.distance, match.term_index))
+        return matches
+
+    def _lookup(self, window: str, start: int, end: int) -> List[TermMatch]:
+        # Fuzzy matched terms are min_length to _max_key_length long, give or take two edits
+        if not self.min_length - 1 <= len(window) <= self._max_key_length + 2:
+            return []
+        term_indexes: Set[int] = set()
+        for variant in deletes(window, 2 if len(window) >= self.long_length - 2 else 1):
+            term_indexes.update(self._deletes.get(variant, ()))
+        best: List[Tuple[int, int]] = []
+        for term_index in term_indexes:
+            key = self._keys[term_index]
+            distance = OSA.distance(window, key, score_cutoff=self.max_distance(key))
+            if 0 < distance <= self.max_distance(key):
+                best.append((distance, term_index))
+        if not best:
+            return []
+        closest = min(distance for distance, _ in best)
+        return [
+            TermMatch(attribute_type=self.terms[term_index][0], name=self.terms[term_index][1],
+                      term=self.terms[term_index][2], term_index=term_index,
+                      start=start, end=end, distance=distance)
+            for distance, term_index in sorted(best) if distance == closest
+        ]
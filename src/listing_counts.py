@@ -0,0 +1,127 @@
+"""
+Materialised per-vehicle listing counts, with a refresh command.
+
+Usage:
+    python src/listing_counts.py migrate   # create the index and materialised view
+    python src/listing_counts.py refresh   # recompute the counts
+    python src/listing_counts.py status    # show how old the counts are
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Optional
+import psycopg2
+from db_client import DatabaseClient
+
+MIGRATION_FILE = Path(__file__).resolve().parent.parent / "migrations" / "001_vehicle_listing_count.sql"
+
+VIEW_NAME = "vehicle_listing_count"
+
+
+class ListingCountStore:
+    """
+    Access to the `vehicle_listing_count` materialised view.
+
+    Decides whether the materialised counts can be used in place of the live
+    `COUNT(l.id)` join over `listing`: they can when the view exists, has been
+    populated and was refreshed no more than `max_age` seconds ago. The decision is
+    re-checked at most every `recheck_interval` seconds.
+    """
+
+    def __init__(self, db_client: DatabaseClient, max_age: Optional[float] = 86400.0,
+                 recheck_interval: float = 60.0):
+        """
+        Initialize the ListingCountStore.
+
+        Args:
+            db_client: Client used to query and refresh the view.
+            max_age: Maximum age in seconds of usable counts. None disables the
+                materialised counts so the live join is always used.
+            recheck_interval: Seconds between freshness checks.
+        """
+        self.db_client = db_client
+        self.max_age = max_age
+        self.recheck_interval = recheck_interval
+        self._checked_at: Optional[float] = None
+        self._fresh = False
+
+    def age(self) -> Optional[float]:
+        """
+        Return how many seconds ago the counts were refreshed.
+
+        Returns:
+            Optional[float]: Age in seconds, or None if the view is missing or empty.
+        """
+        try:
+            rows = self.db_client.query(
+                f"SELECT EXTRACT(EPOCH FROM now() - MAX(refreshed_at)) AS age FROM {VIEW_NAME}"
+            )
+        except psycopg2.Error:
+            return None
+        age = rows[0]["age"] if rows else None
+        return float(age) if age is not None else None
+
+    def is_fresh(self) -> bool:
+        """
+        Check whether the materialised counts are usable.
+
+        Returns:
+            bool: True if the counts exist and are no older than `max_age`.
+        """
+        if self.max_age is None:
+            return False
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.recheck_interval:
+            age = self.age()
+            self._fresh = age is not None and age <= self.max_age
+            self._checked_at = now
+        return self._fresh
+
+    def migrate(self) -> None:
+        """
+        Create the `listing.vehicle_id` index and the materialised view if missing.
+        """
+        self.db_client.query(MIGRATION_FILE.read_text())
+        self._checked_at = None
+
+    def refresh(self, concurrently: bool = True) -> None:
+        """
+        Recompute the materialised counts.
+
+        Args:
+            concurrently: Refresh without blocking readers of the view. Requires the
+                view to have been populated before.
+        """
+        concurrently_clause = "CONCURRENTLY " if concurrently else ""
+        self.db_client.query(f"REFRESH MATERIALIZED VIEW {concurrently_clause}{VIEW_NAME}")
+        self._checked_at = None
+
+
+def main() -> None:
+    """
+    Command line entry point for managing the materialised listing counts.
+    """
+    parser = argparse.ArgumentParser(description="Manage materialised vehicle listing counts.")
+    parser.add_argument("command", choices=["migrate", "refresh", "status"])
+    parser.add_argument("--blocking", action="store_true",
+                        help="refresh without CONCURRENTLY (locks out readers, but faster)")
+    args = parser.parse_args()
+
+    with DatabaseClient() as db_client:
+        store = ListingCountStore(db_client)
+        if args.command == "migrate":
+            store.migrate()
+            print(f"Created index and {VIEW_NAME} (if missing)")
+        elif args.command == "refresh":
+            store.refresh(concurrently=not args.blocking)
+            print(f"Refreshed {VIEW_NAME}")
+        age = store.age()
+        if age is None:
+            print(f"{VIEW_NAME} is missing or empty")
+        else:
+            print(f"{VIEW_NAME} was refreshed {age:.0f}s ago")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,240 @@
 """
 Main module for the vehicle matcher application.
+
+The CLI is run many times a day from shell pipelines, so only light modules are
+imported up front. The database driver, the YAML loader, the fuzzy scorer and the
+worker pool are imported, and the vocabulary and catalogue loaded, only once there
+is a description to match: `--help`, bad arguments and empty inputs never pay for them.
 """
 
-import sys
+import argparse
 import os
-from db_client import DatabaseClient
-from vehicle_matcher import VehicleMatcher
+import sys
+from collections import deque
+from contextlib import nullcontext
+from itertools import chain
+from typing import TYPE_CHECKING, Deque, Iterable, Iterator, Optional, TextIO, Union
+from match_metrics import MatchMetrics
+from match_result import MatchResult
+from result_store import KEYED_TARGETS, WRITE_BACK_TARGETS
+from retrieval_backends import RETRIEVAL_BACKENDS
+from result_writers import (
+    OUTPUT_FORMATS, chunked, create_result_writer, read_descriptions, read_keyed_descriptions,
+)
+
+if TYPE_CHECKING:
+    from parallel_matcher import ParallelVehicleMatcher
+    from result_store import ResultStore
+    from vehicle_matcher import VehicleMatcher
+
+# Choices of --retrieval: the in-memory catalogue, then the matcher's retrieval backends
+RETRIEVAL_CHOICES = ["catalogue", *RETRIEVAL_BACKENDS]
+
+
+def positive_int(value: str) -> int:
+    """
+    Parse a command line count that must be at least 1.
+
+    Raises:
+        argparse.ArgumentTypeError: If the value is not an integer of at least 1.
+    """
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer: '{value}'") from None
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
 
 
-def process_vehicle_descriptions(filename: str) -> None:
+def create_matcher(workers: int, chunk_size: int, cache_size: int, metrics: MatchMetrics,
+                   snapshot_file: Optional[str], retrieval: str) -> Union["VehicleMatcher", "ParallelVehicleMatcher"]:
+    """
+    Import the matching and database modules and build the matcher.
+
+    Args:
+        workers: Number of worker processes to match on. 1 matches in this process.
+        chunk_size: Number of descriptions sent to a worker at a time
+        cache_size: Number of results cached for repeated descriptions (per worker)
+        metrics: Collector of per-stage timings and counters
+        snapshot_file: Optional snapshot of the vocabulary and catalogue to start from
+        retrieval: One of RETRIEVAL_CHOICES
+
+    Returns:
+        The in-process or multi-process matcher
+    """
+    use_catalogue = retrieval == "catalogue"
+    backend = "python" if use_catalogue else retrieval
+    if workers > 1:
+        from parallel_matcher import ParallelVehicleMatcher
+        return ParallelVehicleMatcher(workers, yaml_file="vehicle_aliases.yaml",
+                                      chunk_size=chunk_size, cache_size=cache_size,
+                                      metrics=metrics, snapshot_file=snapshot_file,
+                                      use_catalogue=use_catalogue, retrieval=backend)
+    from db_client import DatabaseClient
+    from vehicle_matcher import VehicleMatcher
+    return VehicleMatcher(DatabaseClient(), yaml_file="vehicle_aliases.yaml",
+                          use_catalogue=use_catalogue, cache_size=cache_size,
+                          metrics=metrics, snapshot_file=snapshot_file, retrieval=backend)
+
+
+def match_stream(matcher: Union["VehicleMatcher", "ParallelVehicleMatcher"],
+                 descriptions: Iterable[str], chunk_size: int) -> Iterator[MatchResult]:
+    """
+    Lazily match a stream of descriptions in chunks of at most `chunk_size`.
+    
+    Args:
+        matcher: The in-process or multi-process matcher to use
+        descriptions: The descriptions to match, consumed lazily
+        chunk_size: Number of descriptions matched per batch
+        
+    Yields:
+        MatchResult: One result per description, in input order
+    """
+    from vehicle_matcher import VehicleMatcher
+    if not isinstance(matcher, VehicleMatcher):
+        # The worker pool reads and chunks the descriptions itself
+        yield from matcher.match_descriptions(descriptions)
+        return
+    for chunk in chunked(descriptions, chunk_size):
+        yield from matcher.match_descriptions(chunk)
+
+
+def unstaged_descriptions(file: TextIO, resume_offset: int, keys: Deque[str],
+                          positional_keys: bool = True) -> Iterator[str]:
+    """
+    Lazily read keyed descriptions, skipping those already staged by a resumed run.
+
+    Args:
+        file: The input stream (see `read_keyed_descriptions`)
+        resume_offset: Number of leading inputs to skip
+        keys: Receives the key of every description yielded, in order
+        positional_keys: If False, lines without a key are skipped with a warning
+            instead of being keyed by their position
+
+    Yields:
+        str: Each description still to be matched
+    """
+    position = 0
+    unkeyed = 0
+    for key, description in read_keyed_descriptions(file, positional_keys=positional_keys):
+        if key is None:
+            unkeyed += 1
+            continue
+        position += 1
+        if position > resume_offset:
+            keys.append(key)
+            yield description
+    if unkeyed:
+        print(f"Warning: skipped {unkeyed} lines not of the form key<TAB>description", file=sys.stderr)
+
+
+def process_vehicle_descriptions(filename: str, workers: int = 1, chunk_size: int = 256,
+                                 output_format: str = "text", output: TextIO = sys.stdout,
+                                 cache_size: int = 10000, metrics: bool = False,
+                                 snapshot_file: Optional[str] = None,
+                                 retrieval: str = "catalogue", write_back: Optional[str] = None,
+                                 run_id: Optional[str] = None,
+                                 write_back_batch_size: int = 10000) -> None:
     """
     Process a file of vehicle descriptions and show matching vehicles for each.
     
+    Descriptions are read lazily and matched in chunks, and each result is written as
+    soon as its chunk is matched, so memory use does not grow with the input size.
+    The matcher is only built once the first description has been read.
+    
     Args:
-        filename: Path to the text file containing vehicle descriptions (one per line)
+        filename: Path to the text file containing vehicle descriptions (one per line),
+            or '-' to read them from stdin
+        workers: Number of worker processes to match on. 1 matches in this process.
+        chunk_size: Number of descriptions matched (or sent to a worker) at a time
+        output_format: One of 'text', 'jsonl' or 'csv'
+        output: Stream the results are written to
+        cache_size: Number of results cached for repeated descriptions (per worker). 0 disables caching.
+        metrics: Whether to record per-stage timings and counters and print a summary
+            of them to stderr at the end of the run
+        snapshot_file: Optional snapshot of the vocabulary and catalogue to start from,
+            rebuilt from the database when out of date
+        retrieval: 'catalogue' filters and scores candidates in memory, 'python' fetches
+            them from the database for every description, and 'trigram' ranks them in
+            the database and fetches only the best (see `trigram_index.py`)
+        write_back: Optional target results are also written back to (see
+            `result_store.py`): 'results' for the match_result table, 'listing' for
+            `listing.vehicle_id`. Input lines may then be `key<TAB>description`; for
+            'listing' they must be, and other lines are skipped.
+        run_id: Identifier of the write-back run. A run interrupted before its results
+            were applied resumes, skipping as many leading inputs as it already staged,
+            so it must be restarted with the same input. Defaults to the input file's
+            absolute path.
+        write_back_batch_size: Number of results copied to the database at a time
     """
     # Check if file exists
-    if not os.path.exists(filename):
-        print(f"Error: File '{filename}' not found.")
+    if filename != "-" and not os.path.exists(filename):
+        print(f"Error: File '{filename}' not found.", file=sys.stderr)
         return
     
-    # Initialize the vehicle matcher
-    try:
-        db_client = DatabaseClient()
-        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml")
-    except Exception as e:
-        print(f"Error initializing vehicle matcher: {e}")
-        return
+    match_metrics = MatchMetrics(enabled=metrics)
+    matcher: Optional[Union["VehicleMatcher", "ParallelVehicleMatcher"]] = None
     
-    # Read and process the file
+    # Read, match and write the descriptions one chunk at a time
+    store: Optional["ResultStore"] = None
+    resume_offset = 0
     try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            descriptions = [line.strip() for line in file.readlines()]
-        
-        # Remove empty lines
-        descriptions = [desc for desc in descriptions if desc]
+        writer = create_result_writer(output_format, output)
+        if write_back:
+            from db_client import DatabaseClient
+            from result_store import ResultStore
+            if run_id is None:
+                run_id = "-" if filename == "-" else os.path.abspath(filename)
+            store = ResultStore(DatabaseClient(), run_id, target=write_back,
+                                batch_size=write_back_batch_size)
+            resume_offset = store.resume_offset()
+            if resume_offset:
+                print(f"Resuming run '{run_id}': skipping {resume_offset} staged descriptions",
+                      file=sys.stderr)
+        if output_format == "text":
+            output.write(f"Vehicle Matcher - Processing descriptions from '{filename}'\n")
+            output.write("=" * 80 + "\n\n")
         
-        print(f"Vehicle Matcher - Processing {len(descriptions)} descriptions from '{filename}'")
-        print("=" * 80)
-        print()
-        
-        for i, description in enumerate(descriptions, 1):
-            print(f"Input {i}: '{description}'")
-            print("-" * 60)
-            
-            try:
-                # Find best matching vehicle and confidence score
-                vehicle, score = matcher.find_best_matching_vehicle(description)
-                
-                if vehicle:
-                    print(f"  Matched vehicle with confidence score: {score}")
-                    print(f"  {vehicle.make} {vehicle.model} {vehicle.badge}")
-                    print(f"     Transmission: {vehicle.transmission_type}")
-                    print(f"     Fuel Type: {vehicle.fuel_type}")
-                    print(f"     Drive Type: {vehicle.drive_type}")
-                    print(f"     Vehicle ID: {vehicle.id}")
-                    print(f"     Listings Available: {vehicle.listing_count}")
-                else:
-                    print("❌ No matching vehicles found")
-                    
-            except Exception as e:
-                print(f"❌ Error processing description: {e}")
-            
-            print()
-            print("=" * 80)
-            print()
+        with (nullcontext(sys.stdin) if filename == "-"
+              else open(filename, 'r', encoding='utf-8')) as file:
+            keys: Deque[str] = deque()
+            descriptions = (unstaged_descriptions(file, resume_offset, keys,
+                                                  positional_keys=write_back not in KEYED_TARGETS)
+                            if store is not None else read_descriptions(file))
+            first = next(descriptions, None)
+            if first is not None:
+                try:
+                    matcher = create_matcher(workers, chunk_size, cache_size, match_metrics,
+                                             snapshot_file, retrieval)
+                except Exception as e:
+                    print(f"Error initializing vehicle matcher: {e}", file=sys.stderr)
+                    return
+                for result in match_stream(matcher, chain([first], descriptions), chunk_size):
+                    writer.write(result)
+                    if store is not None:
+                        store.write(keys.popleft(), result)
+                    if writer.count % chunk_size == 0:
+                        writer.flush()
+        writer.close()
+        if store is not None:
+            applied = store.apply()
+            print(f"Wrote back {store.staged} results of run '{run_id}' to {write_back}: "
+                  f"{applied} rows updated", file=sys.stderr)
+        if metrics:
+            print(match_metrics.summary(), file=sys.stderr)
     
     except Exception as e:
-        print(f"Error reading file '{filename}': {e}")
+        print(f"Error processing file '{filename}': {e}", file=sys.stderr)
+    finally:
+        if store is not None:
+            store.db_client.close()
+        if matcher is not None:
+            from vehicle_matcher import VehicleMatcher
+            if isinstance(matcher, VehicleMatcher):
+                matcher.db_client.close()
+            else:
+                matcher.close()
 
 
 def main() -> None:
@@ -75,22 +242,56 @@ def main() -> None:
     Main function to run the vehicle matcher application.
     
     Usage:
-        python main.py [filename]
+        python main.py [filename] [--workers N] [--chunk-size N] [--format FORMAT] [--cache-size N]
+                       [--metrics] [--snapshot PATH] [--retrieval BACKEND]
+                       [--write-back TARGET] [--run-id ID] [--write-back-batch-size N]
         
-    If no filename is provided, defaults to 'inputs.txt'
+    If no filename is provided, defaults to 'inputs.txt'. Use '-' to read from stdin.
     """
-    # Determine input filename
-    if len(sys.argv) > 1:
-        filename = sys.argv[1]
-    else:
-        filename = "inputs.txt"
+    parser = argparse.ArgumentParser(description="Match vehicle descriptions to catalogue vehicles.")
+    parser.add_argument("filename", nargs="?", default="inputs.txt",
+                        help="text file with one vehicle description per line, or - for stdin "
+                             "(default: inputs.txt)")
+    parser.add_argument("--workers", type=positive_int, default=1,
+                        help="number of worker processes to match on (default: 1)")
+    parser.add_argument("--chunk-size", type=positive_int, default=256,
+                        help="descriptions matched or sent to a worker at a time (default: 256)")
+    parser.add_argument("--format", dest="output_format", choices=OUTPUT_FORMATS, default="text",
+                        help="output format (default: text)")
+    parser.add_argument("--cache-size", type=int, default=10000,
+                        help="results cached for repeated descriptions, per worker; 0 disables "
+                             "(default: 10000)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="print per-stage timings and counters to stderr when done")
+    parser.add_argument("--snapshot", dest="snapshot_file", metavar="PATH",
+                        help="start from this vocabulary and catalogue snapshot, rebuilding it "
+                             "when the database or aliases have changed")
+    parser.add_argument("--retrieval", choices=RETRIEVAL_CHOICES, default="catalogue",
+                        help="where candidates are found and ranked: the in-memory catalogue, "
+                             "the database with scoring in Python, or the database ranked by "
+                             "trigram similarity (default: catalogue)")
+    parser.add_argument("--write-back", choices=WRITE_BACK_TARGETS,
+                        help="also write the results back to the database: the match_result "
+                             "table, or listing.vehicle_id with lines of the form "
+                             "listing_id<TAB>description")
+    parser.add_argument("--run-id",
+                        help="identifier of the write-back run; an interrupted run resumes "
+                             "where it left off (default: the input file's absolute path)")
+    parser.add_argument("--write-back-batch-size", type=positive_int, default=10000,
+                        help="results copied to the database at a time (default: 10000)")
+    args = parser.parse_args()
     
-    print("🚗 Vehicle Description Matcher")
-    print(f"📁 Processing file: {filename}")
-    print()
+    if args.output_format == "text":
+        print("🚗 Vehicle Description Matcher")
+        print(f"📁 Processing file: {args.filename}")
+        print()
     
-    process_vehicle_descriptions(filename)
+    process_vehicle_descriptions(args.filename, workers=args.workers, chunk_size=args.chunk_size,
+                                 output_format=args.output_format, cache_size=args.cache_size,
+                                 metrics=args.metrics, snapshot_file=args.snapshot_file,
+                                 retrieval=args.retrieval, write_back=args.write_back,
+                                 run_id=args.run_id, write_back_batch_size=args.write_back_batch_size)
 
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
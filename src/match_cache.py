@@ -0,0 +1,205 @@
+"""
+Bounded LRU cache of match results keyed on normalised descriptions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Callable, Optional, OrderedDict as OrderedDictType, Tuple
+from match_result import MatchResult
+
+
+def fold_whitespace(description: str) -> str:
+    """
+    Collapse every run of whitespace into a single space and strip both ends.
+
+    The matcher folds whitespace this way before matching attributes, so that
+    descriptions sharing a cache key are always matched alike.
+
+    Args:
+        description: The description to fold.
+
+    Returns:
+        str: The folded description.
+    """
+    return " ".join(description.split())
+
+
+def normalise_description(description: str) -> str:
+    """
+    Normalise a description into a cache key.
+
+    Case and whitespace are folded, so 'Golf GTI' and ' golf  gti ' share a key.
+    Punctuation is kept, as attribute terms depend on it: 'M/T' is an alias of
+    Manual, but 'M T' is not.
+
+    Args:
+        description: The description to normalise.
+
+    Returns:
+        str: The normalised description.
+    """
+    return fold_whitespace(description).lower()
+
+
+@dataclass
+class CacheStats:
+    """
+    Counters describing how a MatchCache has been used.
+
+    Attributes:
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups not in the cache, including expired entries.
+        evictions (int): Entries dropped to stay within max_entries.
+        expirations (int): Entries dropped because they outlived the TTL.
+        invalidations (int): Number of times the whole cache was cleared.
+        invalidated_entries (int): Entries dropped selectively by `invalidate`.
+        stale_puts (int): Results refused because the cache was cleared or
+            invalidated while they were computed.
+        size (int): Number of entries currently cached.
+    """
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    invalidated_entries: int = 0
+    stale_puts: int = 0
+    size: int = 0
+
+
+class MatchCache:
+    """
+    Thread-safe least-recently-used cache of MatchResults.
+
+    Entries are keyed on `normalise_description(description)`, so descriptions that
+    differ only in case or whitespace share one entry.
+
+    Every `clear` and `invalidate` starts a new generation. A result computed from
+    data that was current before then is refused by `put` if it is passed the
+    generation read before computing it, so it cannot outlive the invalidation.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: Optional[float] = None):
+        """
+        Initialize the MatchCache.
+
+        Args:
+            max_entries: Maximum number of cached results. The least recently used
+                entry is evicted when the cache is full.
+            ttl: Optional number of seconds after which an entry expires.
+
+        Raises:
+            ValueError: If max_entries is less than 1.
+        """
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDictType[str, Tuple[MatchResult, float]] = OrderedDict()
+        self._stats = CacheStats()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return replace(self._stats, size=len(self._entries))
+
+    @property
+    def generation(self) -> int:
+        """Return the number of times the cache has been cleared or invalidated."""
+        with self._lock:
+            return self._generation
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, description: str) -> Optional[MatchResult]:
+        """
+        Look up the cached result for a description.
+
+        Args:
+            description: The description to look up.
+
+        Returns:
+            Optional[MatchResult]: The cached result, carrying the given description,
+            or None if it is not cached or has expired.
+        """
+        key = normalise_description(description)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None \
+                    and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self._stats.expirations += 1
+                entry = None
+            if entry is None:
+                self._stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats.hits += 1
+        return replace(entry[0], description=description, elapsed_ms=0.0)
+
+    def put(self, result: MatchResult, generation: Optional[int] = None) -> bool:
+        """
+        Cache a result under its description.
+
+        Args:
+            result: The result to cache.
+            generation: The `generation` read before the result was computed. If the
+                cache has been cleared or invalidated since, the result is not cached.
+
+        Returns:
+            bool: True if the result was cached.
+        """
+        key = normalise_description(result.description)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                self._stats.stale_puts += 1
+                return False
+            self._entries[key] = (result, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats.evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._stats.invalidations += 1
+
+    def invalidate(self, predicate: Callable[[str, MatchResult], bool]) -> int:
+        """
+        Drop the cached results a predicate selects, leaving the rest in place.
+
+        The predicate runs without holding the cache lock, so lookups are not blocked
+        while a large cache is scanned. A new generation starts before the scan, so
+        results computed before the call cannot be put back after it.
+
+        Args:
+            predicate: Called with each normalised key and cached result; returns
+                True for results to drop.
+
+        Returns:
+            int: Number of results dropped.
+        """
+        with self._lock:
+            self._generation += 1
+            entries = list(self._entries.items())
+        stale = [(key, entry) for key, entry in entries if predicate(key, entry[0])]
+        dropped = 0
+        with self._lock:
+            for key, entry in stale:
+                # Leave entries replaced since the scan alone
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+                    dropped += 1
+            self._stats.invalidated_entries += dropped
+        return dropped
@@ -0,0 +1,286 @@
+"""
+Opt-in instrumentation of the matcher: per-stage timings, sizes and counters,
+aggregated into histograms and exported as a summary or in Prometheus text format.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Dict, Iterator, List, Sequence, Tuple
+
+# Upper bounds of the duration buckets, in seconds
+DURATION_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Upper bounds of the size buckets (candidates, rows fetched, batch sizes)
+SIZE_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+
+PROMETHEUS_PREFIX = "vehicle_matcher"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the style of a Prometheus histogram.
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        Initialize the Histogram.
+
+        Args:
+            buckets: Upper bounds of the buckets. An implicit +Inf bucket is added.
+        """
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self.counts: List[int] = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """
+        Record one value.
+
+        Args:
+            value: The value to record.
+        """
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add the observations of another histogram with the same buckets.
+
+        Args:
+            other: The histogram to add.
+
+        Raises:
+            ValueError: If the buckets differ.
+        """
+        if other.buckets != self.buckets:
+            raise ValueError("Cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate a quantile by interpolating linearly within its bucket.
+
+        Args:
+            q: The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimate, or 0.0 without observations. Values in the +Inf
+            bucket are reported as the largest finite bound.
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class MatchMetrics:
+    """
+    Thread-safe collector of matcher stage durations, sizes and counters.
+
+    Durations are recorded per stage (e.g. 'attributes', 'query', 'convert',
+    'scoring') and sizes per kind (e.g. 'candidates', 'rows_fetched'), each into its
+    own histogram. A disabled collector ignores everything at negligible cost, so
+    instrumented code does not need to check whether metrics are wanted.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the MatchMetrics.
+
+        Args:
+            enabled: Whether to record anything.
+        """
+        self.enabled = enabled
+        self.durations: Dict[str, Histogram] = {}
+        self.sizes: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def time(self, stage: str) -> ContextManager:
+        """
+        Time a `with` block as one observation of a stage.
+
+        Args:
+            stage: Name of the stage.
+
+        Returns:
+            Context manager recording the block's duration when it exits.
+        """
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(stage)
+
+    @contextmanager
+    def _timed(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_duration(stage, time.perf_counter() - started)
+
+    def observe_duration(self, stage: str, seconds: float) -> None:
+        """
+        Record how long one execution of a stage took.
+
+        Args:
+            stage: Name of the stage.
+            seconds: Duration in seconds.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.durations.get(stage)
+            if histogram is None:
+                histogram = self.durations[stage] = Histogram(DURATION_BUCKETS)
+            histogram.observe(seconds)
+
+    def observe_size(self, kind: str, size: int) -> None:
+        """
+        Record a size, such as the number of candidates of one description.
+
+        Args:
+            kind: What was measured.
+            size: The size.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.sizes.get(kind)
+            if histogram is None:
+                histogram = self.sizes[kind] = Histogram(SIZE_BUCKETS)
+            histogram.observe(size)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """
+        Add to a counter.
+
+        Args:
+            counter: Name of the counter, e.g. 'cache_hits'.
+            amount: Amount to add.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def merge(self, other: "MatchMetrics") -> None:
+        """
+        Add everything recorded by another collector, e.g. one from a worker process.
+
+        Args:
+            other: The collector to add.
+        """
+        with self._lock:
+            for target, source, buckets in ((self.durations, other.durations, DURATION_BUCKETS),
+                                            (self.sizes, other.sizes, SIZE_BUCKETS)):
+                for name, histogram in source.items():
+                    target.setdefault(name, Histogram(buckets)).merge(histogram)
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self.durations = {}
+            self.sizes = {}
+            self.counters = {}
+
+    def summary(self) -> str:
+        """
+        Format the recorded metrics as a human-readable table.
+
+        Returns:
+            str: One line per stage, size and counter.
+        """
+        with self._lock:
+            lines = [f"{'stage':<24}{'count':>10}{'total ms':>12}{'mean ms':>10}"
+                     f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+            for stage, h in sorted(self.durations.items()):
+                lines.append(
+                    f"{stage:<24}{h.count:>10}{h.sum * 1000:>12.1f}{h.sum / h.count * 1000:>10.3f}"
+                    f"{h.quantile(0.5) * 1000:>10.3f}{h.quantile(0.95) * 1000:>10.3f}"
+                    f"{h.quantile(0.99) * 1000:>10.3f}"
+                )
+            if self.sizes:
+                lines.append("")
+                lines.append(f"{'size':<24}{'count':>10}{'total':>12}{'mean':>10}"
+                             f"{'p50':>10}{'p95':>10}{'p99':>10}")
+                for kind, h in sorted(self.sizes.items()):
+                    lines.append(
+                        f"{kind:<24}{h.count:>10}{h.sum:>12.0f}{h.sum / h.count:>10.1f}"
+                        f"{h.quantile(0.5):>10.1f}{h.quantile(0.95):>10.1f}{h.quantile(0.99):>10.1f}"
+                    )
+            if self.counters:
+                lines.append("")
+                for counter, value in sorted(self.counters.items()):
+                    lines.append(f"{counter:<24}{value:>10}")
+        return "\n".join(lines)
+
+    def prometheus(self) -> str:
+        """
+        Format the recorded metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: Stage durations as `vehicle_matcher_stage_seconds`, sizes as
+            `vehicle_matcher_<kind>` histograms and counters as
+            `vehicle_matcher_<counter>_total`.
+        """
+        lines: List[str] = []
+        with self._lock:
+            if self.durations:
+                name = f"{PROMETHEUS_PREFIX}_stage_seconds"
+                lines.append(f"# HELP {name} Time spent in each matching stage.")
+                lines.append(f"# TYPE {name} histogram")
+                for stage, histogram in sorted(self.durations.items()):
+                    lines.extend(_histogram_lines(name, histogram, f'stage="{stage}"'))
+            for kind, histogram in sorted(self.sizes.items()):
+                name = f"{PROMETHEUS_PREFIX}_{kind}"
+                lines.append(f"# HELP {name} Distribution of {kind.replace('_', ' ')} per observation.")
+                lines.append(f"# TYPE {name} histogram")
+                lines.extend(_histogram_lines(name, histogram, ""))
+            for counter, value in sorted(self.counters.items()):
+                name = f"{PROMETHEUS_PREFIX}_{counter}_total"
+                lines.append(f"# HELP {name} Total number of {counter.replace('_', ' ')}.")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> List[str]:
+    separator = "," if labels else ""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+        cumulative += bucket_count
+        le = "+Inf" if bound == float("inf") else repr(float(bound))
+        lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {cumulative}')
+    label_set = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{label_set} {histogram.sum}")
+    lines.append(f"{name}_count{label_set} {histogram.count}")
+    return lines
@@ -0,0 +1,46 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from vehicle import Vehicle
+
+
+@dataclass
+class MatchResult:
+    """
+    Data class representing the outcome of matching one description.
+
+    Attributes:
+        description (str): The description that was matched.
+        vehicle (Optional[Vehicle]): The best matching vehicle, or None if nothing matched.
+        confidence (int): Confidence score from 0 to 10.
+        candidate_count (int): Number of vehicles that survived attribute filtering.
+        matched_attributes (Dict[str, List[str]]): Canonical attribute values found
+            in the description, keyed by attribute type.
+        elapsed_ms (float): Time spent matching this description in milliseconds,
+            including an equal share of any candidate lookup done for its batch.
+    """
+    description: str
+    vehicle: Optional[Vehicle]
+    confidence: int
+    candidate_count: int = 0
+    matched_attributes: Dict[str, List[str]] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+
+
+@dataclass
+class RankedMatch:
+    """
+    Data class representing one of the best matches for a description.
+
+    Attributes:
+        vehicle (Vehicle): The matching vehicle.
+        score (int): Fuzzy score (0-100) of the vehicle's description against the input.
+        confidence (int): Confidence score from 0 to 10 of the match.
+    """
+    vehicle: Vehicle
+    score: int
+    confidence: int
+
+    @property
+    def listing_count(self) -> int:
+        """Return the number of listings of the vehicle, which breaks ties on score."""
+        return self.vehicle.listing_count
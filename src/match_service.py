@@ -0,0 +1,346 @@
+"""
+Long-running asyncio HTTP service for vehicle matching.
+
+Endpoints:
+    POST /match        {"description": "..."}          -> one result
+    POST /match/batch  {"descriptions": ["...", ...]}  -> {"results": [...]}
+    GET  /health                                       -> {"status": "ok"}
+    GET  /metrics                                      -> Prometheus text format
+
+Usage:
+    python src/match_service.py [--host HOST] [--port PORT]
+    python src/match_service.py --makes Toyota,Lexus            # one shard of the catalogue
+    python src/match_service.py --shard Toyota,Lexus=http://node-1:8080 \
+                                --shard Volkswagen=http://node-2:8080   # route to shards
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import asdict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from aiohttp import web
+from db_client import DatabaseClient
+from match_metrics import MatchMetrics
+from match_result import MatchResult
+from result_writers import result_record
+from shard_router import MakeRouter, RemoteShard, ShardedVehicleMatcher
+from vehicle_matcher import VehicleMatcher
+
+MatchBatch = Callable[[List[str]], List[MatchResult]]
+
+
+class MicroBatcher:
+    """
+    Coalesces single-description requests arriving close together into one batch.
+
+    The first pending request opens a batch, which is closed after `max_delay`
+    seconds or once `max_batch_size` requests have joined it, and then matched with
+    one call to `match_batch` on the executor. The next batch starts collecting
+    while earlier ones are still being matched.
+    """
+
+    def __init__(self, match_batch: MatchBatch, max_batch_size: int = 64,
+                 max_delay: float = 0.002, executor: Optional[Executor] = None,
+                 metrics: Optional[MatchMetrics] = None):
+        """
+        Initialize the MicroBatcher.
+
+        Args:
+            match_batch: Blocking function matching a list of descriptions, such as
+                `VehicleMatcher.match_descriptions`.
+            max_batch_size: Maximum number of descriptions per batch.
+            max_delay: Seconds the first request of a batch waits for others to join.
+            executor: Executor the blocking matches run on. Defaults to the loop's.
+            metrics: Optional collector the size of every batch is recorded in.
+
+        Raises:
+            ValueError: If max_batch_size is less than 1.
+        """
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.match_batch = match_batch
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.executor = executor
+        self.metrics = metrics if metrics is not None else MatchMetrics(enabled=False)
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._in_flight: set = set()
+
+    def start(self) -> None:
+        """Start collecting batches on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._collector = asyncio.create_task(self._collect())
+
+    async def close(self) -> None:
+        """Stop collecting batches and wait for in-flight batches to finish."""
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, return_exceptions=True)
+            self._collector = None
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def submit(self, description: str) -> MatchResult:
+        """
+        Match one description as part of the next batch.
+
+        Args:
+            description: The description to match.
+
+        Returns:
+            MatchResult: The result for the description.
+
+        Raises:
+            RuntimeError: If the batcher has not been started.
+        """
+        if self._queue is None:
+            raise RuntimeError("MicroBatcher has not been started")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((description, future))
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.metrics.observe_size("batch_size", len(batch))
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.match_batch, [description for description, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+BATCHER = web.AppKey("batcher", MicroBatcher)
+EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+MATCH_BATCH = web.AppKey("match_batch", Callable)
+METRICS = web.AppKey("metrics", MatchMetrics)
+
+
+def result_json(result: MatchResult) -> Dict[str, Any]:
+    """
+    Convert a MatchResult into the JSON returned by the service.
+
+    Args:
+        result: The result to convert.
+
+    Returns:
+        Dict[str, Any]: The flattened result fields plus the full matched vehicle.
+    """
+    return {
+        **result_record(result),
+        "vehicle": asdict(result.vehicle) if result.vehicle else None,
+        "matched_attributes": result.matched_attributes,
+    }
+
+
+async def _read_json(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Request body must be a JSON object")
+    return body
+
+
+async def handle_match(request: web.Request) -> web.Response:
+    """Match one description, coalesced with concurrent requests into a batch."""
+    body = await _read_json(request)
+    description = body.get("description")
+    if not isinstance(description, str):
+        raise web.HTTPBadRequest(reason="'description' must be a string")
+    result = await request.app[BATCHER].submit(description)
+    return web.json_response(result_json(result))
+
+
+async def handle_match_batch(request: web.Request) -> web.Response:
+    """Match a list of descriptions as one batch."""
+    body = await _read_json(request)
+    descriptions = body.get("descriptions")
+    if not isinstance(descriptions, list) or \
+            not all(isinstance(description, str) for description in descriptions):
+        raise web.HTTPBadRequest(reason="'descriptions' must be a list of strings")
+    loop = asyncio.get_running_loop()
+    results = await loop.run_in_executor(
+        request.app[EXECUTOR], request.app[MATCH_BATCH], descriptions
+    )
+    return web.json_response({"results": [result_json(result) for result in results]})
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    """Report that the service is up."""
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Expose the matcher and batching metrics in Prometheus text format."""
+    return web.Response(text=request.app[METRICS].prometheus(),
+                        content_type="text/plain", charset="utf-8")
+
+
+def create_app(match_batch: MatchBatch, max_batch_size: int = 64, max_delay: float = 0.002,
+               threads: int = 4, metrics: Optional[MatchMetrics] = None) -> web.Application:
+    """
+    Build the matching service application.
+
+    Args:
+        match_batch: Blocking function matching a list of descriptions, such as
+            `VehicleMatcher.match_descriptions` of an already loaded matcher.
+        max_batch_size: Maximum number of single requests coalesced into one batch.
+        max_delay: Seconds a single request waits for others to join its batch.
+        threads: Number of threads blocking matches run on.
+        metrics: Optional collector served at /metrics, usually the one the matcher
+            records into. Batch sizes are recorded in it too.
+
+    Returns:
+        web.Application: The application, ready to be run or tested.
+    """
+    app = web.Application()
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="matcher")
+    app[EXECUTOR] = executor
+    app[MATCH_BATCH] = match_batch
+    app[METRICS] = metrics if metrics is not None else MatchMetrics(enabled=False)
+    app[BATCHER] = MicroBatcher(match_batch, max_batch_size=max_batch_size,
+                                max_delay=max_delay, executor=executor, metrics=app[METRICS])
+
+    async def start_batcher(app: web.Application) -> None:
+        app[BATCHER].start()
+
+    async def stop_batcher(app: web.Application) -> None:
+        await app[BATCHER].close()
+        executor.shutdown(wait=True)
+
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    app.add_routes([
+        web.post("/match", handle_match),
+        web.post("/match/batch", handle_match_batch),
+        web.get("/health", handle_health),
+        web.get("/metrics", handle_metrics),
+    ])
+    return app
+
+
+def periodic_refresh(refresh: Callable[[], bool], interval: float) -> Callable[[web.Application], AsyncIterator[None]]:
+    """
+    Build a cleanup context that calls `refresh` every `interval` seconds in a thread
+    for as long as the application runs.
+
+    Args:
+        refresh: Blocking function applying catalogue and alias changes, such as
+            `VehicleMatcher.refresh`.
+        interval: Seconds between calls.
+
+    Returns:
+        Callable suitable for `app.cleanup_ctx`.
+    """
+    async def refresh_periodically() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(refresh)
+            except Exception as e:
+                print(f"Error refreshing matcher: {e}")
+
+    async def refresh_context(app: web.Application) -> AsyncIterator[None]:
+        task = asyncio.create_task(refresh_periodically())
+        yield
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    return refresh_context
+
+
+def main() -> None:
+    """
+    Command line entry point: load the matcher once and serve it over HTTP.
+    """
+    parser = argparse.ArgumentParser(description="Serve vehicle matching over HTTP.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-size", type=int, default=64,
+                        help="single requests coalesced into one batch (default: 64)")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0,
+                        help="how long a single request waits for others to join its batch "
+                             "(default: 2)")
+    parser.add_argument("--threads", type=int, default=4,
+                        help="threads blocking matches run on (default: 4)")
+    parser.add_argument("--cache-size", type=int, default=100000,
+                        help="results cached for repeated descriptions; 0 disables "
+                             "(default: 100000)")
+    parser.add_argument("--refresh-interval", type=float, default=60.0,
+                        help="seconds between checks for alias and catalogue changes, which "
+                             "are applied without a restart; 0 disables (default: 60)")
+    parser.add_argument("--makes",
+                        help="comma-separated makes; load and serve only the shard of the catalogue "
+                             "holding them")
+    parser.add_argument("--shard", action="append", default=[], metavar="MAKES=URL",
+                        help="route descriptions to the shard holding the comma-separated MAKES, "
+                             "served at URL by another instance started with --makes; repeat for "
+                             "every shard")
+    args = parser.parse_args()
+    if args.makes and args.shard:
+        parser.error("--makes and --shard cannot be combined")
+
+    db_client = DatabaseClient(max_connections=args.threads)
+    metrics = MatchMetrics()
+    if args.shard:
+        shards = [value.partition("=") for value in args.shard]
+        if not all(url for _, _, url in shards):
+            parser.error("--shard must be of the form MAKES=URL")
+        sharded_matcher = ShardedVehicleMatcher(
+            MakeRouter(db_client, [makes.split(",") for makes, _, _ in shards], "vehicle_aliases.yaml"),
+            [RemoteShard(url) for _, _, url in shards],
+        )
+        match_batch = sharded_matcher.match_descriptions
+    else:
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", use_catalogue=True,
+                                 cache_size=args.cache_size, metrics=metrics,
+                                 track_changes=args.refresh_interval > 0,
+                                 makes=args.makes.split(",") if args.makes else None)
+        match_batch = matcher.match_descriptions
+    app = create_app(match_batch, max_batch_size=args.max_batch_size,
+                     max_delay=args.max_delay_ms / 1000, threads=args.threads, metrics=metrics)
+
+    async def close_db_client(app: web.Application) -> None:
+        await asyncio.to_thread(db_client.close)
+
+    app.on_cleanup.append(close_db_client)
+    if args.shard:
+        async def close_sharded_matcher(app: web.Application) -> None:
+            await asyncio.to_thread(sharded_matcher.close)
+
+        app.on_cleanup.append(close_sharded_matcher)
+    elif args.refresh_interval > 0:
+        app.cleanup_ctx.append(periodic_refresh(matcher.refresh, args.refresh_interval))
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
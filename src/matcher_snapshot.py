@@ -0,0 +1,409 @@
+"""
+Versioned on-disk snapshots of the matcher's vocabulary and catalogue.
+
+A snapshot lets a matcher start without querying the attribute values, parsing the
+alias file or loading and indexing the catalogue. The catalogue's numeric columns
+and index postings are stored as raw arrays that are memory-mapped rather than
+read, so processes starting from the same snapshot file share those pages. The
+vocabulary is stored as plain JSON data and its term matcher rebuilt on load, so
+loading a snapshot never runs code from the file.
+
+Snapshots are not signed: one altered by someone else loads as long as it is well
+formed, and then matches against whatever vocabulary and catalogue it holds. Keep
+snapshot files where only the user running the matcher can write them.
+
+Usage:
+    python src/matcher_snapshot.py build matcher.snapshot   # build from the database
+    python src/matcher_snapshot.py info matcher.snapshot    # show the snapshot's versions
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from catalogue_changes import catalogue_version
+from db_client import DatabaseClient
+from vehicle_attributes import VehicleAttributes
+from vehicle_catalogue import ATTRIBUTE_COLUMNS, INDEXED_ATTRIBUTES, VehicleCatalogue
+
+MAGIC = b"VMSNAP\r\n"
+
+# Version 1 stored the vocabulary pickled, and is no longer read
+FORMAT_VERSION = 2
+
+# Separator of the strings of a string section; may not occur in any of them
+_STRING_SEPARATOR = "\0"
+
+_ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or of an unsupported format."""
+
+
+@dataclass
+class SnapshotHeader:
+    """
+    Identification of a snapshot.
+
+    Attributes:
+        format_version (int): Version of the file layout.
+        catalogue_version (str): `catalogue_changes.catalogue_version` of the database
+            the snapshot was built from.
+        aliases_version (Optional[str]): `aliases_version` of the alias file used.
+        vehicles (Optional[int]): Number of vehicles, or None without a catalogue.
+        created_at (float): Unix time the snapshot was written.
+    """
+    format_version: int
+    catalogue_version: str
+    aliases_version: Optional[str]
+    vehicles: Optional[int]
+    created_at: float
+
+
+@dataclass
+class MatcherSnapshot:
+    """
+    A loaded snapshot.
+
+    Attributes:
+        header (SnapshotHeader): The snapshot's versions.
+        vehicle_attributes (VehicleAttributes): The vocabulary and its term matcher.
+        catalogue (Optional[VehicleCatalogue]): The catalogue, if one was stored.
+    """
+    header: SnapshotHeader
+    vehicle_attributes: VehicleAttributes
+    catalogue: Optional[VehicleCatalogue]
+
+
+def aliases_version(yaml_file: Optional[str]) -> Optional[str]:
+    """
+    Fingerprint the contents of an alias file.
+
+    Args:
+        yaml_file: Path to the alias file, or None.
+
+    Returns:
+        Optional[str]: SHA-256 of the file's contents, or None without a readable file.
+    """
+    if not yaml_file:
+        return None
+    try:
+        with open(yaml_file, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def write_snapshot(path: str, vehicle_attributes: VehicleAttributes,
+                   catalogue: Optional[VehicleCatalogue], catalogue_version: str,
+                   aliases_version: Optional[str]) -> SnapshotHeader:
+    """
+    Write a snapshot, replacing any existing file atomically.
+
+    Args:
+        path: Destination file.
+        vehicle_attributes: The vocabulary to store.
+        catalogue: The catalogue to store, if any.
+        catalogue_version: Version of the database the vocabulary and catalogue were
+            built from.
+        aliases_version: Version of the alias file they were built from.
+
+    Returns:
+        SnapshotHeader: The header written.
+
+    Raises:
+        SnapshotError: If a stored string contains a NUL character.
+    """
+    header = SnapshotHeader(
+        format_version=FORMAT_VERSION,
+        catalogue_version=catalogue_version,
+        aliases_version=aliases_version,
+        vehicles=len(catalogue.ids) if catalogue is not None else None,
+        created_at=time.time(),
+    )
+    sections: Dict[str, Tuple[str, Any]] = {
+        "vocabulary": ("json", json.dumps(vehicle_attributes.to_vocabulary()).encode("utf-8")),
+    }
+    if catalogue is not None:
+        sections.update(_catalogue_sections(catalogue))
+
+    layout: Dict[str, Dict[str, Any]] = {}
+    payloads: List[bytes] = []
+    offset = 0
+    for name, (kind, value) in sections.items():
+        if kind == "array":
+            payload = value.tobytes()
+            layout[name] = {"kind": kind, "typecode": value.typecode}
+        elif kind == "strings":
+            if any(_STRING_SEPARATOR in string for string in value):
+                raise SnapshotError(f"Section '{name}' contains a NUL character")
+            payload = _STRING_SEPARATOR.join(value).encode("utf-8")
+            layout[name] = {"kind": kind, "count": len(value)}
+        else:
+            payload = value
+            layout[name] = {"kind": kind}
+        layout[name].update(offset=offset, length=len(payload))
+        padding = -len(payload) % _ALIGNMENT
+        payloads.append(payload + b"\0" * padding)
+        offset += len(payload) + padding
+
+    metadata = json.dumps({
+        **asdict(header), "byteorder": sys.byteorder, "sections": layout,
+    }).encode("utf-8")
+    metadata += b" " * (-(len(MAGIC) + 8 + len(metadata)) % _ALIGNMENT)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(MAGIC)
+            file.write(struct.pack("<Q", len(metadata)))
+            file.write(metadata)
+            for payload in payloads:
+                file.write(payload)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return header
+
+
+def read_snapshot_header(path: str) -> SnapshotHeader:
+    """
+    Read just the header of a snapshot.
+
+    Args:
+        path: The snapshot file.
+
+    Returns:
+        SnapshotHeader: The snapshot's versions.
+
+    Raises:
+        SnapshotError: If the file is missing, corrupt or of an unsupported format.
+    """
+    with open_snapshot_file(path) as file:
+        metadata, _ = _read_metadata(file)
+    return _header(metadata)
+
+
+def is_current(header: SnapshotHeader, version: str, yaml_file: Optional[str], with_catalogue: bool) -> bool:
+    """
+    Check whether a snapshot can be started from instead of building its contents.
+
+    Args:
+        header: The snapshot's header.
+        version: Current catalogue version (see `catalogue_changes.catalogue_version`).
+        yaml_file: The alias file in use, or None.
+        with_catalogue: Whether the catalogue is needed as well as the vocabulary.
+
+    Returns:
+        bool: True if the snapshot was built from this catalogue version and alias
+        file, and holds a catalogue if one is needed.
+    """
+    return header.catalogue_version == version and \
+        header.aliases_version == aliases_version(yaml_file) and \
+        (header.vehicles is not None or not with_catalogue)
+
+
+def prepare_snapshot(path: str, db_client: DatabaseClient, yaml_file: Optional[str] = None,
+                     with_catalogue: bool = True, materialised_counts: bool = False) -> str:
+    """
+    Bring a snapshot up to date without loading it, e.g. once before starting the
+    processes that load it.
+
+    Only the header is read. If the snapshot is missing or stale, the vocabulary and,
+    if wanted, the catalogue are built from the database and the snapshot rewritten.
+
+    Args:
+        path: The snapshot file.
+        db_client: Client used to read the catalogue version and, if needed, build.
+        yaml_file: Optional path to a YAML file of attribute aliases.
+        with_catalogue: Whether the snapshot must hold the catalogue.
+        materialised_counts: Whether a rebuilt catalogue reads the materialised
+            listing counts rather than counting listings.
+
+    Returns:
+        str: The catalogue version the snapshot now holds, e.g. to pass on as
+        `VehicleMatcher(snapshot_version=...)`.
+
+    Raises:
+        psycopg2.Error: If the database cannot be read.
+        OSError, SnapshotError: If a stale snapshot cannot be rewritten.
+    """
+    version = catalogue_version(db_client)
+    try:
+        if is_current(read_snapshot_header(path), version, yaml_file, with_catalogue):
+            return version
+    except SnapshotError:
+        pass
+    catalogue = (VehicleCatalogue.load(db_client, materialised_counts=materialised_counts)
+                 if with_catalogue else None)
+    write_snapshot(path, VehicleAttributes(db_client, yaml_file), catalogue, version,
+                   aliases_version(yaml_file))
+    return version
+
+
+def load_snapshot(path: str, db_client: DatabaseClient, with_catalogue: bool = True) -> MatcherSnapshot:
+    """
+    Load a snapshot, memory-mapping the catalogue's arrays.
+
+    Args:
+        path: The snapshot file.
+        db_client: Client the loaded VehicleAttributes will use.
+        with_catalogue: Whether to load the catalogue as well as the vocabulary.
+
+    Returns:
+        MatcherSnapshot: The loaded snapshot.
+
+    Raises:
+        SnapshotError: If the file is missing, corrupt or of an unsupported format.
+    """
+    with open_snapshot_file(path) as file:
+        metadata, data_start = _read_metadata(file)
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    header = _header(metadata)
+    if metadata.get("byteorder") != sys.byteorder:
+        raise SnapshotError(f"Snapshot '{path}' was written on a {metadata.get('byteorder')}-endian machine")
+
+    data = memoryview(buffer)[data_start:]
+    sections = {name: _read_section(data, section) for name, section in metadata["sections"].items()}
+    try:
+        vehicle_attributes = VehicleAttributes.from_vocabulary(db_client, sections["vocabulary"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise SnapshotError(f"Snapshot '{path}' has a corrupt vocabulary: {e!r}") from e
+    catalogue = None
+    if with_catalogue and header.vehicles is not None:
+        catalogue = _catalogue_from_sections(sections)
+        # The memory-mapped columns are only valid while the mapping is open
+        catalogue._buffer = buffer
+    return MatcherSnapshot(header, vehicle_attributes, catalogue)
+
+
+def open_snapshot_file(path: str):
+    """
+    Open a snapshot file for reading.
+
+    Raises:
+        SnapshotError: If the file cannot be opened.
+    """
+    try:
+        return open(path, "rb")
+    except OSError as e:
+        raise SnapshotError(f"Cannot open snapshot '{path}': {e}") from e
+
+
+def _read_metadata(file) -> Tuple[Dict[str, Any], int]:
+    prefix = file.read(len(MAGIC) + 8)
+    if len(prefix) < len(MAGIC) + 8 or prefix[:len(MAGIC)] != MAGIC:
+        raise SnapshotError(f"'{file.name}' is not a matcher snapshot")
+    (metadata_length,) = struct.unpack("<Q", prefix[len(MAGIC):])
+    try:
+        metadata = json.loads(file.read(metadata_length))
+    except ValueError as e:
+        raise SnapshotError(f"Snapshot '{file.name}' has a corrupt header: {e}") from e
+    if metadata.get("format_version") != FORMAT_VERSION:
+        raise SnapshotError(
+            f"Snapshot '{file.name}' has format version {metadata.get('format_version')}, "
+            f"expected {FORMAT_VERSION}"
+        )
+    return metadata, len(prefix) + metadata_length
+
+
+def _header(metadata: Dict[str, Any]) -> SnapshotHeader:
+    return SnapshotHeader(**{name: metadata[name] for name in SnapshotHeader.__dataclass_fields__})
+
+
+def _read_section(data: memoryview, section: Dict[str, Any]) -> Any:
+    payload = data[section["offset"]:section["offset"] + section["length"]]
+    if len(payload) != section["length"]:
+        raise SnapshotError("Snapshot is truncated")
+    if section["kind"] == "array":
+        return payload.cast(section["typecode"])
+    if section["kind"] == "strings":
+        return bytes(payload).decode("utf-8").split(_STRING_SEPARATOR) if section["count"] else []
+    if section["kind"] == "json":
+        try:
+            return json.loads(bytes(payload))
+        except ValueError as e:
+            raise SnapshotError(f"Snapshot section is not valid JSON: {e}") from e
+    raise SnapshotError(f"Snapshot section has unknown kind '{section['kind']}'")
+
+
+def _catalogue_sections(catalogue: VehicleCatalogue) -> Dict[str, Tuple[str, Any]]:
+    sections: Dict[str, Tuple[str, Any]] = {
+        "ids": ("strings", catalogue.ids),
+        "descriptions": ("strings", catalogue.descriptions),
+        "listing_counts": ("array", array('q', catalogue.listing_counts)),
+        "removed": ("array", array('I', sorted(catalogue.removed))),
+    }
+    for column in ATTRIBUTE_COLUMNS:
+        sections[f"values.{column}"] = ("strings", catalogue.values[column])
+        sections[f"codes.{column}"] = ("array", array('I', catalogue.codes[column]))
+    for attribute_type in INDEXED_ATTRIBUTES:
+        # All postings of an attribute back to back, with the offset each code starts at
+        postings = catalogue.postings[attribute_type]
+        offsets = array('Q', [0])
+        flat = array('I')
+        for positions in postings:
+            flat.extend(positions)
+            offsets.append(len(flat))
+        sections[f"postings.{attribute_type}"] = ("array", flat)
+        sections[f"posting_offsets.{attribute_type}"] = ("array", offsets)
+    return sections
+
+
+def _catalogue_from_sections(sections: Dict[str, Any]) -> VehicleCatalogue:
+    catalogue = VehicleCatalogue()
+    catalogue.ids = sections["ids"]
+    catalogue.descriptions = sections["descriptions"]
+    catalogue.listing_counts = sections["listing_counts"]
+    catalogue.removed = set(sections["removed"])
+    for column in ATTRIBUTE_COLUMNS:
+        values = sections[f"values.{column}"]
+        catalogue.values[column] = values
+        catalogue._value_codes[column] = {value: code for code, value in enumerate(values)}
+        catalogue.codes[column] = sections[f"codes.{column}"]
+    for attribute_type in INDEXED_ATTRIBUTES:
+        flat = sections[f"postings.{attribute_type}"]
+        offsets = sections[f"posting_offsets.{attribute_type}"]
+        catalogue.postings[attribute_type] = [
+            flat[offsets[code]:offsets[code + 1]] for code in range(len(offsets) - 1)
+        ]
+    return catalogue
+
+
+def main() -> None:
+    """
+    Command line entry point for building and inspecting snapshots.
+    """
+    parser = argparse.ArgumentParser(description="Build or inspect a matcher snapshot.")
+    parser.add_argument("command", choices=["build", "info"])
+    parser.add_argument("path", help="snapshot file")
+    parser.add_argument("--aliases", default="vehicle_aliases.yaml",
+                        help="YAML file of attribute aliases (default: vehicle_aliases.yaml)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        with DatabaseClient() as db_client:
+            version = catalogue_version(db_client)
+            catalogue = VehicleCatalogue.load(db_client)
+            header = write_snapshot(args.path, VehicleAttributes(db_client, args.aliases), catalogue,
+                                    version, aliases_version(args.aliases))
+        print(f"Wrote {args.path} ({header.vehicles} vehicles)")
+    else:
+        header = read_snapshot_header(args.path)
+    for name, value in asdict(header).items():
+        print(f"{name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Multi-process vehicle matching, fanning chunks of descriptions out to worker processes.
+"""
+
+import sys
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, Iterable, Iterator, List, Optional, Tuple
+from db_client import DatabaseClient
+from listing_counts import ListingCountStore
+from match_metrics import MatchMetrics
+from match_result import MatchResult
+from matcher_snapshot import SnapshotError, prepare_snapshot
+from vehicle import Vehicle
+from vehicle_matcher import VehicleMatcher
+
+# Matcher owned by the current worker process, built once by _init_worker
+_worker_matcher: Optional[VehicleMatcher] = None
+
+
+def _init_worker(yaml_file: Optional[str], use_catalogue: bool, cache_size: Optional[int],
+                 cache_ttl: Optional[float], collect_metrics: bool,
+                 snapshot_file: Optional[str] = None, retrieval: str = "python",
+                 snapshot_version: Optional[str] = None) -> None:
+    global _worker_matcher
+    _worker_matcher = VehicleMatcher(DatabaseClient(), yaml_file=yaml_file,
+                                     use_catalogue=use_catalogue, cache_size=cache_size,
+                                     cache_ttl=cache_ttl,
+                                     metrics=MatchMetrics(enabled=collect_metrics),
+                                     snapshot_file=snapshot_file, retrieval=retrieval,
+                                     snapshot_version=snapshot_version)
+
+
+def _match_chunk(descriptions: List[str]) -> Tuple[List[MatchResult], Optional[MatchMetrics]]:
+    results = _worker_matcher.match_descriptions(descriptions)
+    metrics = _worker_matcher.metrics
+    if not metrics.enabled:
+        return results, None
+    # Hand the chunk's metrics back to the parent and start afresh for the next chunk
+    _worker_matcher.metrics = MatchMetrics()
+    return results, metrics
+
+
+class ParallelVehicleMatcher:
+    """
+    Matches descriptions on a pool of worker processes.
+
+    Each worker builds its own VehicleMatcher (and so loads the attribute vocabulary
+    and catalogue) once when it starts, then matches whole chunks of descriptions with
+    the `VehicleMatcher` batch API. Results are yielded in input order.
+    """
+
+    def __init__(self, workers: int, yaml_file: Optional[str] = None,
+                 use_catalogue: bool = False, chunk_size: int = 256,
+                 cache_size: Optional[int] = None, cache_ttl: Optional[float] = None,
+                 metrics: Optional[MatchMetrics] = None, snapshot_file: Optional[str] = None,
+                 retrieval: str = "python"):
+        """
+        Start the worker pool.
+
+        Args:
+            workers: Number of worker processes.
+            yaml_file: Optional path to a YAML file of attribute aliases.
+            use_catalogue: Whether each worker loads the in-memory catalogue, as in
+                `VehicleMatcher`.
+            chunk_size: Number of descriptions sent to a worker at a time.
+            cache_size: If set, each worker caches up to this many results.
+            cache_ttl: Optional number of seconds after which cached results expire.
+            metrics: Optional collector the workers' metrics are merged into as each
+                chunk completes.
+            snapshot_file: Optional path to a snapshot of the vocabulary and catalogue.
+                It is brought up to date once before the workers start (see
+                `matcher_snapshot.prepare_snapshot`), so every worker maps the same file
+                instead of building its own copy, and checks it against the catalogue
+                version the parent read rather than the database.
+            retrieval: Retrieval backend of each worker's VehicleMatcher.
+
+        Raises:
+            ValueError: If workers or chunk_size is less than 1.
+        """
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        if chunk_size < 1:
+            raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.metrics = metrics
+        snapshot_version = None
+        if snapshot_file:
+            with DatabaseClient() as db_client:
+                try:
+                    snapshot_version = prepare_snapshot(
+                        snapshot_file, db_client, yaml_file, with_catalogue=use_catalogue,
+                        materialised_counts=ListingCountStore(db_client).is_fresh(),
+                    )
+                except (OSError, SnapshotError) as e:
+                    # Each worker then builds its own vocabulary and catalogue
+                    print(f"Error writing snapshot {snapshot_file}: {e}", file=sys.stderr)
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(yaml_file, use_catalogue, cache_size, cache_ttl,
+                      metrics is not None and metrics.enabled, snapshot_file, retrieval,
+                      snapshot_version),
+        )
+
+    def find_best_matching_vehicles(self, descriptions: Iterable[str]) -> Iterator[Tuple[Optional[Vehicle], int]]:
+        """
+        Find the best matching vehicle for each description using the worker pool.
+
+        Args:
+            descriptions (Iterable[str]): Natural language vehicle descriptions.
+
+        Yields:
+            Tuple[Vehicle, int]: Best matching vehicle and confidence score for each
+            description, in input order. (None, 0) for descriptions without a match.
+
+        Raises:
+            psycopg2.Error: If a worker's database query fails.
+        """
+        for result in self.match_descriptions(descriptions):
+            yield result.vehicle, result.confidence
+
+    def match_descriptions(self, descriptions: Iterable[str]) -> Iterator[MatchResult]:
+        """
+        Match descriptions on the worker pool, reporting the details of each match.
+
+        Descriptions are consumed lazily and at most two chunks per worker are in
+        flight at once, so memory stays bounded for arbitrarily long inputs.
+
+        Args:
+            descriptions (Iterable[str]): Natural language vehicle descriptions.
+
+        Yields:
+            MatchResult: One result per description, in input order.
+
+        Raises:
+            psycopg2.Error: If a worker's database query fails.
+        """
+        descriptions = iter(descriptions)
+        pending: Deque[Future] = deque()
+        max_pending = self.workers * 2
+        while True:
+            while len(pending) < max_pending:
+                chunk = list(islice(descriptions, self.chunk_size))
+                if not chunk:
+                    break
+                pending.append(self.executor.submit(_match_chunk, chunk))
+            if not pending:
+                return
+            results, chunk_metrics = pending.popleft().result()
+            if chunk_metrics is not None:
+                self.metrics.merge(chunk_metrics)
+            yield from results
+
+    def close(self) -> None:
+        """Shut down the worker processes."""
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self) -> "ParallelVehicleMatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
@@ -0,0 +1,231 @@
+"""
+Bulk write-back of match results into Postgres.
+
+Results are streamed into a staging table with COPY, one committed batch at a time,
+then applied to the `match_result` table or to `listing.vehicle_id` with a single
+set-based statement. A run that crashes part way can be resumed: the inputs it has
+already staged, always the first ones, are skipped, and nothing is applied until every
+input is staged.
+
+Usage:
+    python src/result_store.py migrate   # create the staging and results tables
+    python src/result_store.py status    # show runs staged but not yet applied
+"""
+
+import argparse
+import csv
+import io
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING
+from match_result import MatchResult
+
+# Imported by the CLI for WRITE_BACK_TARGETS, which must not pull in the database driver
+if TYPE_CHECKING:
+    from db_client import DatabaseClient
+
+MIGRATION_FILE = Path(__file__).resolve().parent.parent / "migrations" / "003_match_results.sql"
+
+STAGING_TABLE = "match_result_staging"
+
+# Where applied results go: the match_result table keyed by input key, or the
+# vehicle_id of the listing whose id is the input key
+WRITE_BACK_TARGETS = ("results", "listing")
+
+# Targets whose input keys name existing rows, so inputs without a key cannot be
+# written back to them
+KEYED_TARGETS = ("listing",)
+
+STAGING_COLUMNS = ["run_id", "input_key", "description", "vehicle_id", "confidence",
+                   "candidate_count", "matched_attributes"]
+
+COPY_SQL = f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+
+STAGED_COUNT_SQL = f"SELECT COUNT(*) AS staged FROM {STAGING_TABLE} WHERE run_id = %s"
+
+STATUS_SQL = f"""
+SELECT run_id, COUNT(*) AS staged, COUNT(vehicle_id) AS matched
+FROM {STAGING_TABLE}
+GROUP BY run_id
+ORDER BY run_id
+"""
+
+# The latest staged result for every input key of a run
+LATEST_STAGED_SQL = f"""
+SELECT DISTINCT ON (input_key) *
+FROM {STAGING_TABLE}
+WHERE run_id = %s
+ORDER BY input_key, id DESC
+"""
+
+APPLY_SQL = {
+    "results": f"""
+        INSERT INTO match_result (input_key, description, vehicle_id, confidence, candidate_count,
+                                  matched_attributes, run_id, matched_at)
+        SELECT input_key, description, vehicle_id, confidence, candidate_count,
+               matched_attributes, run_id, now()
+        FROM ({LATEST_STAGED_SQL}) s
+        ON CONFLICT (input_key) DO UPDATE SET
+            description = EXCLUDED.description,
+            vehicle_id = EXCLUDED.vehicle_id,
+            confidence = EXCLUDED.confidence,
+            candidate_count = EXCLUDED.candidate_count,
+            matched_attributes = EXCLUDED.matched_attributes,
+            run_id = EXCLUDED.run_id,
+            matched_at = EXCLUDED.matched_at
+    """,
+    # Unmatched descriptions leave their listing's vehicle alone
+    "listing": f"""
+        UPDATE listing l
+        SET vehicle_id = s.vehicle_id
+        FROM ({LATEST_STAGED_SQL}) s
+        WHERE l.id = s.input_key
+          AND s.vehicle_id IS NOT NULL
+          AND l.vehicle_id IS DISTINCT FROM s.vehicle_id
+    """,
+}
+
+CLEAR_STAGED_SQL = f"DELETE FROM {STAGING_TABLE} WHERE run_id = %s"
+
+
+def migrate(db_client: "DatabaseClient") -> None:
+    """
+    Create the staging and results tables if missing.
+
+    Args:
+        db_client: Client used to run the migration.
+    """
+    db_client.query(MIGRATION_FILE.read_text())
+
+
+class ResultStore:
+    """
+    Writes the match results of one run back to the database.
+
+    `write` buffers results and copies them into `match_result_staging` every
+    `batch_size` results, each batch in its own transaction, so a crash loses at
+    most the batch in flight. `apply` then merges the whole run into its target
+    and clears its staged rows in one transaction.
+
+    Runs are identified by a `run_id` chosen by the caller. Starting a run whose
+    rows are still staged resumes it: results are staged in input order, one per
+    input, so `resume_offset` tells how many inputs to skip.
+    """
+
+    def __init__(self, db_client: "DatabaseClient", run_id: str, target: str = "results",
+                 batch_size: int = 10000):
+        """
+        Initialize the ResultStore.
+
+        Args:
+            db_client: Client used to copy and apply the results.
+            run_id: Identifier of the run, stored with every staged result.
+            target: One of WRITE_BACK_TARGETS.
+            batch_size: Number of results copied into the staging table at a time.
+
+        Raises:
+            ValueError: If the target is unknown or the batch size is less than 1.
+        """
+        if target not in WRITE_BACK_TARGETS:
+            raise ValueError(f"Unknown write-back target '{target}', expected one of {WRITE_BACK_TARGETS}")
+        if batch_size < 1:
+            raise ValueError(f"Batch size must be at least 1, got {batch_size}")
+        self.db_client = db_client
+        self.run_id = run_id
+        self.target = target
+        self.batch_size = batch_size
+        self.staged = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._buffered = 0
+
+    def resume_offset(self) -> int:
+        """
+        Return the number of inputs this run has already staged, e.g. before a crash.
+        They are the first inputs of the run, which need not be matched again if it
+        is restarted with the same input.
+
+        Returns:
+            int: Number of leading inputs to skip.
+        """
+        return self.db_client.query(STAGED_COUNT_SQL, (self.run_id,))[0]['staged']
+
+    def write(self, input_key: str, result: MatchResult) -> None:
+        """
+        Buffer the result of one input, copying the buffer once it holds a batch.
+
+        Args:
+            input_key: Key of the input, e.g. a listing id. Within a run, the last
+                result written for a key wins.
+            result: The input's match result.
+        """
+        self._writer.writerow([
+            self.run_id,
+            input_key,
+            result.description,
+            result.vehicle.id if result.vehicle else None,
+            result.confidence,
+            result.candidate_count,
+            json.dumps(result.matched_attributes, ensure_ascii=False),
+        ])
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Copy the buffered results into the staging table and commit them.
+        """
+        if not self._buffered:
+            return
+        self._buffer.seek(0)
+        with self.db_client.connection() as conn:
+            with conn.cursor() as cur:
+                cur.copy_expert(COPY_SQL, self._buffer)
+            conn.commit()
+        self.staged += self._buffered
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._buffered = 0
+
+    def apply(self) -> int:
+        """
+        Flush, then merge the run's staged results into the target and clear them,
+        in one transaction.
+
+        Returns:
+            int: Number of results rows inserted or updated, or of listings updated.
+        """
+        self.flush()
+        with self.db_client.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(APPLY_SQL[self.target], (self.run_id,))
+                applied = cur.rowcount
+                cur.execute(CLEAR_STAGED_SQL, (self.run_id,))
+            conn.commit()
+        return applied
+
+
+def main() -> None:
+    """
+    Command line entry point for managing the write-back tables.
+    """
+    parser = argparse.ArgumentParser(description="Manage the tables match results are written back to.")
+    parser.add_argument("command", choices=["migrate", "status"])
+    args = parser.parse_args()
+
+    from db_client import DatabaseClient
+
+    with DatabaseClient() as db_client:
+        if args.command == "migrate":
+            migrate(db_client)
+            print(f"Created {STAGING_TABLE} and match_result (if missing)")
+        rows = db_client.query(STATUS_SQL)
+        if not rows:
+            print("No runs are waiting to be applied")
+        for row in rows:
+            print(f"{row['run_id']}: {row['staged']} results staged, {row['matched']} matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Streaming input and output for the vehicle matcher file runner.
+"""
+
+import csv
+import json
+from abc import ABC, abstractmethod
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, TypeVar
+from match_result import MatchResult
+
+T = TypeVar("T")
+
+OUTPUT_FORMATS = ["text", "jsonl", "csv"]
+
+RESULT_FIELDS = ["input", "vehicle_id", "confidence", "candidate_count", "elapsed_ms"]
+
+
+def read_descriptions(stream: TextIO) -> Iterator[str]:
+    """
+    Lazily read descriptions from a text stream, one per line, skipping blank lines.
+
+    Args:
+        stream: An open text file or stdin.
+
+    Yields:
+        str: Each non-empty description with surrounding whitespace removed.
+    """
+    for line in stream:
+        description = line.strip()
+        if description:
+            yield description
+
+
+def read_keyed_descriptions(stream: TextIO,
+                            positional_keys: bool = True) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    Lazily read keyed descriptions from a text stream, skipping blank lines.
+
+    A line of the form `key<TAB>description`, e.g. a listing id followed by its
+    description, is keyed by the text before the tab. Any other line is keyed by its
+    description's 1-based position in the input.
+
+    Args:
+        stream: An open text file or stdin.
+        positional_keys: If False, lines without a key are keyed by None instead of
+            their position, e.g. where keys must name existing rows.
+
+    Yields:
+        Tuple[Optional[str], str]: The key and description of each non-empty line.
+    """
+    for position, line in enumerate(read_descriptions(stream), start=1):
+        key, tab, description = line.partition("\t")
+        key, description = key.strip(), description.strip()
+        if tab and key and description:
+            yield key, description
+        else:
+            yield (str(position) if positional_keys else None), line
+
+
+def chunked(items: Iterable[T], size: int) -> Iterator[List[T]]:
+    """
+    Split an iterable into lists of at most `size` items without materialising it.
+
+    Args:
+        items: The items to split.
+        size: Maximum number of items per chunk.
+
+    Yields:
+        List: Consecutive chunks of items.
+
+    Raises:
+        ValueError: If size is less than 1.
+    """
+    if size < 1:
+        raise ValueError(f"Chunk size must be at least 1, got {size}")
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def result_record(result: MatchResult) -> Dict[str, Any]:
+    """
+    Flatten a MatchResult into the fields written by the machine-readable formats.
+
+    Args:
+        result: The result to flatten.
+
+    Returns:
+        Dict[str, Any]: Values keyed by RESULT_FIELDS.
+    """
+    return {
+        "input": result.description,
+        "vehicle_id": result.vehicle.id if result.vehicle else None,
+        "confidence": result.confidence,
+        "candidate_count": result.candidate_count,
+        "elapsed_ms": round(result.elapsed_ms, 3),
+    }
+
+
+class ResultWriter(ABC):
+    """
+    Base class for writers that emit match results to a stream one at a time.
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, result: MatchResult) -> None:
+        """Write a single match result."""
+        self.count += 1
+        self._write(result)
+
+    @abstractmethod
+    def _write(self, result: MatchResult) -> None:
+        """Write a single match result in the writer's format."""
+
+    def flush(self) -> None:
+        """Flush everything written so far to the underlying stream."""
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Finish the output and flush it."""
+        self.flush()
+
+
+class TextResultWriter(ResultWriter):
+    """Writes human-readable result blocks."""
+
+    def _write(self, result: MatchResult) -> None:
+        vehicle = result.vehicle
+        lines = [f"Input {self.count}: '{result.description}'", "-" * 60]
+        if vehicle:
+            lines += [
+                f"  Matched vehicle with confidence score: {result.confidence}",
+                f"  {vehicle.make} {vehicle.model} {vehicle.badge}",
+                f"     Transmission: {vehicle.transmission_type}",
+                f"     Fuel Type: {vehicle.fuel_type}",
+                f"     Drive Type: {vehicle.drive_type}",
+                f"     Vehicle ID: {vehicle.id}",
+                f"     Listings Available: {vehicle.listing_count}",
+            ]
+        else:
+            lines.append("❌ No matching vehicles found")
+        lines += ["", "=" * 80, "", ""]
+        self.stream.write("\n".join(lines))
+
+    def close(self) -> None:
+        self.stream.write(f"Processed {self.count} descriptions\n")
+        super().close()
+
+
+class JsonLinesResultWriter(ResultWriter):
+    """Writes one JSON object per result."""
+
+    def _write(self, result: MatchResult) -> None:
+        self.stream.write(json.dumps(result_record(result), ensure_ascii=False) + "\n")
+
+
+class CsvResultWriter(ResultWriter):
+    """Writes results as CSV rows under a header row."""
+
+    def __init__(self, stream: TextIO):
+        super().__init__(stream)
+        self.writer = csv.DictWriter(stream, fieldnames=RESULT_FIELDS)
+        self.writer.writeheader()
+
+    def _write(self, result: MatchResult) -> None:
+        self.writer.writerow(result_record(result))
+
+
+def create_result_writer(output_format: str, stream: TextIO) -> ResultWriter:
+    """
+    Create the writer for an output format.
+
+    Args:
+        output_format: One of OUTPUT_FORMATS.
+        stream: The stream to write results to.
+
+    Returns:
+        ResultWriter: A writer for the format.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    writers = {
+        "text": TextResultWriter,
+        "jsonl": JsonLinesResultWriter,
+        "csv": CsvResultWriter,
+    }
+    if output_format not in writers:
+        raise ValueError(
+            f"Unsupported output format '{output_format}', expected one of {OUTPUT_FORMATS}"
+        )
+    return writers[output_format](stream)
@@ -0,0 +1,10 @@
+"""
+Names of the candidate retrieval backends of VehicleMatcher.
+
+Kept free of imports, so the command line runner can offer them as choices without
+loading the matcher or the database driver.
+"""
+
+# Where candidates are ranked: fetched and scored in Python, or ranked by trigram
+# similarity in Postgres with only the top few fetched
+RETRIEVAL_BACKENDS = ("python", "trigram")
@@ -0,0 +1,358 @@
+"""
+Make-sharded matching, for spreading the catalogue over several matchers or nodes.
+
+Each shard is a VehicleMatcher holding the vocabulary, catalogue and indexes of a
+group of makes only (see `VehicleMatcher(makes=...)`), in this process or behind a
+matching service on another node. A MakeRouter finds the makes a description names,
+by their names and aliases or by the models they make, and sends the description to
+the shards holding them. Descriptions naming no known make or model go to every
+shard, and the best of the shards' results is kept.
+
+Usage:
+    python src/shard_router.py plan 4   # split the makes into 4 shards of similar size
+"""
+
+import argparse
+import heapq
+import json
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import yaml
+from db_client import DatabaseClient
+from match_result import MatchResult
+from term_matcher import TermMatcher
+from vehicle import Vehicle
+from vehicle_matcher import VehicleMatcher
+from vehicle_scorer import VehicleScorer
+
+# Matches a batch of descriptions, e.g. `VehicleMatcher.match_descriptions` of one shard
+Shard = Callable[[List[str]], List[MatchResult]]
+
+MAKE_SIZES_SQL = """
+SELECT make, COUNT(*) AS vehicle_count
+FROM vehicle
+WHERE make IS NOT NULL
+GROUP BY make
+ORDER BY vehicle_count DESC, make
+"""
+
+MAKE_MODELS_SQL = "SELECT DISTINCT make, model FROM vehicle WHERE make IS NOT NULL AND model IS NOT NULL"
+
+
+def plan_shards(db_client: DatabaseClient, shard_count: int) -> List[List[str]]:
+    """
+    Split the makes into groups with similar numbers of vehicles, one per shard.
+
+    Makes are placed largest first, each in the group with the fewest vehicles so far.
+
+    Args:
+        db_client: Client used to count the vehicles of each make.
+        shard_count: Number of groups.
+
+    Returns:
+        List[List[str]]: The sorted makes of each shard. Shards get no make if there
+        are fewer makes than shards.
+
+    Raises:
+        ValueError: If shard_count is less than 1.
+    """
+    if shard_count < 1:
+        raise ValueError(f"shard_count must be at least 1, got {shard_count}")
+    shards: List[List[str]] = [[] for _ in range(shard_count)]
+    # (vehicle count, shard index), so ties go to the lowest index
+    sizes = [(0, index) for index in range(shard_count)]
+    for row in db_client.query(MAKE_SIZES_SQL):
+        size, index = heapq.heappop(sizes)
+        shards[index].append(row['make'])
+        heapq.heappush(sizes, (size + row['vehicle_count'], index))
+    return [sorted(makes) for makes in shards]
+
+
+class MakeRouter:
+    """
+    Finds the shards that can match a description from the makes it names.
+
+    Only the names and aliases of makes and models are compiled into its term
+    matcher, so a router is much lighter than a matcher. A description naming a make
+    goes to the shards holding that make; one naming only models goes to the shards
+    holding the makes of those models; any other goes to every shard.
+    """
+
+    def __init__(self, db_client: DatabaseClient, shard_makes: Sequence[Collection[str]],
+                 yaml_file: Optional[str] = None):
+        """
+        Load the make and model vocabulary.
+
+        Args:
+            db_client: Client used to query the distinct makes and models.
+            shard_makes: The makes held by each shard.
+            yaml_file: Optional path to the YAML file of attribute aliases.
+        """
+        self.shard_count = len(shard_makes)
+        self._shards_by_make: Dict[str, Set[int]] = {}
+        for index, makes in enumerate(shard_makes):
+            for make in makes:
+                self._shards_by_make.setdefault(make, set()).add(index)
+        self._makes_by_model: Dict[str, Set[str]] = {}
+        for row in db_client.query(MAKE_MODELS_SQL):
+            self._makes_by_model.setdefault(row['model'], set()).add(row['make'])
+        aliases = self._load_aliases(yaml_file) if yaml_file else {}
+        makes = set().union(*self._makes_by_model.values())
+        self.term_matcher = TermMatcher(
+            (attribute_type, name, term)
+            for attribute_type, names in (('make', sorted(makes)), ('model', sorted(self._makes_by_model)))
+            for name in names
+            for term in [name] + aliases.get((attribute_type, name), [])
+        )
+
+    @staticmethod
+    def _load_aliases(yaml_file: str) -> Dict[Tuple[str, str], List[str]]:
+        """
+        Read the aliases of makes and models from the YAML file.
+        """
+        try:
+            with open(yaml_file, 'r') as file:
+                yaml_data = yaml.safe_load(file)
+        except Exception as e:
+            print(f"Error loading YAML aliases: {e}")
+            return {}
+        return {
+            (attribute_type, yaml_attr['name']): yaml_attr.get('aliases', [])
+            for attribute_type in ('make', 'model')
+            for yaml_attr in yaml_data.get(attribute_type) or []
+        }
+
+    def route(self, description: str) -> List[int]:
+        """
+        Find the shards to send a description to.
+
+        Args:
+            description: The vehicle description.
+
+        Returns:
+            List[int]: Indexes of the shards, in order. Every shard if the description
+            names no make or model that a shard holds.
+        """
+        matches = self.term_matcher.find_all(description)
+        makes = {match.name for match in matches if match.attribute_type == 'make'}
+        if not makes:
+            makes = set().union(*(self._makes_by_model[match.name] for match in matches))
+        shards = set().union(*(self._shards_by_make.get(make, set()) for make in makes))
+        return sorted(shards) if shards else list(range(self.shard_count))
+
+
+class ShardedVehicleMatcher:
+    """
+    Matches descriptions on the shards a MakeRouter picks for them.
+
+    A batch is split into one sub-batch per shard, and the shards are called
+    concurrently. A description sent to several shards gets the result with the
+    highest confidence; results tied on confidence are ranked by fuzzy score and then
+    listing count, as candidates from a single matcher would be.
+    """
+
+    def __init__(self, router: MakeRouter, shards: Sequence[Shard]):
+        """
+        Initialize the ShardedVehicleMatcher.
+
+        Args:
+            router: Router over the makes held by each shard.
+            shards: One batch matching function per shard, in the router's order, e.g.
+                `VehicleMatcher.match_descriptions` or a RemoteShard.
+
+        Raises:
+            ValueError: If the router and the shards disagree on the number of shards.
+        """
+        if router.shard_count != len(shards):
+            raise ValueError(f"The router has {router.shard_count} shards, got {len(shards)}")
+        self.router = router
+        self.shards = list(shards)
+        self.scorer = VehicleScorer()
+        self._executor = ThreadPoolExecutor(max_workers=max(len(shards), 1),
+                                            thread_name_prefix="shard")
+
+    @classmethod
+    def local(cls, db_client: DatabaseClient, shard_makes: Sequence[Collection[str]],
+              yaml_file: Optional[str] = None, **matcher_kwargs: Any) -> "ShardedVehicleMatcher":
+        """
+        Build a sharded matcher whose shards are VehicleMatchers in this process.
+
+        Args:
+            db_client: Client shared by the router and the shards.
+            shard_makes: The makes of each shard, e.g. from `plan_shards`.
+            yaml_file: Optional path to the YAML file of attribute aliases.
+            **matcher_kwargs: Passed on to every shard's VehicleMatcher.
+
+        Returns:
+            ShardedVehicleMatcher: The sharded matcher.
+        """
+        matchers = [VehicleMatcher(db_client, yaml_file, makes=makes, **matcher_kwargs)
+                    for makes in shard_makes]
+        return cls(MakeRouter(db_client, shard_makes, yaml_file),
+                   [matcher.match_descriptions for matcher in matchers])
+
+    def close(self) -> None:
+        """Stop the threads the shards are called on."""
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ShardedVehicleMatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def find_best_matching_vehicle(self, description: str) -> Tuple[Optional[Vehicle], int]:
+        """
+        Find the vehicle that best matches the given description on its shards.
+
+        Args:
+            description: Natural language vehicle description.
+
+        Returns:
+            Tuple[Vehicle, int]: Best matching vehicle and confidence score (0-10).
+            (None, 0) if no shard found a match.
+        """
+        [result] = self.match_descriptions([description])
+        return result.vehicle, result.confidence
+
+    def find_best_matching_vehicles(self, descriptions: Iterable[str]) -> List[Tuple[Optional[Vehicle], int]]:
+        """
+        Find the best matching vehicle for each of a batch of descriptions.
+
+        Args:
+            descriptions: Natural language vehicle descriptions.
+
+        Returns:
+            List[Tuple[Vehicle, int]]: Best matching vehicle and confidence score for
+            each description, in input order.
+        """
+        return [(result.vehicle, result.confidence) for result in self.match_descriptions(descriptions)]
+
+    def match_descriptions(self, descriptions: Iterable[str]) -> List[MatchResult]:
+        """
+        Match a batch of descriptions, each on the shards its makes are held by.
+
+        Args:
+            descriptions: Natural language vehicle descriptions.
+
+        Returns:
+            List[MatchResult]: One result per description, in input order.
+        """
+        descriptions = list(descriptions)
+        positions_by_shard: Dict[int, List[int]] = {}
+        for position, description in enumerate(descriptions):
+            for shard in self.router.route(description):
+                positions_by_shard.setdefault(shard, []).append(position)
+        futures = {
+            shard: self._executor.submit(self.shards[shard], [descriptions[position] for position in positions])
+            for shard, positions in positions_by_shard.items()
+        }
+        results_by_position: List[List[MatchResult]] = [[] for _ in descriptions]
+        for shard, future in futures.items():
+            for position, result in zip(positions_by_shard[shard], future.result()):
+                results_by_position[position].append(result)
+        return [self._merge(description, results)
+                for description, results in zip(descriptions, results_by_position)]
+
+    def _merge(self, description: str, results: List[MatchResult]) -> MatchResult:
+        """
+        Keep the best of the results of one description from several shards.
+        """
+        if len(results) == 1:
+            return results[0]
+        matched = [result for result in results if result.vehicle is not None]
+        if not matched:
+            return results[0]
+        confidence = max(result.confidence for result in matched)
+        best = [result for result in matched if result.confidence == confidence]
+        if len(best) > 1:
+            vehicle, _ = self.scorer.best_vehicle(description, [result.vehicle for result in best])
+            best = [result for result in best if result.vehicle is vehicle]
+        return MatchResult(
+            description=description,
+            vehicle=best[0].vehicle,
+            confidence=confidence,
+            candidate_count=sum(result.candidate_count for result in results),
+            matched_attributes=best[0].matched_attributes,
+            elapsed_ms=max(result.elapsed_ms for result in results),
+        )
+
+
+def result_from_json(record: Dict[str, Any]) -> MatchResult:
+    """
+    Convert a result returned by the matching service back into a MatchResult.
+
+    Args:
+        record: One result, as produced by `match_service.result_json`.
+
+    Returns:
+        MatchResult: The result.
+    """
+    return MatchResult(
+        description=record['input'],
+        vehicle=Vehicle(**record['vehicle']) if record.get('vehicle') else None,
+        confidence=record['confidence'],
+        candidate_count=record.get('candidate_count', 0),
+        matched_attributes=record.get('matched_attributes') or {},
+        elapsed_ms=record.get('elapsed_ms', 0.0),
+    )
+
+
+class RemoteShard:
+    """
+    A shard served by a matching service on another node (see `match_service.py
+    --makes`), called through its /match/batch endpoint.
+    """
+
+    def __init__(self, url: str, timeout: float = 30.0):
+        """
+        Initialize the RemoteShard.
+
+        Args:
+            url: Base URL of the service, e.g. http://matcher-1:8080.
+            timeout: Seconds to wait for a batch to be matched.
+        """
+        self.url = url.rstrip("/") + "/match/batch"
+        self.timeout = timeout
+
+    def __call__(self, descriptions: List[str]) -> List[MatchResult]:
+        """
+        Match a batch of descriptions on the remote shard.
+
+        Args:
+            descriptions: The descriptions to match.
+
+        Returns:
+            List[MatchResult]: One result per description, in input order.
+
+        Raises:
+            urllib.error.URLError: If the service cannot be reached or fails.
+        """
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"descriptions": descriptions}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            body = json.load(response)
+        return [result_from_json(record) for record in body["results"]]
+
+
+def main() -> None:
+    """
+    Command line entry point for planning shards.
+    """
+    parser = argparse.ArgumentParser(description="Split the catalogue into make shards.")
+    parser.add_argument("command", choices=["plan"])
+    parser.add_argument("shards", type=int, help="number of shards")
+    args = parser.parse_args()
+
+    with DatabaseClient() as db_client:
+        for index, makes in enumerate(plan_shards(db_client, args.shards)):
+            print(f"{index}: {','.join(makes)}")
+
+
+if __name__ == "__main__":
+    main()
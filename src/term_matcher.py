@@ -0,0 +1,126 @@
+"""
+Single-pass multi-pattern matching of attribute terms using an Aho-Corasick automaton.
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+
+@dataclass(frozen=True)
+class TermMatch:
+    """
+    A single occurrence of a vocabulary term in a description.
+
+    Attributes:
+        attribute_type (str): The attribute type the term belongs to (e.g. 'make').
+        name (str): The canonical attribute value the term stands for.
+        term (str): The term that matched, as written in the vocabulary.
+        term_index (int): Position of the term in the vocabulary the matcher was built from.
+        start (int): Start offset of the match in the lowercased description.
+        end (int): End offset (exclusive) of the match in the lowercased description.
+        distance (int): Number of edits between the term and the matched text; 0 for
+            exact matches (see `fuzzy_terms.FuzzyTermIndex`).
+    """
+    attribute_type: str
+    name: str
+    term: str
+    term_index: int
+    start: int
+    end: int
+    distance: int = 0
+
+
+class TermMatcher:
+    """
+    Case-insensitive substring matcher over a fixed vocabulary of terms.
+
+    All terms are compiled once into an Aho-Corasick automaton, so a description is
+    scanned in a single pass regardless of how many terms there are, and overlapping
+    terms (such as 'Petrol' inside 'Hybrid-Petrol') are all reported.
+
+    Example:
+        >>> matcher = TermMatcher([('make', 'Volkswagen', 'VW'), ('model', 'Golf', 'Golf')])
+        >>> [(m.name, m.start, m.end) for m in matcher.find_all('vw golf gti')]
+        [('Volkswagen', 0, 2), ('Golf', 3, 7)]
+    """
+
+    def __init__(self, terms: Iterable[Tuple[str, str, str]]):
+        """
+        Compile the automaton.
+
+        Args:
+            terms: (attribute_type, canonical name, term) triples. Empty terms are ignored.
+        """
+        self.terms: List[Tuple[str, str, str]] = list(terms)
+        self._term_lengths: List[int] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[int]] = [[]]
+
+        for term_index, (_, _, term) in enumerate(self.terms):
+            key = term.lower()
+            self._term_lengths.append(len(key))
+            if not key:
+                continue
+            node = 0
+            for char in key:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                    self._goto[node][char] = next_node
+                node = next_node
+            self._outputs[node].append(term_index)
+
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        """Link every node to its longest proper suffix in the trie, breadth first."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                # A node also completes every term that ends at its suffix link
+                self._outputs[child].extend(self._outputs[self._fail[child]])
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def find_all(self, text: str) -> List[TermMatch]:
+        """
+        Find every occurrence of every term in the text.
+
+        Args:
+            text: The text to scan. Matching is case-insensitive.
+
+        Returns:
+            List[TermMatch]: All matches, ordered by end offset.
+        """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        matches = []
+        node = 0
+        for end, char in enumerate(text.lower(), 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term_index in outputs[node]:
+                attribute_type, name, term = self.terms[term_index]
+                matches.append(TermMatch(
+                    attribute_type=attribute_type,
+                    name=name,
+                    term=term,
+                    term_index=term_index,
+                    start=end - self._term_lengths[term_index],
+                    end=end,
+                ))
+        return matches
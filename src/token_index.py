@@ -0,0 +1,173 @@
+"""
+Inverted index from model and badge tokens to vehicles, weighted by inverse document
+frequency, for descriptions that name no recognisable attribute.
+"""
+
+import heapq
+import math
+import re
+from typing import Collection, Dict, Generic, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+from db_client import DatabaseClient
+from vehicle_catalogue import VehicleCatalogue
+
+Key = TypeVar("Key", bound=Hashable)
+
+# Model and badge of every vehicle, optionally of some makes only, for indexing vehicles by id
+TOKEN_SOURCE_SQL = (
+    "SELECT id, model, badge FROM vehicle WHERE %s::text[] IS NULL OR make = ANY(%s) ORDER BY id"
+)
+
+# Vehicle fields whose tokens are indexed
+TOKEN_COLUMNS = ['model', 'badge']
+
+_WORD = re.compile(r"\S+")
+_ALPHANUMERIC_RUN = re.compile(r"[a-z0-9]+")
+_LETTERS_OR_DIGITS = re.compile(r"[a-z]+|[0-9]+")
+
+
+def tokenize(text: str) -> Set[str]:
+    """
+    Split text into the tokens it is indexed and searched by.
+
+    Every whitespace-separated word contributes itself with punctuation removed
+    ('R-Line' -> 'rline'), its punctuation-separated parts ('r', 'line') and, for
+    words mixing letters and digits such as engine codes, its letter and digit runs
+    ('110TSI' -> '110tsi', '110', 'tsi'). So 'R-Line', 'RLine' and 'R Line', or
+    '110TSI' and '110 TSI', share tokens.
+
+    Args:
+        text: Text to tokenize.
+
+    Returns:
+        Set[str]: The lowercase tokens.
+    """
+    tokens: Set[str] = set()
+    for word in _WORD.findall(text.lower()):
+        parts = _ALPHANUMERIC_RUN.findall(word)
+        joined = "".join(parts)
+        if not joined:
+            continue
+        tokens.add(joined)
+        tokens.update(parts)
+        tokens.update(_LETTERS_OR_DIGITS.findall(joined))
+    return tokens
+
+
+class TokenIndex(Generic[Key]):
+    """
+    Maps every token of the indexed vehicles' models and badges to the vehicles
+    carrying it, and retrieves the vehicles sharing the most informative tokens
+    with a description.
+
+    Tokens are weighted by inverse document frequency, so a rare badge token such
+    as '162tsi' counts for far more than a common one. Tokens carried by more than
+    `max_document_frequency` of the vehicles are not indexed at all, which bounds
+    the work of a search. Vehicles are identified by any hashable key: catalogue
+    positions or vehicle ids.
+    """
+
+    def __init__(self, documents: Iterable[Tuple[Key, Iterable[str]]],
+                 max_document_frequency: float = 0.2):
+        """
+        Build the index.
+
+        Args:
+            documents: (key, texts) for every vehicle, e.g. its model and badge.
+            max_document_frequency: Largest fraction of the vehicles a token may
+                occur in and still be indexed.
+        """
+        postings: Dict[str, List[Key]] = {}
+        token_cache: Dict[str, Set[str]] = {}
+        self.size = 0
+        for key, texts in documents:
+            self.size += 1
+            tokens: Set[str] = set()
+            for text in texts:
+                if not text:
+                    continue
+                text_tokens = token_cache.get(text)
+                if text_tokens is None:
+                    text_tokens = token_cache[text] = tokenize(text)
+                tokens |= text_tokens
+            for token in tokens:
+                postings.setdefault(token, []).append(key)
+
+        max_postings = max(1, int(self.size * max_document_frequency))
+        self.postings: Dict[str, List[Key]] = {
+            token: keys for token, keys in postings.items() if len(keys) <= max_postings
+        }
+        # BM25-style inverse document frequency, positive for every indexed token
+        self.idf: Dict[str, float] = {
+            token: math.log(1 + (self.size - len(keys) + 0.5) / (len(keys) + 0.5))
+            for token, keys in self.postings.items()
+        }
+
+    @classmethod
+    def from_catalogue(cls, catalogue: VehicleCatalogue, **kwargs) -> "TokenIndex[int]":
+        """
+        Index the vehicles of a catalogue by position, skipping removed ones.
+
+        Args:
+            catalogue: The catalogue to index.
+            **kwargs: Passed on to the constructor.
+
+        Returns:
+            TokenIndex[int]: Index of catalogue positions.
+        """
+        columns = [(catalogue.values[column], catalogue.codes[column]) for column in TOKEN_COLUMNS]
+        return cls(
+            ((position, [values[codes[position]] for values, codes in columns])
+             for position in range(len(catalogue.ids)) if position not in catalogue.removed),
+            **kwargs,
+        )
+
+    @classmethod
+    def load(cls, db_client: DatabaseClient, makes: Optional[Collection[str]] = None,
+             **kwargs) -> "TokenIndex[str]":
+        """
+        Index every vehicle in the database by id.
+
+        Args:
+            db_client: Client used to query the `vehicle` table.
+            makes: If given, index only the vehicles of these makes.
+            **kwargs: Passed on to the constructor.
+
+        Returns:
+            TokenIndex[str]: Index of vehicle ids.
+        """
+        makes = sorted(makes) if makes is not None else None
+        rows = db_client.query(TOKEN_SOURCE_SQL, (makes, makes))
+        return cls(((row['id'], [row[column] for column in TOKEN_COLUMNS]) for row in rows), **kwargs)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def search(self, text: str, limit: int = 50, min_score: Optional[float] = None) -> List[Key]:
+        """
+        Find the vehicles sharing the highest-weighted tokens with the text.
+
+        Args:
+            text: The description to search for.
+            limit: Maximum number of vehicles returned.
+            min_score: Minimum summed IDF weight of a returned vehicle. Defaults to
+                the weight of the text's single most informative indexed token, so a
+                vehicle must share at least that much evidence.
+
+        Returns:
+            List[Key]: Keys of the best vehicles, highest score first and ties by
+            key. Empty if the text shares no indexed token.
+        """
+        weights = {token: self.idf[token] for token in tokenize(text) if token in self.postings}
+        if not weights:
+            return []
+        if min_score is None:
+            min_score = max(weights.values())
+        scores: Dict[Key, float] = {}
+        for token, weight in weights.items():
+            for key in self.postings[token]:
+                scores[key] = scores.get(key, 0.0) + weight
+        return heapq.nsmallest(
+            limit,
+            (key for key, score in scores.items() if score >= min_score - 1e-9),
+            key=lambda key: (-scores[key], key),
+        )
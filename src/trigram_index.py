@@ -0,0 +1,76 @@
+"""
+Trigram index over vehicle descriptions, used to rank candidates inside the database.
+
+Usage:
+    python src/trigram_index.py migrate   # install pg_trgm, the description column and its index
+    python src/trigram_index.py status    # show whether the index is in place
+"""
+
+import argparse
+from pathlib import Path
+import psycopg2
+from db_client import DatabaseClient
+
+MIGRATION_FILE = Path(__file__).resolve().parent.parent / "migrations" / "002_vehicle_description_trigram.sql"
+
+INDEX_NAME = "vehicle_description_trgm_idx"
+
+STATUS_SQL = """
+SELECT EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') AS extension,
+       EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_name = 'vehicle' AND column_name = 'description'
+                 AND table_schema = ANY(current_schemas(false))) AS description_column,
+       to_regclass(%s) IS NOT NULL AS description_index
+"""
+
+
+def is_available(db_client: DatabaseClient) -> bool:
+    """
+    Check whether descriptions can be ranked by trigram similarity.
+
+    Args:
+        db_client: Client used to inspect the database.
+
+    Returns:
+        bool: True if pg_trgm is installed and `vehicle.description` exists.
+    """
+    try:
+        row = db_client.query(STATUS_SQL, (INDEX_NAME,))[0]
+    except psycopg2.Error:
+        return False
+    return row["extension"] and row["description_column"]
+
+
+def migrate(db_client: DatabaseClient) -> None:
+    """
+    Install pg_trgm and add the `vehicle.description` column and its trigram index
+    if missing.
+
+    Args:
+        db_client: Client used to run the migration.
+
+    Raises:
+        psycopg2.Error: If the extension is not available to the server.
+    """
+    db_client.query(MIGRATION_FILE.read_text())
+
+
+def main() -> None:
+    """
+    Command line entry point for managing the trigram index.
+    """
+    parser = argparse.ArgumentParser(description="Manage the trigram index over vehicle descriptions.")
+    parser.add_argument("command", choices=["migrate", "status"])
+    args = parser.parse_args()
+
+    with DatabaseClient() as db_client:
+        if args.command == "migrate":
+            migrate(db_client)
+            print(f"Created vehicle.description and {INDEX_NAME} (if missing)")
+        row = db_client.query(STATUS_SQL, (INDEX_NAME,))[0]
+        for name, present in row.items():
+            print(f"{name.replace('_', ' ')}: {'present' if present else 'missing'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
 
-@dataclass
+@dataclass(slots=True)
 class Vehicle:
     """
     Data class representing a vehicle.
@@ -32,15 +33,16 @@ class Vehicle:
     def __hash__(self) -> int:
         return hash(self.id)
 
+    def description_fields(self) -> Tuple[str, ...]:
+        """Return the attribute values the description is built from, in order."""
+        return (self.make, self.model, self.badge, self.transmission_type, self.fuel_type, self.drive_type)
+
     def get_description(self) -> str:
-        attributes = [
-            self.make or "",
-            self.model or "", 
-            self.badge or "",
-            self.transmission_type or "",
-            self.fuel_type or "",
-            self.drive_type or ""
-        ]
+        return Vehicle.describe(self.description_fields())
+
+    @staticmethod
+    def describe(attributes: Iterable[Optional[str]]) -> str:
+        """Join the non-empty attribute values into a lowercase description."""
         return " ".join(attr for attr in attributes if attr).lower()
 
     @staticmethod
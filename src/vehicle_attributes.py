@@ -1,71 +1,262 @@
-from typing import Dict, List, Optional
+from typing import Any, Collection, Dict, List, Optional, Set, Tuple
 import yaml
 from db_client import DatabaseClient
+from fuzzy_terms import FuzzyTermIndex
 from vehicle_attribute import VehicleAttribute
+from term_matcher import TermMatch, TermMatcher
+
+# Distinct values of an attribute, optionally only among vehicles of some makes
+ATTRIBUTE_VALUES_SQL = (
+    "SELECT DISTINCT {attribute_type} FROM vehicle "
+    "WHERE {attribute_type} IS NOT NULL AND (%s::text[] IS NULL OR make = ANY(%s))"
+)
 
 class VehicleAttributes:
-    def __init__(self, db_client: DatabaseClient, yaml_file: Optional[str] = None):
+    def __init__(self, db_client: DatabaseClient, yaml_file: Optional[str] = None,
+                 makes: Optional[Collection[str]] = None):
+        """
+        Load the attribute vocabulary and compile it into a term matcher.
+
+        Args:
+            db_client: Client used to query the distinct attribute values.
+            yaml_file: Optional path to a YAML file of attribute aliases.
+            makes: If given, only the makes listed, and the models and other values
+                of their vehicles, are known, as for one shard of a sharded matcher.
+
+        Raises:
+            psycopg2.Error: If the attribute values cannot be queried.
+            OSError, yaml.YAMLError, ValueError: If the alias file cannot be read or
+                is malformed.
+        """
         self.db_client = db_client
+        self.yaml_file = yaml_file
+        self.makes: Optional[List[str]] = sorted(makes) if makes is not None else None
         self.attribute_types = ['make', 'model', 'transmission_type', 'fuel_type', 'drive_type']
-        self.attribute_values: Dict[str, List[VehicleAttribute]] = {}
-        self._load_attribute_values_from_db()
-        if yaml_file:
-            self._load_attribute_values_from_yaml(yaml_file)
-    
-    def _load_attribute_values_from_db(self) -> None:
+        self.reload()
+
+    def to_vocabulary(self) -> Dict[str, Any]:
+        """
+        Return the attribute values and their aliases as plain, JSON-serialisable data.
+
+        Returns:
+            Dict[str, Any]: Data from which `from_vocabulary` rebuilds the vocabulary
+            without querying the database or reading the alias file.
+        """
+        return {
+            'yaml_file': self.yaml_file,
+            'makes': self.makes,
+            'attribute_values': {
+                attribute_type: [[attr.name, list(attr.aliases)] for attr in attributes]
+                for attribute_type, attributes in self.attribute_values.items()
+            },
+            'db_attribute_names': self._db_attribute_names,
+        }
+
+    @classmethod
+    def from_vocabulary(cls, db_client: DatabaseClient, vocabulary: Dict[str, Any]) -> "VehicleAttributes":
+        """
+        Rebuild a VehicleAttributes, and compile its term matcher, from `to_vocabulary` data.
+
+        Args:
+            db_client: Client used by later reloads.
+            vocabulary: Data returned by `to_vocabulary`.
+
+        Returns:
+            VehicleAttributes: The rebuilt vocabulary.
+
+        Raises:
+            KeyError, TypeError, ValueError: If the data is not shaped like `to_vocabulary`'s.
+        """
+        vehicle_attributes = cls.__new__(cls)
+        vehicle_attributes.db_client = db_client
+        vehicle_attributes.yaml_file = vocabulary['yaml_file']
+        vehicle_attributes.makes = vocabulary['makes']
+        vehicle_attributes.attribute_values = {
+            attribute_type: [VehicleAttribute(name=name, aliases=list(aliases)) for name, aliases in attributes]
+            for attribute_type, attributes in vocabulary['attribute_values'].items()
+        }
+        vehicle_attributes.attribute_types = list(vehicle_attributes.attribute_values)
+        vehicle_attributes._db_attribute_names = dict(vocabulary['db_attribute_names'])
+        vehicle_attributes.term_matcher = cls._compile(vehicle_attributes.attribute_values)
+        vehicle_attributes._fuzzy_index = None
+        return vehicle_attributes
+
+    def reload(self, db_values: bool = True) -> None:
+        """
+        Re-read the attribute values and aliases, then swap in a new term matcher.
+
+        The new vocabulary is built aside and swapped in only once complete, so
+        concurrent calls to `find_matching_attributes` are never blocked, and a reload
+        that fails, e.g. on a half-written alias file, leaves the previous vocabulary
+        in place.
+
+        Args:
+            db_values: Re-query the distinct attribute values from the database. If
+                False, only the YAML aliases are re-read.
+
+        Raises:
+            psycopg2.Error: If the attribute values cannot be queried.
+            OSError, yaml.YAMLError, ValueError: If the alias file cannot be read or
+                is malformed.
+        """
+        db_attribute_names = self._query_attribute_names() if db_values else self._db_attribute_names
+        attribute_values = {
+            attribute_type: [VehicleAttribute(name=name) for name in names]
+            for attribute_type, names in db_attribute_names.items()
+        }
+        if self.yaml_file:
+            self._add_aliases(attribute_values, self._read_aliases(self.yaml_file))
+        term_matcher = self._compile(attribute_values)
+        # Kept so that aliases can be re-applied without querying the database again
+        self._db_attribute_names = db_attribute_names
+        self.attribute_values = attribute_values
+        # Built from the same terms on first use, as only fuzzy matching needs it
+        self._fuzzy_index: Optional[Tuple[TermMatcher, FuzzyTermIndex]] = None
+        self.term_matcher = term_matcher
+
+    def _query_attribute_names(self) -> Dict[str, List[str]]:
         """
-        Load distinct attribute values from the database for each attribute type,
-        then supplement with aliases from YAML file if provided.
+        Query the distinct values of each attribute type from the database.
         """
-        # First load from database
+        attribute_names = {}
         for attribute_type in self.attribute_types:
-            try:
-                sql = f"SELECT DISTINCT {attribute_type} FROM vehicle WHERE {attribute_type} IS NOT NULL"
-                results = self.db_client.query(sql)
-                # Create VehicleAttribute objects from database values
-                self.attribute_values[attribute_type] = [
-                    VehicleAttribute(name=row[attribute_type]) for row in results
-                ]
-            except Exception as e:
-                print(f"Error loading {attribute_type} values: {e}")
-                self.attribute_values[attribute_type] = []
-        
-    def _load_attribute_values_from_yaml(self, yaml_file) -> None:
+            sql = ATTRIBUTE_VALUES_SQL.format(attribute_type=attribute_type)
+            rows = self.db_client.query(sql, (self.makes, self.makes))
+            attribute_names[attribute_type] = [row[attribute_type] for row in rows]
+        return attribute_names
+
+    @staticmethod
+    def _read_aliases(yaml_file: str) -> Dict[str, List[Tuple[str, List[str]]]]:
+        """
+        Read the (name, aliases) pairs of each attribute type from the alias file.
+        """
+        with open(yaml_file, 'r') as file:
+            yaml_data = yaml.safe_load(file)
+        if not isinstance(yaml_data, dict):
+            raise ValueError(f"Alias file '{yaml_file}' does not map attribute types to values")
         try:
-            with open(yaml_file, 'r') as file:
-                yaml_data = yaml.safe_load(file)
-            
-            for attribute_type, yaml_attributes in yaml_data.items():
-                if attribute_type not in self.attribute_types:
+            return {
+                attribute_type: [(yaml_attr['name'], list(yaml_attr.get('aliases') or []))
+                                 for yaml_attr in yaml_attributes]
+                for attribute_type, yaml_attributes in yaml_data.items()
+            }
+        except (KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Alias file '{yaml_file}' has a malformed entry: {e!r}") from e
+
+    def _add_aliases(self, attribute_values: Dict[str, List[VehicleAttribute]],
+                     aliases: Dict[str, List[Tuple[str, List[str]]]]) -> None:
+        """
+        Add the aliases to the attribute values they name, and the values the database
+        does not know as new attributes.
+        """
+        for attribute_type, named_aliases in aliases.items():
+            if attribute_type not in self.attribute_types:
+                continue
+            existing_attrs = {attr.name: attr for attr in attribute_values[attribute_type]}
+            for name, term_aliases in named_aliases:
+                if name in existing_attrs:
+                    existing_attrs[name].aliases.extend(term_aliases)
+                elif self.makes is not None and attribute_type in ('make', 'model'):
+                    # Makes and models unknown to this shard belong to another
                     continue
-                
-                existing_attrs = {attr.name: attr for attr in self.attribute_values[attribute_type]}
-                
-                for yaml_attr in yaml_attributes:
-                    name = yaml_attr['name']
-                    aliases = yaml_attr.get('aliases', [])
-                    
-                    if name in existing_attrs:
-                        existing_attrs[name].aliases.extend(aliases)
-                    else:
-                        new_attr = VehicleAttribute(name=name, aliases=aliases)
-                        self.attribute_values[attribute_type].append(new_attr)
-        
-        except Exception as e:
-            print(f"Error loading YAML aliases: {e}")
-    
+                else:
+                    attribute_values[attribute_type].append(VehicleAttribute(name=name, aliases=term_aliases))
+
+    @staticmethod
+    def _compile(attribute_values: Dict[str, List[VehicleAttribute]]) -> TermMatcher:
+        """
+        Compile every name and alias of every attribute into a single TermMatcher.
+        """
+        return TermMatcher(
+            (attribute_type, vehicle_attribute.name, term)
+            for attribute_type, vehicle_attributes in attribute_values.items()
+            for vehicle_attribute in vehicle_attributes
+            for term in vehicle_attribute.get_all_terms()
+        )
+
+    def _fuzzy_index_for(self, term_matcher: TermMatcher) -> FuzzyTermIndex:
+        """
+        Return the typo-tolerant index over the terms of the given term matcher,
+        building it if the term matcher is new.
+        """
+        cached = self._fuzzy_index
+        if cached is not None and cached[0] is term_matcher:
+            return cached[1]
+        fuzzy_index = FuzzyTermIndex(term_matcher.terms)
+        self._fuzzy_index = (term_matcher, fuzzy_index)
+        return fuzzy_index
+
+    def find_term_matches(self, description: str) -> List[TermMatch]:
+        """
+        Find every occurrence of an attribute name or alias in the description.
+
+        Args:
+            description: The vehicle description to scan.
+
+        Returns:
+            List[TermMatch]: All matches with their attribute type, canonical name
+            and character span, ordered by end offset.
+        """
+        return self.term_matcher.find_all(description)
+
     def find_matching_attributes(self, description: str) -> Dict[str, List[str]]:
         """
         Find the attributes that match the description using names and aliases.
         Returns all matching canonical names for each matched attribute type.
+
+        A canonical name is listed once for every one of its terms found in the
+        description, so an attribute matched through both its name and an alias
+        appears twice.
+        """
+        term_matcher = self.term_matcher
+        return self._group_term_indexes(
+            term_matcher, {match.term_index for match in term_matcher.find_all(description)}
+        )
+
+    def find_matching_attributes_fuzzy(self, description: str) -> Tuple[Dict[str, List[str]], int]:
+        """
+        Find the attributes that match the description, tolerating typos.
+
+        Attribute types found exactly are matched as by `find_matching_attributes`.
+        For every other type, terms written with a small number of edits (see
+        `fuzzy_terms.FuzzyTermIndex`) outside the exact matches are accepted too,
+        so 'Amrok' still matches the model Amarok.
+
+        Args:
+            description: The vehicle description to scan.
+
+        Returns:
+            Tuple[Dict[str, List[str]], int]: The matching canonical names keyed by
+            attribute type, and the edit cost of the typo-tolerant matches: the
+            smallest edit distance of each fuzzy matched type, summed.
         """
-        matching_attributes = {}
-        for attribute_type, vehicle_attributes in self.attribute_values.items():
-            matches = []
-            for vehicle_attribute in vehicle_attributes:
-                for term in vehicle_attribute.get_all_terms():
-                    if term.lower() in description.lower():
-                        matches.append(vehicle_attribute.name)
-            if matches:
-                matching_attributes[attribute_type] = matches
-        return matching_attributes
\ No newline at end of file
+        # Both lookups use the same term matcher, even if a reload swaps it meanwhile
+        term_matcher = self.term_matcher
+        exact_matches = term_matcher.find_all(description)
+        matching_attributes = self._group_term_indexes(
+            term_matcher, {match.term_index for match in exact_matches}
+        )
+        fuzzy_matches = [
+            match for match in self._fuzzy_index_for(term_matcher).find_all(
+                description, exclude=[(match.start, match.end) for match in exact_matches])
+            if match.attribute_type not in matching_attributes
+        ]
+        edit_costs: Dict[str, int] = {}
+        for match in fuzzy_matches:
+            edit_costs[match.attribute_type] = min(edit_costs.get(match.attribute_type, match.distance),
+                                                   match.distance)
+        # Of each type, only the closest terms are kept
+        fuzzy_attributes = self._group_term_indexes(term_matcher, {
+            match.term_index for match in fuzzy_matches
+            if match.distance == edit_costs[match.attribute_type]
+        })
+        matching_attributes.update(fuzzy_attributes)
+        return matching_attributes, sum(edit_costs.values())
+
+    @staticmethod
+    def _group_term_indexes(term_matcher: TermMatcher, term_indexes: Set[int]) -> Dict[str, List[str]]:
+        matching_attributes: Dict[str, List[str]] = {}
+        for term_index in sorted(term_indexes):
+            attribute_type, name, _ = term_matcher.terms[term_index]
+            matching_attributes.setdefault(attribute_type, []).append(name)
+        return matching_attributes
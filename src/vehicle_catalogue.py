@@ -0,0 +1,290 @@
+"""
+In-memory, columnar snapshot of the vehicle catalogue with per-attribute inverted indexes.
+"""
+
+from array import array
+from itertools import chain
+from typing import Any, Collection, Dict, Iterable, List, Mapping, Optional, Set
+from db_client import DatabaseClient
+from vehicle import Vehicle
+from vehicle_scorer import preprocess
+
+INDEXED_ATTRIBUTES = ['make', 'model', 'transmission_type', 'fuel_type', 'drive_type']
+
+# Vehicle fields stored as dictionary-encoded columns, in Vehicle field order
+ATTRIBUTE_COLUMNS = ['make', 'model', 'badge', 'transmission_type', 'fuel_type', 'drive_type']
+
+CATALOGUE_SQL = """
+SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       COUNT(l.id) as listing_count
+FROM vehicle v
+LEFT JOIN listing l ON v.id = l.vehicle_id
+WHERE %s::text[] IS NULL OR v.make = ANY(%s)
+GROUP BY v.id
+ORDER BY v.id
+"""
+
+MATERIALISED_CATALOGUE_SQL = """
+SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       COALESCE(vlc.listing_count, 0) as listing_count
+FROM vehicle v
+LEFT JOIN vehicle_listing_count vlc ON v.id = vlc.vehicle_id
+WHERE %s::text[] IS NULL OR v.make = ANY(%s)
+ORDER BY v.id
+"""
+
+
+class VehicleCatalogue:
+    """
+    Snapshot of the `vehicle` table together with per-vehicle listing counts.
+
+    Vehicles are identified by their position in load order and stored column by
+    column: every attribute is dictionary-encoded into an array of integer codes,
+    listing counts are held in an array, and the normalised description each
+    vehicle is scored on is computed once at load. Every indexed attribute value
+    maps to the sorted positions of the vehicles carrying it, so filtering on
+    matched attributes needs neither a database round trip nor any per-vehicle
+    objects. `Vehicle` instances are only built on request, e.g. for the winner.
+
+    Catalogues are updated by building a changed copy with `with_changes`, so a
+    catalogue that is being searched is never modified.
+    """
+
+    def __init__(self, vehicles: Iterable[Vehicle] = ()):
+        """
+        Build the catalogue and its indexes from the given vehicles.
+
+        Args:
+            vehicles: Vehicles to hold, including their listing counts.
+        """
+        self.ids: List[str] = []
+        self.listing_counts = array('q')
+        # Normalised descriptions, as compared by VehicleScorer
+        self.descriptions: List[str] = []
+        self.codes: Dict[str, array] = {column: array('I') for column in ATTRIBUTE_COLUMNS}
+        self.values: Dict[str, List[str]] = {column: [] for column in ATTRIBUTE_COLUMNS}
+        self._value_codes: Dict[str, Dict[str, int]] = {column: {} for column in ATTRIBUTE_COLUMNS}
+        # Positions of the vehicles carrying each code of each indexed attribute
+        self.postings: Dict[str, List[array]] = {
+            attribute_type: [] for attribute_type in INDEXED_ATTRIBUTES
+        }
+        # Positions of vehicles removed by with_changes; their rows stay in the columns
+        self.removed: Set[int] = set()
+        for vehicle in vehicles:
+            self.append(vehicle.id, [getattr(vehicle, column) for column in ATTRIBUTE_COLUMNS],
+                        vehicle.listing_count, vehicle.get_description())
+
+    @classmethod
+    def load(cls, db_client: DatabaseClient, materialised_counts: bool = False,
+             makes: Optional[Collection[str]] = None) -> "VehicleCatalogue":
+        """
+        Load every vehicle and its listing count from the database in one query.
+
+        Args:
+            db_client: Client used to query the `vehicle` and `listing` tables.
+            materialised_counts: Read listing counts from the `vehicle_listing_count`
+                materialised view instead of counting listings.
+            makes: If given, load only the vehicles of these makes.
+
+        Returns:
+            VehicleCatalogue: The populated catalogue.
+        """
+        makes = sorted(makes) if makes is not None else None
+        rows = db_client.query(MATERIALISED_CATALOGUE_SQL if materialised_counts else CATALOGUE_SQL,
+                               (makes, makes))
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping[str, Any]]) -> "VehicleCatalogue":
+        """
+        Build a catalogue straight from database rows, without creating Vehicles.
+
+        Args:
+            rows: Rows with the columns of `CATALOGUE_SQL`.
+
+        Returns:
+            VehicleCatalogue: The populated catalogue.
+        """
+        catalogue = cls()
+        for row in rows:
+            attributes = [row[column] for column in ATTRIBUTE_COLUMNS]
+            catalogue.append(row['id'], attributes, row['listing_count'],
+                             Vehicle.describe(attributes))
+        return catalogue
+
+    def append(self, vehicle_id: str, attributes: List[str], listing_count: int,
+               description: str) -> int:
+        """
+        Add one vehicle at the next position.
+
+        Args:
+            vehicle_id: The vehicle's id.
+            attributes: Values of ATTRIBUTE_COLUMNS, in order.
+            listing_count: Number of listings of the vehicle.
+            description: The vehicle's description, as `Vehicle.get_description`.
+
+        Returns:
+            int: The vehicle's position.
+        """
+        position = len(self.ids)
+        self.ids.append(vehicle_id)
+        self.listing_counts.append(listing_count)
+        self.descriptions.append(preprocess(description))
+        for column, value in zip(ATTRIBUTE_COLUMNS, attributes):
+            code = self._encode(column, value)
+            self.codes[column].append(code)
+            postings = self.postings.get(column)
+            if postings is not None:
+                if code == len(postings):
+                    postings.append(array('I'))
+                postings[code].append(position)
+        return position
+
+    def _encode(self, column: str, value: str) -> int:
+        codes = self._value_codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self.values[column])
+            self.values[column].append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.ids) - len(self.removed)
+
+    def with_changes(self, upserted: Iterable[Vehicle], removed_ids: Collection[str] = ()) -> "VehicleCatalogue":
+        """
+        Build a copy of the catalogue with vehicles added, replaced and removed.
+
+        Only the delta is processed: the columns are copied wholesale, new and changed
+        vehicles are appended, and the positions of removed and replaced vehicles are
+        dropped from the index. Their rows stay in the columns, so every position of
+        this catalogue still refers to the same vehicle in the copy; this catalogue
+        itself is left untouched. Load the catalogue afresh to reclaim the space.
+
+        Args:
+            upserted: New vehicles, and new versions of existing vehicles (by id).
+            removed_ids: Ids of vehicles to remove.
+
+        Returns:
+            VehicleCatalogue: The updated copy.
+        """
+        upserted = list(upserted)
+        stale_ids = set(removed_ids) | {vehicle.id for vehicle in upserted}
+        stale_positions = {
+            position for position, vehicle_id in enumerate(self.ids)
+            if vehicle_id in stale_ids and position not in self.removed
+        }
+
+        catalogue = VehicleCatalogue()
+        catalogue.ids = self.ids[:]
+        # Built with array(), as the columns of a catalogue loaded from a snapshot are
+        # read-only memoryviews
+        catalogue.listing_counts = array('q', self.listing_counts)
+        catalogue.descriptions = self.descriptions[:]
+        catalogue.codes = {column: array('I', codes) for column, codes in self.codes.items()}
+        catalogue.values = {column: values[:] for column, values in self.values.items()}
+        catalogue._value_codes = {column: codes.copy() for column, codes in self._value_codes.items()}
+        catalogue.removed = self.removed | stale_positions
+        # Posting arrays are shared with this catalogue, except those about to change
+        catalogue.postings = {attribute_type: postings[:] for attribute_type, postings in self.postings.items()}
+        changed_postings = {
+            (attribute_type, self.codes[attribute_type][position])
+            for position in stale_positions for attribute_type in INDEXED_ATTRIBUTES
+        }
+        changed_postings |= {
+            (attribute_type, self._value_codes[attribute_type][getattr(vehicle, attribute_type)])
+            for vehicle in upserted for attribute_type in INDEXED_ATTRIBUTES
+            if getattr(vehicle, attribute_type) in self._value_codes[attribute_type]
+        }
+        for attribute_type, code in changed_postings:
+            catalogue.postings[attribute_type][code] = array('I', (
+                position for position in self.postings[attribute_type][code]
+                if position not in stale_positions
+            ))
+
+        for vehicle in upserted:
+            catalogue.append(vehicle.id, [getattr(vehicle, column) for column in ATTRIBUTE_COLUMNS],
+                             vehicle.listing_count, vehicle.get_description())
+        return catalogue
+
+    def vehicle(self, position: int) -> Vehicle:
+        """
+        Materialise the vehicle at a position.
+
+        Args:
+            position: The vehicle's position in the catalogue.
+
+        Returns:
+            Vehicle: A new Vehicle with the stored attributes and listing count.
+        """
+        return Vehicle(
+            self.ids[position],
+            *(self.values[column][self.codes[column][position]] for column in ATTRIBUTE_COLUMNS),
+            self.listing_counts[position],
+        )
+
+    def find_positions(self, matched_attributes: Dict[str, List[str]]) -> List[int]:
+        """
+        Find the positions of the vehicles matching any of the values of every
+        matched attribute type.
+
+        This mirrors the `attribute IN (...) AND ...` filter used against the database.
+        The positions of the most selective attribute type are read from its index and
+        the remaining types are checked against the code columns, so no intermediate
+        sets are built.
+
+        Args:
+            matched_attributes: Canonical attribute values keyed by attribute type,
+                as returned by `VehicleAttributes.find_matching_attributes`.
+
+        Returns:
+            List[int]: Positions of the matching vehicles, in ascending order.
+
+        Raises:
+            ValueError: If an attribute type is not indexed by the catalogue.
+        """
+        for attribute_type in matched_attributes:
+            if attribute_type not in self.postings:
+                raise ValueError(f"Attribute type '{attribute_type}' is not indexed")
+        filters = []
+        for attribute_type, values in matched_attributes.items():
+            value_codes = self._value_codes[attribute_type]
+            codes = {value_codes[value] for value in values if value in value_codes}
+            if not codes:
+                return []
+            postings = self.postings[attribute_type]
+            filters.append((sum(len(postings[code]) for code in codes), attribute_type, codes))
+        if not filters:
+            return []
+
+        filters.sort(key=lambda f: f[0])
+        _, attribute_type, codes = filters[0]
+        postings = self.postings[attribute_type]
+        if len(codes) == 1:
+            positions = postings[next(iter(codes))].tolist()
+        else:
+            # A vehicle has one value per attribute, so the postings are disjoint
+            positions = sorted(chain.from_iterable(postings[code] for code in codes))
+        for _, attribute_type, codes in filters[1:]:
+            column = self.codes[attribute_type]
+            positions = [position for position in positions if column[position] in codes]
+            if not positions:
+                break
+        return positions
+
+    def find_vehicles(self, matched_attributes: Dict[str, List[str]]) -> List[Vehicle]:
+        """
+        Find the vehicles matching any of the values of every matched attribute type.
+
+        Like `find_positions`, but materialises a Vehicle for every match.
+
+        Args:
+            matched_attributes: Canonical attribute values keyed by attribute type.
+
+        Returns:
+            List[Vehicle]: Matching vehicles in catalogue order.
+
+        Raises:
+            ValueError: If an attribute type is not indexed by the catalogue.
+        """
+        return [self.vehicle(position) for position in self.find_positions(matched_attributes)]
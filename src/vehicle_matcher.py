@@ -2,18 +2,488 @@
 Vehicle matching functionality using VehicleAttributes and database queries.
 """
 
-from typing import List, Optional, Tuple, Dict
-from thefuzz import fuzz
+from dataclasses import dataclass
+from typing import Collection, Iterable, List, Optional, Tuple, Dict, Union
 from vehicle import Vehicle
+from match_cache import MatchCache, fold_whitespace, normalise_description
+from match_metrics import MatchMetrics
+from match_result import MatchResult, RankedMatch
 from vehicle_attributes import VehicleAttributes
-from db_client import DatabaseClient
+from vehicle_catalogue import INDEXED_ATTRIBUTES, VehicleCatalogue
+from vehicle_scorer import VehicleScorer
+from db_client import DatabaseClient, PreparedStatement
+from listing_counts import ListingCountStore
+from catalogue_changes import (
+    CHANGED_VEHICLES_SQL, MATERIALISED_CHANGED_VEHICLES_SQL, CatalogueChanges, ChangeTracker,
+    catalogue_version,
+)
+from fuzzy_terms import FuzzyTermIndex
+from token_index import TokenIndex
+import trigram_index
+from matcher_snapshot import SnapshotError, aliases_version, is_current, load_snapshot, write_snapshot
+from retrieval_backends import RETRIEVAL_BACKENDS
+import copy
+import json
 import math
+import sys
+import threading
+import time
+
+# Matched attributes reduced to ((attribute_type, (value, ...)), ...), sorted for hashing
+FilterKey = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+# Candidates of one description: catalogue positions in snapshot mode, vehicles otherwise
+Candidates = Union[List[int], List[Vehicle]]
+
+# Upper bound on the number of distinct attribute filters sent in one batch query
+BATCH_QUERY_MAX_FILTERS = 500
+
+# Attribute columns candidates are filtered on, in the order of the candidate
+# statements' parameters
+FILTER_COLUMNS = INDEXED_ATTRIBUTES
+
+# Vehicles matching one attribute filter. Every column takes an array of accepted
+# values, NULL meaning unconstrained, so a single statement text serves every mix of
+# matched attribute types and can be prepared once per connection. Ordered by id like
+# the batch statement, so vehicles tied on score and listing count resolve alike
+CANDIDATES_SQL = """
+SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       {listing_count} AS listing_count
+FROM vehicle v
+{listing_count_join}
+WHERE ($1::text[] IS NULL OR v.make = ANY($1))
+  AND ($2::text[] IS NULL OR v.model = ANY($2))
+  AND ($3::text[] IS NULL OR v.transmission_type = ANY($3))
+  AND ($4::text[] IS NULL OR v.fuel_type = ANY($4))
+  AND ($5::text[] IS NULL OR v.drive_type = ANY($5))
+ORDER BY v.id
+"""
+
+BATCH_CANDIDATES_SQL = """
+WITH filters AS (
+    SELECT *
+    FROM jsonb_to_recordset($1) AS f(
+        filter_id INT, make TEXT[], model TEXT[], transmission_type TEXT[],
+        fuel_type TEXT[], drive_type TEXT[]
+    )
+),
+candidates AS (
+    SELECT f.filter_id, v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type
+    FROM filters f
+    JOIN vehicle v
+      ON (f.make IS NULL OR v.make = ANY(f.make))
+     AND (f.model IS NULL OR v.model = ANY(f.model))
+     AND (f.transmission_type IS NULL OR v.transmission_type = ANY(f.transmission_type))
+     AND (f.fuel_type IS NULL OR v.fuel_type = ANY(f.fuel_type))
+     AND (f.drive_type IS NULL OR v.drive_type = ANY(f.drive_type))
+),
+listing_counts AS ({listing_counts})
+SELECT c.*, lc.listing_count
+FROM candidates c
+JOIN listing_counts lc ON c.id = lc.id
+ORDER BY c.filter_id, c.id
+"""
+
+LIVE_LISTING_COUNTS_SQL = """
+    SELECT c.id, COUNT(l.id) AS listing_count
+    FROM (SELECT DISTINCT id FROM candidates) c
+    LEFT JOIN listing l ON c.id = l.vehicle_id
+    GROUP BY c.id
+"""
+
+MATERIALISED_LISTING_COUNTS_SQL = """
+    SELECT c.id, COALESCE(vlc.listing_count, 0) AS listing_count
+    FROM (SELECT DISTINCT id FROM candidates) c
+    LEFT JOIN vehicle_listing_count vlc ON c.id = vlc.vehicle_id
+"""
+
+# Fetches the vehicles matching each request's attribute filter that are nearest its
+# description by trigram distance, then orders just those by distance and listing count.
+# The inner query orders by the distance alone under the LIMIT, so the GiST index of
+# migrations/002_vehicle_description_trigram.sql returns them nearest first and the scan
+# stops after $2 rows. The candidate count is a separate aggregate over the filter,
+# which reads no listings and sorts nothing
+TOP_CANDIDATES_SQL = """
+WITH requests AS (
+    SELECT *
+    FROM jsonb_to_recordset($1) AS r(
+        request_id INT, description TEXT, make TEXT[], model TEXT[], transmission_type TEXT[],
+        fuel_type TEXT[], drive_type TEXT[]
+    )
+)
+SELECT r.request_id, v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type,
+       {listing_count} AS listing_count, v.distance, n.candidate_count
+FROM requests r
+CROSS JOIN LATERAL (
+    SELECT COUNT(*) AS candidate_count
+    FROM vehicle c
+    WHERE (r.make IS NULL OR c.make = ANY(r.make))
+      AND (r.model IS NULL OR c.model = ANY(r.model))
+      AND (r.transmission_type IS NULL OR c.transmission_type = ANY(r.transmission_type))
+      AND (r.fuel_type IS NULL OR c.fuel_type = ANY(r.fuel_type))
+      AND (r.drive_type IS NULL OR c.drive_type = ANY(r.drive_type))
+) n
+CROSS JOIN LATERAL (
+    SELECT k.id, k.make, k.model, k.badge, k.transmission_type, k.fuel_type, k.drive_type,
+           k.description <-> r.description AS distance
+    FROM vehicle k
+    WHERE (r.make IS NULL OR k.make = ANY(r.make))
+      AND (r.model IS NULL OR k.model = ANY(r.model))
+      AND (r.transmission_type IS NULL OR k.transmission_type = ANY(r.transmission_type))
+      AND (r.fuel_type IS NULL OR k.fuel_type = ANY(r.fuel_type))
+      AND (r.drive_type IS NULL OR k.drive_type = ANY(r.drive_type))
+    ORDER BY k.description <-> r.description
+    LIMIT $2
+) v
+{listing_count_join}
+ORDER BY r.request_id, v.distance, listing_count DESC, v.id
+"""
+
+# Listing count of vehicle v: the select expression and the join it needs
+LIVE_LISTING_COUNT = {
+    "listing_count": "lc.listing_count",
+    "listing_count_join": "LEFT JOIN LATERAL (SELECT COUNT(*) AS listing_count FROM listing l "
+                          "WHERE l.vehicle_id = v.id) lc ON true",
+}
+
+MATERIALISED_LISTING_COUNT = {
+    "listing_count": "COALESCE(vlc.listing_count, 0)",
+    "listing_count_join": "LEFT JOIN vehicle_listing_count vlc ON v.id = vlc.vehicle_id",
+}
+
+# The candidate statements, keyed by whether they read the materialised listing counts
+CANDIDATES_STATEMENTS = {
+    False: PreparedStatement("vehicle_candidates_live", CANDIDATES_SQL.format(**LIVE_LISTING_COUNT),
+                             ("text[]",) * len(FILTER_COLUMNS)),
+    True: PreparedStatement("vehicle_candidates_materialised",
+                            CANDIDATES_SQL.format(**MATERIALISED_LISTING_COUNT),
+                            ("text[]",) * len(FILTER_COLUMNS)),
+}
+
+BATCH_CANDIDATES_STATEMENTS = {
+    False: PreparedStatement("vehicle_batch_candidates_live",
+                             BATCH_CANDIDATES_SQL.format(listing_counts=LIVE_LISTING_COUNTS_SQL), ("jsonb",)),
+    True: PreparedStatement("vehicle_batch_candidates_materialised",
+                            BATCH_CANDIDATES_SQL.format(listing_counts=MATERIALISED_LISTING_COUNTS_SQL),
+                            ("jsonb",)),
+}
+
+TOP_CANDIDATES_STATEMENTS = {
+    False: PreparedStatement("vehicle_top_candidates_live",
+                             TOP_CANDIDATES_SQL.format(**LIVE_LISTING_COUNT), ("jsonb", "int")),
+    True: PreparedStatement("vehicle_top_candidates_materialised",
+                            TOP_CANDIDATES_SQL.format(**MATERIALISED_LISTING_COUNT), ("jsonb", "int")),
+}
+
+# Confidence of a match found through the token index rather than matched attributes
+TOKEN_MATCH_CONFIDENCE = 1
+
+
+@dataclass(frozen=True)
+class MatcherState:
+    """
+    Everything a match reads that `reload` and `refresh` replace. They build a new
+    state and swap it in with one assignment, and every match reads the state once,
+    so it never combines e.g. candidate positions from one catalogue with the vehicles
+    of another.
+
+    Attributes:
+        vehicle_attributes (VehicleAttributes): The attribute vocabulary.
+        catalogue (Optional[VehicleCatalogue]): The in-memory catalogue, if loaded.
+        token_index (Optional[TokenIndex]): The token index, if the token fallback is enabled.
+        scorer (VehicleScorer): The fuzzy scorer and its cache of vehicle descriptions.
+    """
+    vehicle_attributes: VehicleAttributes
+    catalogue: Optional[VehicleCatalogue]
+    token_index: Optional[TokenIndex]
+    scorer: VehicleScorer
+
 
 class VehicleMatcher:
 
-    def __init__(self, db_client: DatabaseClient, yaml_file: Optional[str] = None):
+    def __init__(self, db_client: DatabaseClient, yaml_file: Optional[str] = None,
+                 use_catalogue: bool = False, listing_count_max_age: Optional[float] = 86400.0,
+                 cache_size: Optional[int] = None, cache_ttl: Optional[float] = None,
+                 metrics: Optional[MatchMetrics] = None, track_changes: bool = False,
+                 snapshot_file: Optional[str] = None, retrieval: str = "python",
+                 trigram_top_k: int = 1, token_fallback: bool = False,
+                 token_candidates: int = 50, fuzzy_terms: bool = False,
+                 makes: Optional[Collection[str]] = None, snapshot_version: Optional[str] = None):
+        """
+        Initialize the VehicleMatcher.
+
+        Args:
+            db_client: Client used to load attribute values and query vehicles.
+            yaml_file: Optional path to a YAML file of attribute aliases.
+            use_catalogue: If True, load the vehicle catalogue and listing counts once
+                into memory and filter candidates there instead of querying the
+                database for every description.
+            listing_count_max_age: Maximum age in seconds of the materialised listing
+                counts (see `listing_counts.py`). Older or missing counts fall back to
+                counting listings with a live join. None always uses the live join.
+            cache_size: If set, cache up to this many results keyed on the normalised
+                description (see `match_cache.normalise_description`).
+            cache_ttl: Optional number of seconds after which cached results expire.
+            metrics: Optional collector of per-stage timings, candidate and row counts
+                and cache behaviour. Nothing is recorded without one.
+            track_changes: If True, remember the alias file's modification time and a
+                hash of every vehicle row, so that `refresh` can apply just what changed.
+            snapshot_file: Optional path to a snapshot of the vocabulary and catalogue
+                (see `matcher_snapshot.py`). A snapshot matching the current database and
+                alias file is loaded instead of building them; otherwise they are built
+                as usual and the snapshot is rewritten.
+            retrieval: 'python' fetches every vehicle matching the extracted attributes
+                and ranks them with the fuzzy scorer. 'trigram' fetches only the
+                `trigram_top_k` nearest by trigram distance, read from the trigram index,
+                and orders those by distance and listing count; it needs
+                `trigram_index.py migrate` and cannot be combined with `use_catalogue`.
+            trigram_top_k: Number of vehicles fetched per description by the trigram
+                backend. With more than one, the fuzzy scorer picks among them.
+            token_fallback: If True, index the tokens of every vehicle's model and badge
+                (see `token_index.py`). Descriptions in which no attribute is found, or
+                whose attributes match no vehicle, are then matched against the vehicles
+                sharing their most informative tokens instead of going unmatched. Such
+                matches get a confidence of TOKEN_MATCH_CONFIDENCE.
+            token_candidates: Maximum number of vehicles retrieved through the token
+                index and scored for one description.
+            fuzzy_terms: If True, attribute types not found exactly may be matched by
+                terms written with a typo or two (see `fuzzy_terms.py`), e.g. 'Amrok'
+                for Amarok. Every edit lowers the confidence by one, to no less than 1.
+            makes: If given, the matcher is one shard of a sharded matcher (see
+                `shard_router.py`): its vocabulary, catalogue, token index and queries
+                cover only the vehicles of these makes.
+            snapshot_version: Catalogue version (see `catalogue_changes.catalogue_version`)
+                the caller has just read, e.g. a parent process that brought the
+                snapshot up to date before starting workers. The snapshot is checked
+                against it instead of asking the database again.
+
+        Raises:
+            ValueError: If the retrieval backend is unknown, combined with the catalogue,
+                or needs a trigram index the database does not have.
+        """
+        if retrieval not in RETRIEVAL_BACKENDS:
+            raise ValueError(f"Unknown retrieval backend '{retrieval}', expected one of {RETRIEVAL_BACKENDS}")
+        if retrieval == "trigram" and use_catalogue:
+            raise ValueError("The trigram retrieval backend ranks in the database and cannot use the catalogue")
+        if trigram_top_k < 1:
+            raise ValueError(f"trigram_top_k must be at least 1, got {trigram_top_k}")
+        if retrieval == "trigram" and not trigram_index.is_available(db_client):
+            raise ValueError("The trigram retrieval backend needs pg_trgm and vehicle.description; "
+                             "run `python src/trigram_index.py migrate`")
         self.db_client = db_client
-        self.vehicle_attributes = VehicleAttributes(db_client, yaml_file)
+        self.yaml_file = yaml_file
+        self.use_catalogue = use_catalogue
+        self.listing_counts = ListingCountStore(db_client, max_age=listing_count_max_age)
+        self.cache: Optional[MatchCache] = (
+            MatchCache(max_entries=cache_size, ttl=cache_ttl) if cache_size else None
+        )
+        self.metrics = metrics if metrics is not None else MatchMetrics(enabled=False)
+        self.track_changes = track_changes
+        self.snapshot_file = snapshot_file
+        self.retrieval = retrieval
+        self.trigram_top_k = trigram_top_k
+        self.token_fallback = token_fallback
+        self.token_candidates = token_candidates
+        self.fuzzy_terms = fuzzy_terms
+        self.makes: Optional[List[str]] = sorted(makes) if makes is not None else None
+        # Merged into every candidate query, so descriptions naming no make stay in the shard
+        self._shard_filter: Dict[str, List[str]] = {'make': self.makes} if self.makes is not None else {}
+        self._refresh_lock = threading.Lock()
+        self._load(snapshot_version)
+
+    def _load(self, snapshot_version: Optional[str] = None) -> None:
+        """
+        Load the attribute vocabulary and, in snapshot mode, the catalogue.
+
+        Args:
+            snapshot_version: Current catalogue version, if already known. Otherwise it
+                is read from the database once in snapshot mode.
+        """
+        materialised_counts = self.listing_counts.is_fresh()
+        # Taken first, so changes made while loading are picked up by the next refresh
+        change_tracker = (
+            ChangeTracker(self.db_client, self.yaml_file, makes=self.makes,
+                          materialised_counts=materialised_counts)
+            if self.track_changes else None
+        )
+        # Read once: the snapshot is checked against it and, if rebuilt, stamped with it
+        version = (snapshot_version or catalogue_version(self.db_client)) if self.snapshot_file else None
+        loaded = self._load_snapshot(version) if self.snapshot_file else None
+        if loaded is not None:
+            vehicle_attributes, catalogue = loaded
+        else:
+            vehicle_attributes = VehicleAttributes(self.db_client, self.yaml_file, makes=self.makes)
+            catalogue = (
+                VehicleCatalogue.load(self.db_client, materialised_counts=materialised_counts,
+                                      makes=self.makes)
+                if self.use_catalogue else None
+            )
+            if self.snapshot_file:
+                self._write_snapshot(version, vehicle_attributes, catalogue)
+        token_index = self._build_token_index(catalogue)
+        self.change_tracker: Optional[ChangeTracker] = change_tracker
+        # The version the snapshot file now holds, for processes sharing it
+        self.snapshot_version = version
+        # The catalogue holds normalised descriptions of its vehicles; the scorer caches
+        # those of vehicles fetched from the database
+        self._state = MatcherState(vehicle_attributes, catalogue, token_index, VehicleScorer())
+
+    @property
+    def vehicle_attributes(self) -> VehicleAttributes:
+        return self._state.vehicle_attributes
+
+    @property
+    def catalogue(self) -> Optional[VehicleCatalogue]:
+        return self._state.catalogue
+
+    @property
+    def token_index(self) -> Optional[TokenIndex]:
+        return self._state.token_index
+
+    @property
+    def scorer(self) -> VehicleScorer:
+        return self._state.scorer
+
+    def _build_token_index(self, catalogue: Optional[VehicleCatalogue]) -> Optional[TokenIndex]:
+        """
+        Index the tokens of the catalogue's vehicles by position, or of every vehicle
+        in the database by id, if the token fallback is enabled.
+        """
+        if not self.token_fallback:
+            return None
+        return (TokenIndex.from_catalogue(catalogue) if catalogue is not None
+                else TokenIndex.load(self.db_client, makes=self.makes))
+
+    def _load_snapshot(self, version: str) -> Optional[Tuple[VehicleAttributes, Optional[VehicleCatalogue]]]:
+        """
+        Load the vocabulary and catalogue from the snapshot file if it is current.
+
+        Args:
+            version: Current catalogue version.
+
+        Returns:
+            Optional[Tuple[VehicleAttributes, Optional[VehicleCatalogue]]]: The
+            vocabulary and catalogue, or None if the snapshot is missing, unreadable or
+            was built from a different catalogue, alias file or set of makes.
+        """
+        try:
+            snapshot = load_snapshot(self.snapshot_file, self.db_client, with_catalogue=self.use_catalogue)
+        except SnapshotError:
+            return None
+        if not is_current(snapshot.header, version, self.yaml_file, self.use_catalogue) or \
+                snapshot.vehicle_attributes.makes != self.makes:
+            return None
+        self.metrics.increment("snapshot_loads")
+        return snapshot.vehicle_attributes, snapshot.catalogue
+
+    def _write_snapshot(self, version: str, vehicle_attributes: VehicleAttributes,
+                        catalogue: Optional[VehicleCatalogue]) -> None:
+        """
+        Save the freshly built vocabulary and catalogue to the snapshot file. Failing
+        to write it only costs the next start a full build, so errors are reported
+        rather than raised.
+        """
+        try:
+            write_snapshot(self.snapshot_file, vehicle_attributes, catalogue,
+                           version, aliases_version(self.yaml_file))
+        except (OSError, SnapshotError) as e:
+            print(f"Error writing snapshot {self.snapshot_file}: {e}", file=sys.stderr)
+
+    def reload(self) -> None:
+        """
+        Reload the attribute vocabulary and catalogue, and drop every cached result.
+        """
+        with self._refresh_lock:
+            self._load()
+            if self.cache is not None:
+                self.cache.clear()
+
+    def refresh(self) -> bool:
+        """
+        Apply changes to the alias file, the `vehicle` table and the materialised
+        listing counts made since they were loaded, without reloading everything.
+
+        The term matcher is rebuilt only if aliases or attribute values may have changed,
+        the catalogue is updated with just the added, modified, recounted and removed
+        vehicles, and only the cached results those changes can affect are dropped. New
+        versions are built alongside the current ones and swapped in, so matches running
+        meanwhile are never blocked; their results are not cached, as they may predate
+        the changes. Without `track_changes` this falls back to `reload`.
+
+        Returns:
+            bool: True if anything changed.
+
+        Raises:
+            psycopg2.Error, OSError, yaml.YAMLError, ValueError: If the changes cannot
+                be loaded, e.g. from a half-written alias file. The previous vocabulary
+                is kept, and the changes are looked for again by the next refresh.
+        """
+        if self.change_tracker is None:
+            self.reload()
+            return True
+        with self._refresh_lock:
+            changes = self.change_tracker.detect(materialised_counts=self.listing_counts.is_fresh())
+            if not changes:
+                return False
+            state = self._state
+            vehicle_attributes = state.vehicle_attributes
+            changed_terms: set = set()
+            if changes.aliases_changed or changes.catalogue_changed:
+                # Reloaded into a copy, which matches cannot see until the state is swapped
+                vehicle_attributes = copy.copy(vehicle_attributes)
+                vehicle_attributes.reload(db_values=changes.catalogue_changed)
+                changed_terms = (set(state.vehicle_attributes.term_matcher.terms)
+                                 ^ set(vehicle_attributes.term_matcher.terms))
+            catalogue = state.catalogue
+            if catalogue is not None:
+                catalogue = catalogue.with_changes(changes.upserted + changes.recounted, changes.removed_ids)
+            token_index = (self._build_token_index(catalogue) if changes.catalogue_changed
+                           else state.token_index)
+            # Descriptions are cached by value, so changed vehicles are never scored on
+            # stale ones, but a fresh scorer drops those no vehicle has any longer
+            scorer = VehicleScorer() if changes.catalogue_changed else state.scorer
+            self._state = MatcherState(vehicle_attributes, catalogue, token_index, scorer)
+            if self.cache is not None:
+                self._invalidate_cached_results(changes, changed_terms)
+            self.change_tracker.accept(changes)
+            self.metrics.increment("refreshes")
+            return True
+
+    def _invalidate_cached_results(self, changes: CatalogueChanges, changed_terms: set) -> None:
+        """
+        Drop the cached results the changes can affect: those whose description contains
+        an added or removed term, those won by a changed, recounted or removed vehicle,
+        and those whose attribute filter a new, changed or recounted vehicle satisfies,
+        as its listing count may now break a tie differently.
+        """
+        terms = {term.lower() for _, _, term in changed_terms if term}
+        normalised_terms = {normalise_description(term) for term in terms} - {""}
+        stale_ids = changes.stale_ids
+        changed_vehicles = changes.upserted + changes.recounted
+
+        token_fallback = self.token_index is not None and (changes.catalogue_changed or bool(changes.recounted))
+        # Cached descriptions may also contain a changed term written with a typo
+        changed_fuzzy_index = FuzzyTermIndex(changed_terms) if self.fuzzy_terms and changed_terms else None
+
+        def affected(key: str, result: MatchResult) -> bool:
+            if result.vehicle is not None and result.vehicle.id in stale_ids:
+                return True
+            if token_fallback and (result.confidence <= TOKEN_MATCH_CONFIDENCE or not result.candidate_count):
+                # Token matches, and descriptions left unmatched, may now find a vehicle
+                return True
+            description = result.description.lower()
+            if any(term in description for term in terms) or \
+                    any(term in key for term in normalised_terms):
+                return True
+            if changed_fuzzy_index is not None and changed_fuzzy_index.find_all(description):
+                return True
+            return bool(result.matched_attributes) and any(
+                all(getattr(vehicle, attribute_type) in values
+                    for attribute_type, values in result.matched_attributes.items())
+                for vehicle in changed_vehicles
+            )
+
+        self.cache.invalidate(affected)
     
     def attribute_match_confidence_score(self, matched_attributes: Dict[str, List[str]]) -> int:
         score = 0
@@ -52,51 +522,453 @@ class VehicleMatcher:
         Raises:
             Exception: If database query fails.
         """
-        matched_attributes = self.vehicle_attributes.find_matching_attributes(description)
+        self.metrics.increment("matches")
+        with self.metrics.time("match"):
+            return self._find_best_matching_vehicle(description)
+
+    def _find_best_matching_vehicle(self, description: str) -> Tuple[Optional[Vehicle], int]:
+        # Read before matching, so a result the next refresh makes stale is not cached
+        generation = self.cache.generation if self.cache is not None else None
+        if self.cache is not None:
+            cached = self.cache.get(description)
+            if cached is not None:
+                self.metrics.increment("cache_hits")
+                return cached.vehicle, cached.confidence
+            self.metrics.increment("cache_misses")
+        # Read after the generation, as a refresh swaps the state before invalidating
+        state = self._state
+
+        with self.metrics.time("attributes"):
+            matched_attributes, edit_cost = self._match_attributes(state, description)
         
         if not matched_attributes:
-            return None, 0
-        
-        # Construct the SQL query
-        conditions = []
-        params = []
-        for attribute_name, attribute_values in matched_attributes.items():
-            placeholders = ", ".join(["%s"] * len(attribute_values))
-            conditions.append(f"{attribute_name} IN ({placeholders})")
-            params.extend(attribute_values)
-        where_clause = " AND ".join(conditions)
-        sql = f"""
-        SELECT v.id, v.make, v.model, v.badge, v.transmission_type, v.fuel_type, v.drive_type, 
-               COUNT(l.id) as listing_count
-        FROM vehicle v
-        LEFT JOIN listing l ON v.id = l.vehicle_id
-        WHERE {where_clause}
-        GROUP BY v.id
-        """
+            self.metrics.increment("unmatched_descriptions")
+            if state.token_index is None:
+                self._cache_result(MatchResult(description=description, vehicle=None, confidence=0),
+                                   generation)
+                return None, 0
         
         try:
-            # Execute query
-            results = self.db_client.query(sql, tuple(params))
-            
-            vehicles = [Vehicle.from_db_row(row) for row in results]
+            if not matched_attributes:
+                candidates, candidate_count = [], 0
+            elif self.retrieval == "trigram":
+                candidates, candidate_count = self._find_top_candidate_vehicles(
+                    [(description, self._filter_key(matched_attributes))]
+                )[0]
+            else:
+                candidates = self._find_candidates(state, matched_attributes)
+                candidate_count = len(candidates)
+            if not candidates and state.token_index is not None:
+                vehicle, confidence, candidate_count = self._match_by_tokens(state, description)
+            else:
+                vehicle, confidence = self._select_best_vehicle(state, description, candidates,
+                                                                matched_attributes, edit_cost)
+            self.metrics.observe_size("candidates", candidate_count)
+            self._cache_result(MatchResult(
+                description=description,
+                vehicle=vehicle,
+                confidence=confidence,
+                candidate_count=candidate_count,
+                matched_attributes=matched_attributes,
+            ), generation)
+            return vehicle, confidence
             
+        except Exception as e:
+            print(f"Database error in find_matching_vehicles: {e}")
+            return []
 
-            if len(vehicles) == 0:
-                return None, 0
+    def find_best_matching_vehicles(self, descriptions: Iterable[str]) -> List[Tuple[Optional[Vehicle], int]]:
+        """
+        Find the best matching vehicle for each of a batch of descriptions.
 
-            if (len(vehicles) == 1):
-                return vehicles[0], self.attribute_match_confidence_score(matched_attributes)
+        Matching works as in `find_best_matching_vehicle`, but descriptions that resolve
+        to the same attribute filter share one candidate lookup, and the candidates for
+        all distinct filters are fetched with a single set-based query (one query per
+        `BATCH_QUERY_MAX_FILTERS` distinct filters) instead of one query per description.
 
-            # Score each vehicle using fuzzy matching
-            vehicles_with_scores = [(vehicle, fuzz.token_set_ratio(description, vehicle.get_description())) 
-                            for vehicle in vehicles]
-            
-            top_score = max(vehicles_with_scores, key=lambda x: x[1])[1]
-            vehicles_with_top_score = [v for v in vehicles_with_scores if v[1] == top_score]
-            best_vehicle = max(vehicles_with_top_score, key=lambda v: v[0].listing_count)
+        Args:
+            descriptions (Iterable[str]): Natural language vehicle descriptions.
 
-            return best_vehicle[0], self.attribute_match_confidence_score(matched_attributes)
-            
-        except Exception as e:
-            print(f"Database error in find_matching_vehicles: {e}")
-            return [] 
\ No newline at end of file
+        Returns:
+            List[Tuple[Vehicle, int]]: Best matching vehicle and confidence score for
+            each description, in input order. (None, 0) for descriptions without a match.
+
+        Raises:
+            psycopg2.Error: If the database query fails.
+        """
+        return [(result.vehicle, result.confidence)
+                for result in self.match_descriptions(descriptions)]
+
+    def match_descriptions(self, descriptions: Iterable[str]) -> List[MatchResult]:
+        """
+        Match a batch of descriptions, reporting the details of each match.
+
+        This is the batch lookup behind `find_best_matching_vehicles`, returning a
+        MatchResult (vehicle, confidence, candidate count, matched attributes and
+        timing) for every description instead of a bare tuple.
+
+        Args:
+            descriptions (Iterable[str]): Natural language vehicle descriptions.
+
+        Returns:
+            List[MatchResult]: One result per description, in input order.
+
+        Raises:
+            psycopg2.Error: If the database query fails.
+        """
+        descriptions = list(descriptions)
+        self.metrics.increment("matches", len(descriptions))
+        if self.cache is None:
+            return self._match_uncached(self._state, descriptions)
+
+        generation = self.cache.generation
+        results = [self.cache.get(description) for description in descriptions]
+        hits = sum(1 for result in results if result is not None)
+        self.metrics.increment("cache_hits", hits)
+        self.metrics.increment("cache_misses", len(results) - hits)
+        computed = iter(self._match_uncached(
+            self._state,
+            [description for description, result in zip(descriptions, results) if result is None]
+        ))
+        for i, result in enumerate(results):
+            if result is None:
+                results[i] = next(computed)
+                self.cache.put(results[i], generation)
+        return results
+
+    def find_top_matches(self, description: str, k: int = 5) -> List[RankedMatch]:
+        """
+        Find the `k` vehicles that best match the given description, best first, e.g.
+        to offer alternatives to a low-confidence match.
+
+        Candidates are found as by `find_best_matching_vehicle` and ranked the same way,
+        by fuzzy score and then listing count, so the first match is normally the
+        vehicle it returns. Candidates that cannot make the top `k` are pruned while
+        scoring (see `VehicleScorer.top_choices`). With the trigram backend, the
+        max(k, trigram_top_k) vehicles Postgres ranks highest are scored. Results are
+        not cached.
+
+        Args:
+            description: Natural language vehicle description.
+            k: Maximum number of matches returned.
+
+        Returns:
+            List[RankedMatch]: Up to `k` matches with their fuzzy score, listing count
+            and confidence. Empty if no vehicle matches.
+
+        Raises:
+            ValueError: If k is less than 1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        self.metrics.increment("top_matches")
+        state = self._state
+        with self.metrics.time("attributes"):
+            matched_attributes, edit_cost = self._match_attributes(state, description)
+        if not matched_attributes:
+            candidates: Candidates = []
+        elif self.retrieval == "trigram":
+            candidates, _ = self._find_top_candidate_vehicles(
+                [(description, self._filter_key(matched_attributes))], limit=max(k, self.trigram_top_k)
+            )[0]
+        else:
+            candidates = self._find_candidates(state, matched_attributes)
+        confidence = self._confidence(matched_attributes, edit_cost)
+        if len(candidates) == 0 and state.token_index is not None:
+            candidates = self._find_token_candidates(state, description)
+            confidence = TOKEN_MATCH_CONFIDENCE
+        return self._rank_candidates(state, description, candidates, k, confidence)
+
+    def _cache_result(self, result: MatchResult, generation: Optional[int]) -> None:
+        if self.cache is not None:
+            self.cache.put(result, generation)
+
+    def _match_uncached(self, state: MatcherState, descriptions: List[str]) -> List[MatchResult]:
+        """
+        Match a batch of descriptions without consulting the result cache.
+        """
+        elapsed = [0.0] * len(descriptions)
+        matched_attributes_list = []
+        edit_costs = []
+        for i, description in enumerate(descriptions):
+            started = time.perf_counter()
+            matched_attributes, edit_cost = self._match_attributes(state, description)
+            matched_attributes_list.append(matched_attributes)
+            edit_costs.append(edit_cost)
+            elapsed[i] += time.perf_counter() - started
+            self.metrics.observe_duration("attributes", elapsed[i])
+
+        filter_keys = [
+            self._filter_key(matched_attributes) if matched_attributes else None
+            for matched_attributes in matched_attributes_list
+        ]
+        self.metrics.increment("unmatched_descriptions", filter_keys.count(None))
+        started = time.perf_counter()
+        if self.retrieval == "trigram":
+            # Ranking depends on the description, so lookups are shared per description
+            # and filter rather than per filter
+            lookup_keys = [(description, key) if key is not None else None
+                           for description, key in zip(descriptions, filter_keys)]
+            distinct_lookups = list(dict.fromkeys(key for key in lookup_keys if key is not None))
+            found_by_lookup = dict(zip(distinct_lookups, self._find_top_candidate_vehicles(distinct_lookups)))
+        else:
+            lookup_keys = filter_keys
+            distinct_filters = list(dict.fromkeys(key for key in filter_keys if key is not None))
+            self.metrics.observe_size("distinct_filters", len(distinct_filters))
+            found_by_lookup = {
+                key: (candidates, len(candidates))
+                for key, candidates in self._find_candidates_for_filters(state, distinct_filters).items()
+            }
+        lookup_share = (time.perf_counter() - started) / max(len(descriptions), 1)
+
+        results = []
+        for i, (description, matched_attributes, edit_cost, key) in enumerate(
+                zip(descriptions, matched_attributes_list, edit_costs, lookup_keys)):
+            started = time.perf_counter()
+            candidates, candidate_count = found_by_lookup[key] if key is not None else ([], 0)
+            if not candidates and state.token_index is not None:
+                vehicle, confidence, candidate_count = self._match_by_tokens(state, description)
+            else:
+                vehicle, confidence = self._select_best_vehicle(state, description, candidates,
+                                                                matched_attributes, edit_cost)
+            elapsed[i] += time.perf_counter() - started + lookup_share
+            self.metrics.observe_duration("match", elapsed[i])
+            if key is not None or candidate_count:
+                self.metrics.observe_size("candidates", candidate_count)
+            results.append(MatchResult(
+                description=description,
+                vehicle=vehicle,
+                confidence=confidence,
+                candidate_count=candidate_count,
+                matched_attributes=matched_attributes,
+                elapsed_ms=elapsed[i] * 1000,
+            ))
+        return results
+
+    def _match_by_tokens(self, state: MatcherState, description: str) -> Tuple[Optional[Vehicle], int, int]:
+        """
+        Match a description through the token index, for when its attributes found no
+        vehicle.
+
+        Returns:
+            Tuple[Optional[Vehicle], int, int]: The best of the vehicles sharing the
+            description's most informative tokens, the confidence and the number of
+            vehicles scored. (None, 0, 0) if the description shares no indexed token.
+        """
+        candidates = self._find_token_candidates(state, description)
+        vehicle, _ = self._select_best_vehicle(state, description, candidates, {})
+        if vehicle is None:
+            return None, 0, 0
+        return vehicle, TOKEN_MATCH_CONFIDENCE, len(candidates)
+
+    def _find_token_candidates(self, state: MatcherState, description: str) -> Candidates:
+        """
+        Find the vehicles sharing the description's most informative tokens, in token
+        index rank order.
+        """
+        self.metrics.increment("token_fallbacks")
+        with self.metrics.time("tokens"):
+            keys = state.token_index.search(description, limit=self.token_candidates)
+        if not keys or state.catalogue is not None:
+            return keys
+        rows = self.db_client.query(
+            MATERIALISED_CHANGED_VEHICLES_SQL if self.listing_counts.is_fresh() else CHANGED_VEHICLES_SQL,
+            (keys,),
+        )
+        vehicles = {row['id']: Vehicle.from_db_row(row) for row in rows}
+        # Keep the token ranking, so ties in fuzzy score and listing count favour it
+        return [vehicles[key] for key in keys if key in vehicles]
+
+    def _match_attributes(self, state: MatcherState, description: str) -> Tuple[Dict[str, List[str]], int]:
+        """
+        Find the attributes matching the description, and the number of edits needed
+        to match them (always 0 unless `fuzzy_terms` is enabled).
+        """
+        # Terms such as 'Front Wheel Drive' match however the description is spaced,
+        # as descriptions sharing a cache key must match alike
+        description = fold_whitespace(description)
+        if not self.fuzzy_terms:
+            return state.vehicle_attributes.find_matching_attributes(description), 0
+        matched_attributes, edit_cost = state.vehicle_attributes.find_matching_attributes_fuzzy(description)
+        if edit_cost:
+            self.metrics.increment("fuzzy_term_matches")
+        return matched_attributes, edit_cost
+
+    def _confidence(self, matched_attributes: Dict[str, List[str]], edit_cost: int) -> int:
+        """
+        Confidence of a match on the given attributes, lowered by the edit cost of
+        typo-tolerant attribute matches.
+        """
+        confidence = self.attribute_match_confidence_score(matched_attributes)
+        if edit_cost:
+            confidence = max(1, confidence - edit_cost)
+        return confidence
+
+    def _rank_candidates(self, state: MatcherState, description: str, candidates: Candidates, k: int,
+                         confidence: int) -> List[RankedMatch]:
+        """
+        Rank the `k` best of the candidates by fuzzy score, breaking ties on listing
+        count, and materialise only those as Vehicles.
+        """
+        if len(candidates) == 0:
+            return []
+        catalogue = state.catalogue
+        with self.metrics.time("scoring"):
+            if catalogue is None:
+                choices = [state.scorer.vehicle_description(vehicle) for vehicle in candidates]
+                listing_counts = [vehicle.listing_count for vehicle in candidates]
+            else:
+                choices = [catalogue.descriptions[position] for position in candidates]
+                listing_counts = [catalogue.listing_counts[position] for position in candidates]
+            top = state.scorer.top_choices(description, choices, listing_counts, k)
+        return [
+            RankedMatch(
+                vehicle=catalogue.vehicle(candidates[index]) if catalogue is not None else candidates[index],
+                score=score,
+                confidence=confidence,
+            )
+            for index, score in top
+        ]
+
+    def _select_best_vehicle(self, state: MatcherState, description: str, candidates: Candidates,
+                             matched_attributes: Dict[str, List[str]],
+                             edit_cost: int = 0) -> Tuple[Optional[Vehicle], int]:
+        """
+        Pick the best of the candidates by fuzzy score, breaking ties on listing count.
+
+        Catalogue candidates are scored on the catalogue's precomputed descriptions and
+        only the winner is materialised as a Vehicle. The confidence is lowered by the
+        edit cost of typo-tolerant attribute matches.
+        """
+        if len(candidates) == 0:
+            return None, 0
+
+        confidence = self._confidence(matched_attributes, edit_cost)
+        catalogue = state.catalogue
+        if (len(candidates) == 1):
+            return (catalogue.vehicle(candidates[0]) if catalogue is not None else candidates[0]), confidence
+
+        # Score every vehicle using fuzzy matching in one batched call
+        with self.metrics.time("scoring"):
+            if catalogue is None:
+                best_vehicle, _ = state.scorer.best_vehicle(description, candidates)
+                return best_vehicle, confidence
+            best_index, _ = state.scorer.best_choice(
+                description,
+                [catalogue.descriptions[position] for position in candidates],
+                [catalogue.listing_counts[position] for position in candidates],
+            )
+        return catalogue.vehicle(candidates[best_index]), confidence
+
+    @staticmethod
+    def _filter_key(matched_attributes: Dict[str, List[str]]) -> FilterKey:
+        """
+        Reduce matched attributes to the filter they impose on the catalogue, so that
+        descriptions with the same filter can share a candidate lookup.
+        """
+        return tuple(sorted(
+            (attribute_type, tuple(sorted(set(attribute_values))))
+            for attribute_type, attribute_values in matched_attributes.items()
+        ))
+
+    def _find_candidates(self, state: MatcherState, matched_attributes: Dict[str, List[str]]) -> Candidates:
+        """
+        Find the candidates matching the given attributes: their positions in the
+        in-memory catalogue when one is loaded, and vehicles from the database otherwise.
+        """
+        if state.catalogue is not None:
+            with self.metrics.time("catalogue"):
+                return state.catalogue.find_positions(matched_attributes)
+        return self._find_candidate_vehicles(matched_attributes)
+
+    def _find_candidates_for_filters(self, state: MatcherState,
+                                     filters: List[FilterKey]) -> Dict[FilterKey, Candidates]:
+        """
+        Find the candidates matching each of several attribute filters, as catalogue
+        positions when a catalogue is loaded and vehicles from the database otherwise.
+        """
+        if state.catalogue is None:
+            return self._find_candidate_vehicles_for_filters(filters)
+        candidates_by_filter = {}
+        for key in filters:
+            with self.metrics.time("catalogue"):
+                candidates_by_filter[key] = state.catalogue.find_positions(dict(key))
+        return candidates_by_filter
+
+    def _find_candidate_vehicles(self, matched_attributes: Dict[str, List[str]]) -> List[Vehicle]:
+        """
+        Find all vehicles matching the given attributes in the database.
+        """
+        attribute_filter = {**self._shard_filter, **matched_attributes}
+        params = tuple(
+            list(attribute_filter[column]) if column in attribute_filter else None
+            for column in FILTER_COLUMNS
+        )
+        statement = CANDIDATES_STATEMENTS[self.listing_counts.is_fresh()]
+        self.metrics.increment("queries")
+        with self.metrics.time("query"):
+            results = self.db_client.execute_prepared(statement, params)
+        self.metrics.observe_size("rows_fetched", len(results))
+        with self.metrics.time("convert"):
+            return [Vehicle.from_db_row(row) for row in results]
+
+    def _find_candidate_vehicles_for_filters(self, filters: List[FilterKey]) -> Dict[FilterKey, List[Vehicle]]:
+        """
+        Find the vehicles matching each of several attribute filters in the database,
+        with one query per chunk of filters.
+        """
+        candidates_by_filter: Dict[FilterKey, List[Vehicle]] = {key: [] for key in filters}
+        statement = BATCH_CANDIDATES_STATEMENTS[self.listing_counts.is_fresh()]
+        for chunk_start in range(0, len(filters), BATCH_QUERY_MAX_FILTERS):
+            chunk = filters[chunk_start:chunk_start + BATCH_QUERY_MAX_FILTERS]
+            # One JSON record per filter; attribute types absent from a filter are NULL,
+            # which the join treats as unconstrained
+            filter_records = [
+                {'filter_id': filter_id, **self._shard_filter, **{name: list(values) for name, values in key}}
+                for filter_id, key in enumerate(chunk)
+            ]
+            self.metrics.increment("queries")
+            with self.metrics.time("query"):
+                results = self.db_client.execute_prepared(statement, (json.dumps(filter_records),))
+            self.metrics.observe_size("rows_fetched", len(results))
+            with self.metrics.time("convert"):
+                # (filter_id, vehicle columns...)
+                for row in results:
+                    candidates_by_filter[chunk[row[0]]].append(Vehicle.from_db_row(row[1:]))
+        return candidates_by_filter
+
+    def _find_top_candidate_vehicles(self, lookups: List[Tuple[str, FilterKey]],
+                                     limit: Optional[int] = None) -> List[Tuple[List[Vehicle], int]]:
+        """
+        Rank the vehicles matching each (description, attribute filter) pair in the
+        database and fetch only the `limit` (by default `trigram_top_k`) best, with one
+        query per chunk.
+
+        Returns:
+            List[Tuple[List[Vehicle], int]]: For each lookup, the top vehicles in rank
+            order and the number of vehicles that matched the filter.
+        """
+        statement = TOP_CANDIDATES_STATEMENTS[self.listing_counts.is_fresh()]
+        found: List[Tuple[List[Vehicle], int]] = []
+        for chunk_start in range(0, len(lookups), BATCH_QUERY_MAX_FILTERS):
+            chunk = lookups[chunk_start:chunk_start + BATCH_QUERY_MAX_FILTERS]
+            requests = [
+                {'request_id': request_id, 'description': description,
+                 **self._shard_filter, **{name: list(values) for name, values in key}}
+                for request_id, (description, key) in enumerate(chunk)
+            ]
+            chunk_found: List[Tuple[List[Vehicle], int]] = [([], 0) for _ in chunk]
+            self.metrics.increment("queries")
+            with self.metrics.time("query"):
+                results = self.db_client.execute_prepared(
+                    statement, (json.dumps(requests), limit if limit is not None else self.trigram_top_k)
+                )
+            self.metrics.observe_size("rows_fetched", len(results))
+            with self.metrics.time("convert"):
+                # (request_id, vehicle columns..., distance, candidate_count)
+                for row in results:
+                    vehicles, _ = chunk_found[row[0]]
+                    vehicles.append(Vehicle.from_db_row(row[1:9]))
+                    chunk_found[row[0]] = (vehicles, row[10])
+            found.extend(chunk_found)
+        return found
@@ -0,0 +1,206 @@
+"""
+Batched fuzzy scoring of a description against candidate vehicles.
+"""
+
+import heapq
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from rapidfuzz import fuzz, process
+from thefuzz import utils
+from vehicle import Vehicle
+
+
+def preprocess(text: str) -> str:
+    """
+    Normalise text exactly as `thefuzz.fuzz.token_set_ratio` does before scoring.
+
+    Args:
+        text: The text to normalise.
+
+    Returns:
+        str: Lowercased ASCII text with everything but letters and digits replaced
+        by spaces.
+    """
+    return utils.full_process(text, force_ascii=True)
+
+
+# Number of choices scored per batched call by `VehicleScorer.top_choices`; smaller
+# chunks raise the score cutoff sooner, larger ones spend less time in Python
+TOP_CHOICES_CHUNK_SIZE = 64
+
+
+class VehicleScorer:
+    """
+    Scores one description against many vehicles in a single batched call.
+
+    Produces the same scores as calling `thefuzz.fuzz.token_set_ratio(description,
+    vehicle.get_description())` per vehicle, but each vehicle's description is
+    built and normalised only once, and all candidates are scored together by
+    `rapidfuzz.process.extract`. Descriptions are cached by the attribute values they
+    are built from rather than by vehicle id, so a vehicle whose row changed is never
+    scored on its old description.
+    """
+
+    def __init__(self, vehicles: Optional[Iterable[Vehicle]] = None):
+        """
+        Initialize the VehicleScorer.
+
+        Args:
+            vehicles: Optional vehicles whose descriptions are prepared up front,
+                e.g. a whole catalogue.
+        """
+        # Normalised descriptions keyed by Vehicle.description_fields
+        self._descriptions: Dict[Tuple[str, ...], str] = {}
+        if vehicles is not None:
+            self.prepare(vehicles)
+
+    def prepare(self, vehicles: Iterable[Vehicle]) -> None:
+        """
+        Normalise and cache the descriptions of the given vehicles.
+
+        Args:
+            vehicles: Vehicles to prepare.
+        """
+        for vehicle in vehicles:
+            self._descriptions[vehicle.description_fields()] = preprocess(vehicle.get_description())
+
+    def clear(self) -> None:
+        """Forget every cached vehicle description."""
+        self._descriptions.clear()
+
+    def vehicle_description(self, vehicle: Vehicle) -> str:
+        """
+        Return the normalised description of a vehicle, preparing it if necessary.
+
+        Args:
+            vehicle: The vehicle to describe.
+
+        Returns:
+            str: The vehicle's normalised description.
+        """
+        key = vehicle.description_fields()
+        description = self._descriptions.get(key)
+        if description is None:
+            description = preprocess(vehicle.get_description())
+            self._descriptions[key] = description
+        return description
+
+    def score(self, description: str, vehicles: List[Vehicle]) -> List[int]:
+        """
+        Score a description against every vehicle.
+
+        Args:
+            description: The description to score.
+            vehicles: The candidate vehicles.
+
+        Returns:
+            List[int]: token_set_ratio score (0-100) for each vehicle, in order.
+        """
+        return self.score_choices(description, [self.vehicle_description(vehicle) for vehicle in vehicles])
+
+    def score_choices(self, description: str, choices: List[str]) -> List[int]:
+        """
+        Score a description against already normalised vehicle descriptions.
+
+        Args:
+            description: The description to score.
+            choices: Normalised vehicle descriptions, as returned by `preprocess`.
+
+        Returns:
+            List[int]: token_set_ratio score (0-100) for each choice, in order.
+        """
+        query = preprocess(description)
+        scores = [0] * len(choices)
+        for _, score, index in process.extract(query, choices, scorer=fuzz.token_set_ratio,
+                                               processor=None, limit=None):
+            scores[index] = int(round(score))
+        return scores
+
+    def best_vehicle(self, description: str, vehicles: List[Vehicle]) -> Tuple[Vehicle, int]:
+        """
+        Find the highest scoring vehicle, breaking ties on listing count.
+
+        Among vehicles tied on both score and listing count, the earliest wins.
+
+        Args:
+            description: The description to score.
+            vehicles: The candidate vehicles. Must not be empty.
+
+        Returns:
+            Tuple[Vehicle, int]: The best vehicle and its score.
+
+        Raises:
+            ValueError: If there are no vehicles.
+        """
+        if not vehicles:
+            raise ValueError("Cannot pick the best of no vehicles")
+        best_index, score = self.best_choice(
+            description,
+            [self.vehicle_description(vehicle) for vehicle in vehicles],
+            [vehicle.listing_count for vehicle in vehicles],
+        )
+        return vehicles[best_index], score
+
+    def best_choice(self, description: str, choices: List[str],
+                    listing_counts: Sequence[int]) -> Tuple[int, int]:
+        """
+        Find the highest scoring of several normalised vehicle descriptions, breaking
+        ties on listing count and then on order.
+
+        Args:
+            description: The description to score.
+            choices: Normalised vehicle descriptions. Must not be empty.
+            listing_counts: Listing count of the vehicle behind each choice.
+
+        Returns:
+            Tuple[int, int]: Index of the best choice and its score.
+
+        Raises:
+            ValueError: If there are no choices.
+        """
+        if not choices:
+            raise ValueError("Cannot pick the best of no vehicles")
+        return self.top_choices(description, choices, listing_counts, 1)[0]
+
+    def top_choices(self, description: str, choices: List[str], listing_counts: Sequence[int],
+                    k: int, chunk_size: int = TOP_CHOICES_CHUNK_SIZE) -> List[Tuple[int, int]]:
+        """
+        Find the `k` highest scoring of several normalised vehicle descriptions, ranked
+        as in `best_choice`: by score, then listing count, then order.
+
+        The best `k` so far are kept in a heap, and choices are scored a chunk at a
+        time with the worst score in the full heap as cutoff. Below the cutoff,
+        token_set_ratio gives up as soon as the shared tokens and the lengths of the
+        unshared ones show the cutoff cannot be reached, so choices that cannot enter
+        the top `k` are rarely aligned in full.
+
+        Args:
+            description: The description to score.
+            choices: Normalised vehicle descriptions.
+            listing_counts: Listing count of the vehicle behind each choice.
+            k: Maximum number of choices returned.
+            chunk_size: Number of choices scored per batched call.
+
+        Returns:
+            List[Tuple[int, int]]: Index and score of the best choices, best first.
+
+        Raises:
+            ValueError: If k is less than 1.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        query = preprocess(description)
+        # Min-heap of (score, listing count, -index): the root is the worst kept choice
+        best: List[Tuple[int, int, int]] = []
+        for start in range(0, len(choices), chunk_size):
+            # Scores are rounded, so anything within half a point of the worst may tie it
+            cutoff = best[0][0] - 0.5 if len(best) == k and best[0][0] > 0 else None
+            for _, score, offset in process.extract(query, choices[start:start + chunk_size],
+                                                    scorer=fuzz.token_set_ratio, processor=None,
+                                                    limit=None, score_cutoff=cutoff):
+                index = start + offset
+                entry = (int(round(score)), listing_counts[index], -index)
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        return [(-negative_index, score) for score, _, negative_index in sorted(best, reverse=True)]
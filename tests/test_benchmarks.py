@@ -0,0 +1,121 @@
+"""
+Tests for the synthetic benchmark data and the benchmark runner.
+"""
+
+import json
+from pathlib import Path
+import bench_matcher
+import bench_startup
+from synthetic_data import generate_catalogue, generate_descriptions, load_aliases
+
+ALIASES_FILE = Path(__file__).resolve().parent.parent / "vehicle_aliases.yaml"
+
+
+class TestSyntheticData:
+    """Test cases for the synthetic catalogue and description generators."""
+
+    def test_catalogue_is_deterministic_and_distinct(self):
+        """Test that a seed always gives the same catalogue of distinct vehicles."""
+        vehicles = generate_catalogue(2000, seed=7)
+
+        assert vehicles == generate_catalogue(2000, seed=7)
+        assert len(vehicles) == 2000
+        assert len({v.id for v in vehicles}) == 2000
+        assert len({v.get_description() for v in vehicles}) == 2000
+
+    def test_listing_counts_are_skewed(self):
+        """Test that a small share of vehicles carries a large share of listings."""
+        counts = sorted((v.listing_count for v in generate_catalogue(5000, seed=1)), reverse=True)
+
+        assert min(counts) >= 0
+        assert sum(counts[:len(counts) // 10]) > sum(counts) / 2
+
+    def test_descriptions_refer_to_catalogue_vehicles(self):
+        """Test that every description names its source vehicle and a model."""
+        vehicles = generate_catalogue(500, seed=3)
+        by_id = {v.id: v for v in vehicles}
+
+        samples = list(generate_descriptions(vehicles, 200, load_aliases(ALIASES_FILE), seed=3,
+                                             typo_rate=0.0))
+
+        assert len(samples) == 200
+        for sample in samples:
+            assert by_id[sample.vehicle_id].model.lower() in sample.description.lower()
+
+    def test_load_aliases(self):
+        """Test that aliases are keyed by canonical value."""
+        aliases = load_aliases(ALIASES_FILE)
+
+        assert aliases["Volkswagen"] == ["VW"]
+        assert "Auto" in aliases["Automatic"]
+
+
+class TestBenchMatcher:
+    """Test cases for the benchmark runner."""
+
+    def test_in_memory_run_reports_every_stage(self, tmp_path, capsys):
+        """Test an in-memory run end to end, including comparing with its own report."""
+        report_file = tmp_path / "report.json"
+        args = ["--vehicles", "300", "--descriptions", "40", "--no-memory"]
+
+        assert bench_matcher.main(args + ["--json", str(report_file)]) == 0
+        report = json.loads(report_file.read_text())
+
+        assert [stage["stage"] for stage in report["stages"]] == bench_matcher.STAGES
+        assert all(stage["per_second"] > 0 for stage in report["stages"])
+        assert 0 < report["accuracy"] <= 1
+        assert bench_matcher.main(args + ["--compare", str(report_file), "--tolerance", "1"]) == 0
+
+    def test_compare_flags_throughput_drops(self):
+        """Test that only stages slower than the tolerance allows are flagged."""
+        baseline = {"stages": [{"stage": "attributes", "per_second": 1000.0},
+                               {"stage": "scoring", "per_second": 1000.0}]}
+        reports = [bench_matcher.StageReport("attributes", 10, 900.0, 0, 0, 0),
+                   bench_matcher.StageReport("scoring", 10, 700.0, 0, 0, 0)]
+
+        regressions = bench_matcher.compare(reports, baseline, tolerance=0.2)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith("scoring")
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles."""
+        values = list(range(1, 101))
+
+        assert bench_matcher.percentile(values, 0.5) == 50
+        assert bench_matcher.percentile(values, 0.99) == 99
+        assert bench_matcher.percentile([], 0.5) == 0.0
+
+
+class TestBenchStartup:
+    """Test cases for the start-up benchmark."""
+
+    def test_load_budget_overrides_defaults(self, tmp_path):
+        """Test that the pyproject table overrides only the budgets it sets."""
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text("[tool.autograb.startup_budget]\nimport_ms = 50\n")
+
+        budget = bench_startup.load_budget(pyproject)
+
+        assert budget["import"] == 50.0
+        assert budget["help"] == bench_startup.DEFAULT_BUDGET_MS["help"]
+        assert bench_startup.load_budget(tmp_path / "missing.toml") == bench_startup.DEFAULT_BUDGET_MS
+
+    def test_over_budget(self):
+        """Test that only measurements slower than their budget are reported."""
+        failures = bench_startup.over_budget({"import": 120.0, "help": 80.0},
+                                             {"import": 100.0, "help": 200.0})
+
+        assert len(failures) == 1
+        assert failures[0].startswith("import")
+
+    def test_run_within_budget(self, tmp_path):
+        """Test a run without the database end to end, against a generous budget."""
+        pyproject = tmp_path / "pyproject.toml"
+        pyproject.write_text("[tool.autograb.startup_budget]\nimport_ms = 5000\nhelp_ms = 5000\n"
+                             "empty_input_ms = 5000\n")
+        report_file = tmp_path / "startup.json"
+
+        assert bench_startup.main(["--repeat", "1", "--no-database", "--pyproject", str(pyproject),
+                                   "--json", str(report_file)]) == 0
+        assert set(json.loads(report_file.read_text())["results_ms"]) == {"import", "help", "empty_input"}
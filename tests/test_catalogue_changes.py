@@ -0,0 +1,282 @@
+"""
+Integration tests for change tracking and VehicleMatcher.refresh.
+"""
+
+import os
+import shutil
+from unittest.mock import MagicMock
+import psycopg2
+import pytest
+import yaml
+from catalogue_changes import ChangeTracker, catalogue_version, migrate
+from db_client import DatabaseClient
+from listing_counts import ListingCountStore
+from vehicle_matcher import VehicleMatcher
+
+NEW_VEHICLE_ID = "test-hot-reload-1"
+NEW_LISTING_ID = "test-hot-reload-listing-1"
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    yield db_client
+    db_client.close()
+
+
+@pytest.fixture
+def new_vehicle(db_client):
+    """Removes the vehicle the tests add, however they end."""
+    yield NEW_VEHICLE_ID
+    db_client.query("DELETE FROM vehicle WHERE id = %s", (NEW_VEHICLE_ID,))
+
+
+@pytest.fixture
+def new_listing(db_client):
+    """Removes the listing the tests add, however they end, and recounts without it."""
+    yield NEW_LISTING_ID
+    db_client.query("DELETE FROM listing WHERE id = %s", (NEW_LISTING_ID,))
+    ListingCountStore(db_client).refresh()
+
+
+def insert_listing(db_client, vehicle_id: str) -> None:
+    db_client.query(
+        "INSERT INTO listing (id, vehicle_id, url, price, kms) VALUES (%s, %s, 'https://example.com', 1, 1)",
+        (NEW_LISTING_ID, vehicle_id),
+    )
+
+
+def insert_vehicle(db_client, model: str = "Hotrod") -> None:
+    db_client.query(
+        "INSERT INTO vehicle (id, make, model, badge, transmission_type, fuel_type, drive_type) "
+        "VALUES (%s, 'Toyota', %s, 'GX', 'Automatic', 'Petrol', 'Rear Wheel Drive')",
+        (NEW_VEHICLE_ID, model),
+    )
+
+
+class TestChangeTracker:
+    """Test cases for ChangeTracker class."""
+
+    def test_detects_added_modified_and_removed_vehicles(self, db_client, new_vehicle):
+        """Test that each kind of row change is reported until accepted."""
+        tracker = ChangeTracker(db_client)
+        assert not tracker.detect()
+
+        insert_vehicle(db_client)
+        changes = tracker.detect()
+        assert [vehicle.id for vehicle in changes.upserted] == [NEW_VEHICLE_ID]
+        assert tracker.detect().upserted == changes.upserted
+        tracker.accept(changes)
+        assert not tracker.detect()
+
+        db_client.query("UPDATE vehicle SET badge = 'GXL' WHERE id = %s", (NEW_VEHICLE_ID,))
+        changes = tracker.detect()
+        assert changes.upserted[0].badge == "GXL"
+        tracker.accept(changes)
+
+        db_client.query("DELETE FROM vehicle WHERE id = %s", (NEW_VEHICLE_ID,))
+        changes = tracker.detect()
+        assert changes.removed_ids == [NEW_VEHICLE_ID]
+        assert changes.stale_ids == {NEW_VEHICLE_ID}
+
+    def test_detects_listing_count_changes(self, db_client, new_listing):
+        """Test that a vehicle gaining a listing is reported as recounted once the
+        materialised counts are refreshed."""
+        counts = ListingCountStore(db_client)
+        counts.refresh()
+        tracker = ChangeTracker(db_client, materialised_counts=True)
+        vehicle_id = db_client.query("SELECT MIN(id) AS id FROM vehicle")[0]['id']
+
+        insert_listing(db_client, vehicle_id)
+        assert not tracker.detect(materialised_counts=True)
+        counts.refresh()
+        changes = tracker.detect(materialised_counts=True)
+
+        assert changes and not changes.catalogue_changed
+        assert [vehicle.id for vehicle in changes.recounted] == [vehicle_id]
+        assert changes.stale_ids == {vehicle_id}
+        tracker.accept(changes)
+        assert not tracker.detect(materialised_counts=True)
+
+    def test_unchanged_catalogue_is_not_rescanned(self, db_client, monkeypatch):
+        """Test that rows are not hashed again while the catalogue version stands still."""
+        migrate(db_client)
+        tracker = ChangeTracker(db_client)
+        monkeypatch.setattr(tracker, "_current_rows", MagicMock(side_effect=AssertionError))
+
+        assert not tracker.detect()
+
+    def test_detects_alias_file_changes(self, db_client, tmp_path):
+        """Test that touching the alias file is reported."""
+        yaml_file = tmp_path / "aliases.yaml"
+        shutil.copy("vehicle_aliases.yaml", yaml_file)
+        tracker = ChangeTracker(db_client, str(yaml_file))
+
+        os.utime(yaml_file, ns=(0, os.stat(yaml_file).st_mtime_ns + 1_000_000_000))
+
+        assert tracker.detect().aliases_changed
+
+
+class TestCatalogueVersion:
+    """Test cases for catalogue_version function."""
+
+    def test_changes_with_vehicles_and_count_refreshes_only(self, db_client, new_vehicle):
+        """Test that the version moves on with vehicle writes and listing count refreshes."""
+        migrate(db_client)
+        version = catalogue_version(db_client)
+        db_client.query("UPDATE listing SET vehicle_id = vehicle_id WHERE id = (SELECT MIN(id) FROM listing)")
+        assert catalogue_version(db_client) == version
+
+        insert_vehicle(db_client)
+        after_insert = catalogue_version(db_client)
+        assert after_insert != version
+
+        ListingCountStore(db_client).refresh()
+        assert catalogue_version(db_client) != after_insert
+
+    def test_listing_writes_take_no_version_lock(self, db_client):
+        """Test that writing listings does not touch the version row."""
+        migrate(db_client)
+        triggers = db_client.query(
+            "SELECT tgname FROM pg_trigger WHERE tgrelid = 'listing'::regclass AND NOT tgisinternal"
+        )
+
+        assert triggers == []
+
+    def test_falls_back_to_fingerprint_without_version_table(self):
+        """Test that an unmigrated database is versioned by hashing its tables."""
+        db_client = MagicMock()
+        db_client.query.side_effect = [
+            psycopg2.errors.UndefinedTable("relation \"catalogue_version\" does not exist"),
+            [{'vehicles': 2, 'vehicle_hash': 7}],
+            psycopg2.errors.UndefinedTable("relation \"vehicle_listing_count\" does not exist"),
+        ]
+
+        assert catalogue_version(db_client) == "2:7:live"
+
+
+class TestVehicleMatcherRefresh:
+    """Test cases for VehicleMatcher.refresh."""
+
+    @pytest.mark.parametrize("use_catalogue", [True, False])
+    def test_refresh_applies_new_and_removed_vehicles(self, db_client, new_vehicle, use_catalogue):
+        """Test that vehicles added and removed after loading are picked up."""
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml",
+                                 use_catalogue=use_catalogue, cache_size=100, track_changes=True)
+        assert matcher.refresh() is False
+        golf = matcher.find_best_matching_vehicle("Golf GTI")
+        assert matcher.find_best_matching_vehicle("Toyota Hotrod GX")[0].model != "Hotrod"
+
+        insert_vehicle(db_client)
+        assert matcher.refresh() is True
+
+        assert matcher.find_best_matching_vehicle("Toyota Hotrod GX")[0].id == NEW_VEHICLE_ID
+        assert matcher.find_best_matching_vehicle("Golf GTI") == golf
+        assert matcher.cache.stats.hits == 1
+
+        db_client.query("DELETE FROM vehicle WHERE id = %s", (NEW_VEHICLE_ID,))
+        assert matcher.refresh() is True
+
+        vehicle, _ = matcher.find_best_matching_vehicle("Toyota Hotrod GX")
+        assert vehicle is None or vehicle.id != NEW_VEHICLE_ID
+
+    def test_refresh_applies_new_aliases(self, db_client, tmp_path):
+        """Test that an alias added to the file is matched after a refresh."""
+        yaml_file = tmp_path / "aliases.yaml"
+        shutil.copy("vehicle_aliases.yaml", yaml_file)
+        matcher = VehicleMatcher(db_client, yaml_file=str(yaml_file), use_catalogue=True,
+                                 cache_size=100, track_changes=True)
+        assert "model" not in matcher.vehicle_attributes.find_matching_attributes("Kamry")
+        matcher.find_best_matching_vehicles(["Toyota Kamry Ascent", "Golf GTI"])
+
+        with open(yaml_file, "a") as file:
+            file.write("\nmodel:\n  - name: Camry\n    aliases: [Kamry]\n")
+        os.utime(yaml_file, ns=(0, os.stat(yaml_file).st_mtime_ns + 1_000_000_000))
+        assert matcher.refresh() is True
+
+        assert matcher.vehicle_attributes.find_matching_attributes("Kamry") == {"model": ["Camry"]}
+        assert matcher.cache.get("Golf GTI") is not None
+        assert matcher.cache.get("Toyota Kamry Ascent") is None
+        assert matcher.find_best_matching_vehicle("Toyota Kamry Ascent")[0].model == "Camry"
+
+    @pytest.mark.parametrize("use_catalogue", [True, False])
+    def test_refresh_applies_listing_counts(self, db_client, new_listing, use_catalogue):
+        """Test that results involving a vehicle whose listing count changed are dropped."""
+        counts = ListingCountStore(db_client)
+        counts.refresh()
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", use_catalogue=use_catalogue,
+                                 cache_size=100, track_changes=True)
+        golf, _ = matcher.find_best_matching_vehicle("Golf GTI")
+        matcher.find_best_matching_vehicle("Toyota Camry")
+
+        insert_listing(db_client, golf.id)
+        counts.refresh()
+        assert matcher.refresh() is True
+
+        assert matcher.cache.get("Golf GTI") is None
+        assert matcher.cache.get("Toyota Camry") is not None
+        assert matcher.find_best_matching_vehicle("Golf GTI")[0].listing_count == golf.listing_count + 1
+
+    def test_refresh_refuses_results_computed_before_it(self, db_client, new_vehicle):
+        """Test that a result computed from the old catalogue is not cached after a refresh."""
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", use_catalogue=True,
+                                 cache_size=100, track_changes=True)
+        generation = matcher.cache.generation
+        stale = matcher._match_uncached(matcher._state, ["Toyota Hotrod GX"])[0]
+
+        insert_vehicle(db_client)
+        matcher.refresh()
+
+        assert matcher.cache.put(stale, generation) is False
+        assert matcher.find_best_matching_vehicle("Toyota Hotrod GX")[0].id == NEW_VEHICLE_ID
+
+    def test_match_reads_one_state_across_a_reload(self, db_client):
+        """Test that a match resolves its candidates in the catalogue it found them in."""
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", use_catalogue=True)
+        expected = matcher.find_best_matching_vehicle("Toyota Camry Ascent")
+        old_state = matcher._state
+        find_candidates = matcher._find_candidates
+
+        def find_then_reload(state, matched_attributes):
+            candidates = find_candidates(state, matched_attributes)
+            # Sorted first, this vehicle shifts every position in the reloaded catalogue
+            db_client.query(
+                "INSERT INTO vehicle (id, make, model, badge, transmission_type, fuel_type, drive_type) "
+                "VALUES ('0-test-hot-reload', 'Toyota', 'Hotrod', 'GX', 'Automatic', 'Petrol', "
+                "'Rear Wheel Drive')"
+            )
+            matcher.reload()
+            return candidates
+
+        matcher._find_candidates = find_then_reload
+        try:
+            assert matcher.find_best_matching_vehicle("Toyota Camry Ascent") == expected
+        finally:
+            db_client.query("DELETE FROM vehicle WHERE id = '0-test-hot-reload'")
+        assert matcher._state is not old_state
+        assert len(matcher.catalogue) == len(old_state.catalogue) + 1
+
+    def test_failed_refresh_keeps_vocabulary_and_changes(self, db_client, tmp_path):
+        """Test that an unreadable alias file leaves the vocabulary alone until it is fixed."""
+        yaml_file = tmp_path / "aliases.yaml"
+        shutil.copy("vehicle_aliases.yaml", yaml_file)
+        matcher = VehicleMatcher(db_client, yaml_file=str(yaml_file), cache_size=100, track_changes=True)
+        original = yaml_file.read_text()
+
+        yaml_file.write_text(original + "\nmodel:\n  - name: [Camry\n")
+        with pytest.raises(yaml.YAMLError):
+            matcher.refresh()
+        assert matcher.vehicle_attributes.find_matching_attributes("VW") == {"make": ["Volkswagen"]}
+
+        yaml_file.write_text(original + "\nmodel:\n  - name: Camry\n    aliases: [Kamry]\n")
+        os.utime(yaml_file, ns=(0, os.stat(yaml_file).st_mtime_ns + 1_000_000_000))
+        assert matcher.refresh() is True
+        assert matcher.vehicle_attributes.find_matching_attributes("Kamry") == {"model": ["Camry"]}
+
+    def test_refresh_without_tracking_reloads(self, db_client):
+        """Test that an untracked matcher falls back to a full reload."""
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", cache_size=100)
+        matcher.find_best_matching_vehicle("Golf GTI")
+
+        assert matcher.refresh() is True
+        assert len(matcher.cache) == 0
@@ -0,0 +1,220 @@
+"""
+Tests for the ConnectionPool class and pooled DatabaseClient queries and prepared statements.
+"""
+
+import threading
+import time
+import pytest
+import psycopg2
+from unittest.mock import MagicMock, patch
+from connection_pool import ConnectionPool, ConnectionPoolError
+from db_client import DatabaseClient, PreparedStatement
+
+
+def make_connection() -> MagicMock:
+    conn = MagicMock()
+    conn.closed = 0
+    return conn
+
+
+@pytest.fixture
+def connect():
+    """Fixture patching psycopg2.connect to hand out fresh mock connections."""
+    with patch("connection_pool.psycopg2.connect") as connect:
+        connect.side_effect = lambda dsn: make_connection()
+        yield connect
+
+
+class TestConnectionPool:
+    """Test cases for ConnectionPool class."""
+
+    def test_connection_is_reused(self, connect):
+        """Test that a returned connection is handed out again."""
+        pool = ConnectionPool("dsn")
+
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert first is second
+        connect.assert_called_once_with("dsn")
+        assert pool.stats.checkouts == 2
+        assert pool.stats.opened == 1
+
+    def test_transaction_rolled_back_on_release(self, connect):
+        """Test that connections are returned without an open transaction."""
+        pool = ConnectionPool("dsn")
+
+        with pool.connection() as conn:
+            pass
+
+        conn.rollback.assert_called_once()
+
+    def test_closed_connection_is_replaced(self, connect):
+        """Test that a connection closed while checked out is not reused."""
+        pool = ConnectionPool("dsn")
+
+        with pool.connection() as first:
+            first.closed = 1
+        with pool.connection() as second:
+            pass
+
+        assert first is not second
+        assert pool.stats.reconnects == 1
+        assert pool.size == 1
+
+    def test_health_check_replaces_broken_connection(self, connect):
+        """Test that a connection failing the health check is reopened."""
+        pool = ConnectionPool("dsn", health_check_interval=0)
+        with pool.connection() as first:
+            pass
+        first.cursor.return_value.__enter__.return_value.execute.side_effect = \
+            psycopg2.OperationalError("server closed the connection")
+
+        with pool.connection() as second:
+            pass
+
+        assert first is not second
+        first.close.assert_called_once()
+        assert pool.stats.reconnects == 1
+
+    def test_idle_connections_evicted_above_min_size(self, connect):
+        """Test that idle connections beyond min_size are closed after the timeout."""
+        pool = ConnectionPool("dsn", min_size=1, max_size=2, idle_timeout=0)
+        with pool.connection() as first:
+            with pool.connection() as second:
+                pass
+
+        with pool.connection():
+            pass
+
+        assert pool.size == 1
+        assert first.close.called != second.close.called
+
+    def test_checkout_times_out_when_exhausted(self, connect):
+        """Test that checkout gives up once max_size connections are in use."""
+        pool = ConnectionPool("dsn", max_size=1, checkout_timeout=0.01)
+
+        with pool.connection():
+            with pytest.raises(ConnectionPoolError, match="Timed out"):
+                with pool.connection():
+                    pass
+
+    def test_waiting_checkout_gets_released_connection(self, connect):
+        """Test that a waiting thread receives a connection when one is returned."""
+        pool = ConnectionPool("dsn", max_size=1, checkout_timeout=5)
+        checked_out = threading.Event()
+        received = []
+
+        def worker():
+            checked_out.wait()
+            with pool.connection() as conn:
+                received.append(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        with pool.connection() as conn:
+            checked_out.set()
+            while not pool._condition._waiters:
+                time.sleep(0.001)
+        thread.join()
+
+        assert received == [conn]
+        assert pool.stats.waits == 1
+
+    def test_close_refuses_checkouts(self, connect):
+        """Test that a closed pool closes idle connections and refuses checkouts."""
+        pool = ConnectionPool("dsn")
+        with pool.connection() as conn:
+            pass
+
+        pool.close()
+
+        conn.close.assert_called_once()
+        with pytest.raises(ConnectionPoolError, match="closed"):
+            with pool.connection():
+                pass
+
+    def test_invalid_sizes(self):
+        """Test that inconsistent pool sizes are rejected."""
+        with pytest.raises(ValueError):
+            ConnectionPool("dsn", min_size=3, max_size=2)
+
+
+class TestDatabaseClientPooling:
+    """Test cases for DatabaseClient query retries over the pool."""
+
+    def test_query_retried_on_dropped_connection(self, connect):
+        """Test that a query is retried once on a fresh connection."""
+        dropped = make_connection()
+
+        def fail(*args):
+            dropped.closed = 2
+            raise psycopg2.OperationalError("server closed the connection")
+
+        dropped.cursor.return_value.__enter__.return_value.execute.side_effect = fail
+        healthy = make_connection()
+        healthy.cursor.return_value.__enter__.return_value.fetchall.return_value = [{'x': 1}]
+        connect.side_effect = [dropped, healthy]
+
+        with DatabaseClient(dsn="dsn") as client:
+            assert client.query("SELECT 1 AS x") == [{'x': 1}]
+            assert client.stats.reconnects == 1
+
+    def test_query_error_not_retried_on_live_connection(self, connect):
+        """Test that failures on a healthy connection are raised without retrying."""
+        conn = make_connection()
+        conn.cursor.return_value.__enter__.return_value.execute.side_effect = \
+            psycopg2.OperationalError("canceling statement due to statement timeout")
+        connect.side_effect = [conn]
+
+        with DatabaseClient(dsn="dsn") as client:
+            with pytest.raises(psycopg2.OperationalError):
+                client.query("SELECT pg_sleep(10)")
+        connect.assert_called_once()
+
+
+class TestDatabaseClientPreparedStatements:
+    """Test cases for DatabaseClient.execute_prepared."""
+
+    STATEMENT = PreparedStatement("vehicle_by_make", "SELECT id FROM vehicle WHERE make = ANY($1)",
+                                  ("text[]",))
+
+    @staticmethod
+    def executed(conn: MagicMock) -> list:
+        cur = conn.cursor.return_value.__enter__.return_value
+        return [call.args[0] for call in cur.execute.call_args_list]
+
+    def test_prepared_once_per_connection(self, connect):
+        """Test that a statement is prepared on first use and then executed by name."""
+        conn = make_connection()
+        conn.cursor.return_value.__enter__.return_value.fetchall.return_value = [("a",)]
+        connect.side_effect = [conn]
+
+        with DatabaseClient(dsn="dsn") as client:
+            assert client.execute_prepared(self.STATEMENT, (["Toyota"],)) == [("a",)]
+            client.execute_prepared(self.STATEMENT, (["Ford", "Kia"],))
+
+        assert self.executed(conn) == [
+            "PREPARE vehicle_by_make (text[]) AS SELECT id FROM vehicle WHERE make = ANY($1)",
+            "EXECUTE vehicle_by_make (%s)",
+            "EXECUTE vehicle_by_make (%s)",
+        ]
+
+    def test_prepared_again_on_fresh_connection(self, connect):
+        """Test that a retry on a fresh connection prepares the statement there too."""
+        dropped = make_connection()
+
+        def fail(*args):
+            dropped.closed = 2
+            raise psycopg2.OperationalError("server closed the connection")
+
+        dropped.cursor.return_value.__enter__.return_value.execute.side_effect = fail
+        healthy = make_connection()
+        connect.side_effect = [dropped, healthy]
+
+        with DatabaseClient(dsn="dsn") as client:
+            client.execute_prepared(self.STATEMENT, (["Toyota"],))
+
+        assert self.executed(healthy)[0].startswith("PREPARE vehicle_by_make")
@@ -0,0 +1,66 @@
+"""
+Tests for the FuzzyTermIndex symmetric-delete index.
+"""
+
+import pytest
+from fuzzy_terms import FuzzyTermIndex, deletes
+
+
+class TestDeletes:
+    """Test cases for deletes."""
+
+    def test_single_deletes(self):
+        """Test that every single-character deletion is produced, with the text itself."""
+        assert deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+
+    def test_double_deletes(self):
+        """Test that deletions compose."""
+        assert deletes("abc", 2) == {"abc", "bc", "ac", "ab", "a", "b", "c"}
+
+
+class TestFuzzyTermIndex:
+    """Test cases for FuzzyTermIndex class."""
+
+    @pytest.fixture
+    def index(self):
+        """Fixture providing an index over a small vocabulary."""
+        return FuzzyTermIndex([
+            ('make', 'Volkswagen', 'Volkswagen'),
+            ('make', 'Volkswagen', 'VW'),
+            ('model', 'Amarok', 'Amarok'),
+            ('model', 'Golf', 'Golf'),
+            ('model', 'Tiguan', 'Tiguan'),
+            ('drive_type', 'Rear Wheel Drive', 'Rear Wheel Drive'),
+        ])
+
+    def test_finds_one_edit(self, index):
+        """Test that a term with a missing letter is found with its span and distance."""
+        [match] = index.find_all("VW Amrok TDI550")
+
+        assert (match.name, match.start, match.end, match.distance) == ('Amarok', 3, 8, 1)
+
+    def test_finds_transpositions(self, index):
+        """Test that swapped adjacent letters count as one edit."""
+        assert [m.name for m in index.find_all("amaork")] == ['Amarok']
+
+    def test_long_terms_tolerate_two_edits(self, index):
+        """Test that terms of long_length characters or more tolerate two edits."""
+        [match] = index.find_all("Folkswagan")
+
+        assert (match.name, match.distance) == ('Volkswagen', 2)
+        assert index.find_all("Amrk") == []
+
+    def test_matches_multi_word_terms(self, index):
+        """Test that terms spanning several words are matched across them."""
+        [match] = index.find_all("Amarok rear whel drive")
+
+        assert (match.name, match.start, match.end) == ('Rear Wheel Drive', 7, 22)
+
+    def test_ignores_exact_and_short_terms(self, index):
+        """Test that exact occurrences and short terms are not reported."""
+        assert index.find_all("Tiguan") == []
+        assert index.find_all("Gold") == []
+
+    def test_excluded_spans(self, index):
+        """Test that words overlapping an excluded span are skipped."""
+        assert index.find_all("Tiguann", exclude=[(0, 6)]) == []
@@ -0,0 +1,89 @@
+"""
+Tests for the ListingCountStore materialised listing counts.
+"""
+
+import pytest
+import psycopg2
+from unittest.mock import MagicMock
+from db_client import DatabaseClient
+from listing_counts import ListingCountStore
+from vehicle_matcher import VehicleMatcher
+
+
+class TestListingCountStore:
+    """Test cases for ListingCountStore freshness decisions."""
+
+    def test_missing_view_is_not_fresh(self):
+        """Test that a missing view falls back to the live join."""
+        db_client = MagicMock()
+        db_client.query.side_effect = psycopg2.errors.UndefinedTable("no such relation")
+        store = ListingCountStore(db_client)
+
+        assert store.age() is None
+        assert store.is_fresh() is False
+
+    def test_fresh_within_max_age(self):
+        """Test that counts younger than max_age are used."""
+        db_client = MagicMock()
+        db_client.query.return_value = [{'age': 30.0}]
+
+        assert ListingCountStore(db_client, max_age=60).is_fresh() is True
+        assert ListingCountStore(db_client, max_age=10).is_fresh() is False
+
+    def test_freshness_rechecked_after_interval(self):
+        """Test that freshness is cached between checks."""
+        db_client = MagicMock()
+        db_client.query.return_value = [{'age': 30.0}]
+        store = ListingCountStore(db_client, max_age=60, recheck_interval=3600)
+
+        store.is_fresh()
+        store.is_fresh()
+
+        db_client.query.assert_called_once()
+
+    def test_disabled_never_queries(self):
+        """Test that max_age=None always uses the live join."""
+        db_client = MagicMock()
+
+        assert ListingCountStore(db_client, max_age=None).is_fresh() is False
+        db_client.query.assert_not_called()
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    ListingCountStore(db_client).migrate()
+    yield db_client
+    db_client.close()
+
+
+class TestListingCountStoreWithDb:
+    """Integration tests against the materialised view."""
+
+    def test_refresh_makes_counts_fresh(self, db_client):
+        """Test that refreshing resets the age of the counts."""
+        store = ListingCountStore(db_client, max_age=60)
+
+        store.refresh()
+
+        assert store.age() < 60
+        assert store.is_fresh() is True
+
+    def test_matcher_reads_materialised_counts(self, db_client, monkeypatch):
+        """Test that fresh counts replace the live join and give the same matches."""
+        ListingCountStore(db_client).refresh()
+        live_matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml",
+                                      listing_count_max_age=None)
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml")
+        queries = []
+        original_execute = db_client.execute_prepared
+        monkeypatch.setattr(db_client, "execute_prepared",
+                            lambda statement, *args: queries.append(statement.sql)
+                            or original_execute(statement, *args))
+        descriptions = ["Toyota Camry Hybrid", "VW Amarok Ultimate", "Golf GTI"]
+
+        results = matcher.find_best_matching_vehicles(descriptions)
+
+        assert all("vehicle_listing_count" in sql for sql in queries)
+        assert [vehicle.listing_count for vehicle, _ in results] == \
+            [vehicle.listing_count for vehicle, _ in live_matcher.find_best_matching_vehicles(descriptions)]
@@ -0,0 +1,81 @@
+"""
+Tests for the command line runner's start-up.
+"""
+
+import io
+import subprocess
+import sys
+from collections import deque
+from pathlib import Path
+import main
+import vehicle_matcher
+from retrieval_backends import RETRIEVAL_BACKENDS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules only needed once there is a description to match
+HEAVY_MODULES = ["psycopg2", "yaml", "dotenv", "thefuzz", "rapidfuzz", "db_client",
+                 "vehicle_matcher", "parallel_matcher"]
+
+
+def imported_heavy_modules(script: str) -> list:
+    """Run the script in a fresh interpreter and list the heavy modules it imported."""
+    output = subprocess.run(
+        [sys.executable, "-c", f"{script}\nimport sys\n"
+                               f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"],
+        capture_output=True, text=True, cwd=ROOT / "src", check=True,
+    ).stdout
+    return output.split()
+
+
+def test_import_defers_heavy_modules():
+    """Test that importing main imports neither the database driver nor the matcher."""
+    assert imported_heavy_modules("import main") == []
+
+
+def test_empty_input_builds_no_matcher(tmp_path):
+    """Test that an empty input is processed without loading the matcher."""
+    empty = tmp_path / "empty.txt"
+    empty.write_text("\n")
+
+    assert imported_heavy_modules(
+        f"import io, main\nmain.process_vehicle_descriptions({str(empty)!r}, output_format='jsonl', "
+        f"output=io.StringIO())"
+    ) == []
+
+
+def test_help():
+    """Test that --help lists the options and exits cleanly."""
+    result = subprocess.run([sys.executable, "main.py", "--help"], capture_output=True, text=True,
+                            cwd=ROOT / "src")
+
+    assert result.returncode == 0
+    assert "--retrieval" in result.stdout
+
+
+def test_rejects_workers_below_one():
+    """Test that a worker count below 1 is refused rather than run on one process."""
+    result = subprocess.run([sys.executable, "main.py", "--workers", "0"], capture_output=True, text=True,
+                            cwd=ROOT / "src")
+
+    assert result.returncode == 2
+    assert "must be at least 1" in result.stderr
+
+
+def test_retrieval_choices_cover_backends():
+    """Test that the CLI and the matcher share one list of retrieval backends."""
+    assert vehicle_matcher.RETRIEVAL_BACKENDS is RETRIEVAL_BACKENDS
+    assert main.RETRIEVAL_CHOICES == ["catalogue", *RETRIEVAL_BACKENDS]
+
+
+def test_unstaged_descriptions_skip_staged_and_unkeyed_inputs(capsys):
+    """Test that a resumed run skips its staged inputs and, without positional keys,
+    lines without a key."""
+    stream = io.StringIO("L-1\tGolf GTI\nRAV4 GX 4x4\nL-2\tCamry SL\nL-3\tRanger XL\n")
+    keys = deque()
+
+    descriptions = list(main.unstaged_descriptions(stream, 1, keys, positional_keys=False))
+
+    assert descriptions == ["Camry SL", "Ranger XL"]
+    assert list(keys) == ["L-2", "L-3"]
+    assert "skipped 1 lines" in capsys.readouterr().err
@@ -0,0 +1,122 @@
+"""
+Tests for the MatchCache LRU result cache.
+"""
+
+import pytest
+from unittest.mock import patch
+from match_cache import MatchCache, normalise_description
+from match_result import MatchResult
+
+
+def make_result(description: str, confidence: int = 5) -> MatchResult:
+    return MatchResult(description=description, vehicle=None, confidence=confidence)
+
+
+class TestNormaliseDescription:
+    """Test cases for cache key normalisation."""
+
+    @pytest.mark.parametrize("description", [
+        "Golf GTI", "golf gti", "  Golf   GTI ", "GOLF\tGTI\n",
+    ])
+    def test_variants_share_a_key(self, description):
+        """Test that case and whitespace are collapsed."""
+        assert normalise_description(description) == "golf gti"
+
+    @pytest.mark.parametrize("description", ["Golf-GTI!", "golf_gti", "86 GT M/T"])
+    def test_punctuation_is_kept(self, description):
+        """Test that punctuation, which attribute terms depend on, is kept in the key."""
+        assert normalise_description(description) == description.lower()
+
+
+class TestMatchCache:
+    """Test cases for MatchCache class."""
+
+    def test_hit_returns_result_for_requested_description(self):
+        """Test that a hit is reported with the description that was looked up."""
+        cache = MatchCache()
+        cache.put(make_result("Golf GTI", confidence=4))
+
+        result = cache.get("golf  gti")
+
+        assert result.confidence == 4
+        assert result.description == "golf  gti"
+        assert cache.stats.hits == 1
+
+    def test_miss(self):
+        """Test that an uncached description is a miss."""
+        cache = MatchCache()
+
+        assert cache.get("Golf GTI") is None
+        assert cache.stats.misses == 1
+
+    def test_least_recently_used_entry_evicted(self):
+        """Test that the cache stays within max_entries, evicting the stalest entry."""
+        cache = MatchCache(max_entries=2)
+        cache.put(make_result("a"))
+        cache.put(make_result("b"))
+        cache.get("a")
+
+        cache.put(make_result("c"))
+
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats.evictions == 1
+        assert cache.stats.size == 2
+
+    def test_entries_expire_after_ttl(self):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = MatchCache(ttl=10)
+        with patch("match_cache.time.monotonic", return_value=100.0):
+            cache.put(make_result("Golf GTI"))
+        with patch("match_cache.time.monotonic", return_value=105.0):
+            assert cache.get("Golf GTI") is not None
+        with patch("match_cache.time.monotonic", return_value=111.0):
+            assert cache.get("Golf GTI") is None
+
+        assert cache.stats.expirations == 1
+        assert len(cache) == 0
+
+    def test_clear_invalidates_everything(self):
+        """Test that clearing drops every entry."""
+        cache = MatchCache()
+        cache.put(make_result("Golf GTI"))
+
+        cache.clear()
+
+        assert cache.get("Golf GTI") is None
+        assert cache.stats.invalidations == 1
+
+    def test_invalid_size(self):
+        """Test that a cache must hold at least one entry."""
+        with pytest.raises(ValueError):
+            MatchCache(max_entries=0)
+
+    def test_invalidate_drops_selected_entries(self):
+        """Test that only the results the predicate selects are dropped."""
+        cache = MatchCache()
+        for description in ["Golf GTI", "Toyota Camry", "Golf R"]:
+            cache.put(make_result(description))
+
+        dropped = cache.invalidate(lambda key, result: key.startswith("golf"))
+
+        assert dropped == 2
+        assert cache.get("Toyota Camry") is not None
+        assert cache.get("Golf GTI") is None
+        assert cache.stats.invalidated_entries == 2
+
+    def test_refuses_results_from_before_an_invalidation(self):
+        """Test that a result computed before a clear or invalidate is not cached after it."""
+        cache = MatchCache()
+        generation = cache.generation
+        assert cache.put(make_result("Golf GTI"), generation) is True
+
+        cache.invalidate(lambda key, result: False)
+        assert cache.put(make_result("Golf R"), generation) is False
+        generation = cache.generation
+        cache.clear()
+        assert cache.put(make_result("Golf R"), generation) is False
+
+        assert cache.get("Golf R") is None
+        assert cache.stats.stale_puts == 2
+        assert cache.put(make_result("Golf R")) is True
@@ -0,0 +1,131 @@
+"""
+Tests for the MatchMetrics collector and its histograms.
+"""
+
+import pickle
+import pytest
+from match_metrics import DURATION_BUCKETS, Histogram, MatchMetrics
+
+
+class TestHistogram:
+    """Test cases for Histogram class."""
+
+    def test_observe_counts_values_into_buckets(self):
+        """Test that values land in the first bucket whose bound they do not exceed."""
+        histogram = Histogram([1, 5, 10])
+
+        for value in [0.5, 1, 3, 10, 50]:
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1, 1]
+        assert histogram.count == 5
+        assert histogram.sum == 64.5
+
+    def test_quantile_interpolates_within_bucket(self):
+        """Test quantile estimates from bucket counts."""
+        histogram = Histogram([10, 20])
+        for value in [1, 2, 3, 4, 15, 15, 15, 15]:
+            histogram.observe(value)
+
+        assert histogram.quantile(0.5) == 10
+        assert histogram.quantile(0.75) == 15
+        assert Histogram([1]).quantile(0.5) == 0.0
+
+    def test_merge_rejects_different_buckets(self):
+        """Test that only histograms with the same buckets can be merged."""
+        with pytest.raises(ValueError):
+            Histogram([1, 2]).merge(Histogram([1, 3]))
+
+
+class TestMatchMetrics:
+    """Test cases for MatchMetrics class."""
+
+    def test_records_durations_sizes_and_counters(self):
+        """Test that timed blocks, sizes and counters are recorded."""
+        metrics = MatchMetrics()
+
+        with metrics.time("scoring"):
+            pass
+        metrics.observe_size("candidates", 12)
+        metrics.increment("matches")
+        metrics.increment("matches", 2)
+
+        assert metrics.durations["scoring"].count == 1
+        assert metrics.sizes["candidates"].sum == 12
+        assert metrics.counters == {"matches": 3}
+
+    def test_time_records_failed_blocks(self):
+        """Test that a block raising an exception is still timed."""
+        metrics = MatchMetrics()
+
+        with pytest.raises(RuntimeError):
+            with metrics.time("query"):
+                raise RuntimeError("connection lost")
+
+        assert metrics.durations["query"].count == 1
+
+    def test_disabled_metrics_record_nothing(self):
+        """Test that a disabled collector ignores everything."""
+        metrics = MatchMetrics(enabled=False)
+
+        with metrics.time("scoring"):
+            pass
+        metrics.observe_size("candidates", 12)
+        metrics.increment("matches")
+
+        assert (metrics.durations, metrics.sizes, metrics.counters) == ({}, {}, {})
+
+    def test_merge_pickled_copy(self):
+        """Test merging metrics sent back from a worker process."""
+        worker = MatchMetrics()
+        worker.observe_duration("attributes", 0.001)
+        worker.increment("matches", 5)
+        metrics = MatchMetrics()
+        metrics.observe_duration("attributes", 0.002)
+
+        metrics.merge(pickle.loads(pickle.dumps(worker)))
+
+        assert metrics.durations["attributes"].count == 2
+        assert metrics.counters["matches"] == 5
+
+    def test_reset(self):
+        """Test that reset forgets everything."""
+        metrics = MatchMetrics()
+        metrics.increment("matches")
+
+        metrics.reset()
+
+        assert metrics.counters == {}
+
+    def test_prometheus_format(self):
+        """Test the Prometheus text exposition of each metric kind."""
+        metrics = MatchMetrics()
+        metrics.observe_duration("scoring", 0.0003)
+        metrics.observe_size("candidates", 7)
+        metrics.increment("cache_hits", 4)
+
+        text = metrics.prometheus()
+
+        assert "# TYPE vehicle_matcher_stage_seconds histogram" in text
+        assert 'vehicle_matcher_stage_seconds_bucket{stage="scoring",le="0.00025"} 0' in text
+        assert 'vehicle_matcher_stage_seconds_bucket{stage="scoring",le="0.0005"} 1' in text
+        assert 'vehicle_matcher_stage_seconds_bucket{stage="scoring",le="+Inf"} 1' in text
+        assert 'vehicle_matcher_stage_seconds_count{stage="scoring"} 1' in text
+        assert 'vehicle_matcher_candidates_bucket{le="10.0"} 1' in text
+        assert "vehicle_matcher_candidates_sum 7" in text
+        assert "# TYPE vehicle_matcher_cache_hits_total counter" in text
+        assert "vehicle_matcher_cache_hits_total 4" in text
+        assert text.count("_bucket{stage=\"scoring\"") == len(DURATION_BUCKETS) + 1
+
+    def test_summary_lists_every_metric(self):
+        """Test the human-readable summary."""
+        metrics = MatchMetrics()
+        metrics.observe_duration("scoring", 0.002)
+        metrics.observe_size("candidates", 7)
+        metrics.increment("matches")
+
+        summary = metrics.summary()
+
+        assert "scoring" in summary
+        assert "candidates" in summary
+        assert "matches" in summary
@@ -0,0 +1,168 @@
+"""
+Tests for the asyncio matching service and its request micro-batching.
+"""
+
+import asyncio
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from match_metrics import MatchMetrics
+from match_result import MatchResult
+from match_service import MicroBatcher, create_app, periodic_refresh
+from vehicle import Vehicle
+
+GOLF = Vehicle(id="1", make="Volkswagen", model="Golf", badge="GTI",
+               transmission_type="Automatic", fuel_type="Petrol",
+               drive_type="Front Wheel Drive", listing_count=3)
+
+
+class FakeMatcher:
+    """Records the batches it is asked to match."""
+
+    def __init__(self):
+        self.batches = []
+
+    def match_descriptions(self, descriptions):
+        self.batches.append(list(descriptions))
+        return [
+            MatchResult(description=description,
+                        vehicle=GOLF if "golf" in description.lower() else None,
+                        confidence=2 if "golf" in description.lower() else 0)
+            for description in descriptions
+        ]
+
+
+class TestMicroBatcher:
+    """Test cases for MicroBatcher class."""
+
+    def test_concurrent_requests_share_a_batch(self):
+        """Test that requests arriving together are matched in one call."""
+        matcher = FakeMatcher()
+
+        async def run():
+            batcher = MicroBatcher(matcher.match_descriptions, max_delay=0.05)
+            batcher.start()
+            results = await asyncio.gather(*(batcher.submit(d) for d in ["Golf GTI", "Ranger", "golf"]))
+            await batcher.close()
+            return results
+
+        results = asyncio.run(run())
+
+        assert matcher.batches == [["Golf GTI", "Ranger", "golf"]]
+        assert [result.description for result in results] == ["Golf GTI", "Ranger", "golf"]
+        assert [result.vehicle for result in results] == [GOLF, None, GOLF]
+
+    def test_batches_capped_at_max_size(self):
+        """Test that a full batch is dispatched without waiting for the delay."""
+        matcher = FakeMatcher()
+
+        async def run():
+            batcher = MicroBatcher(matcher.match_descriptions, max_batch_size=2, max_delay=10)
+            batcher.start()
+            await asyncio.wait_for(
+                asyncio.gather(*(batcher.submit(str(i)) for i in range(4))), timeout=5
+            )
+            await batcher.close()
+
+        asyncio.run(run())
+
+        assert matcher.batches == [["0", "1"], ["2", "3"]]
+
+    def test_failed_batch_fails_every_request(self):
+        """Test that a matcher error is raised to every request in the batch."""
+        def fail(descriptions):
+            raise RuntimeError("database unavailable")
+
+        async def run():
+            batcher = MicroBatcher(fail, max_delay=0.01)
+            batcher.start()
+            results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"),
+                                           return_exceptions=True)
+            await batcher.close()
+            return results
+
+        results = asyncio.run(run())
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    def test_submit_requires_start(self):
+        """Test that submitting before start is rejected."""
+        batcher = MicroBatcher(FakeMatcher().match_descriptions)
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(batcher.submit("Golf"))
+
+
+class TestMatchService:
+    """Test cases for the HTTP endpoints."""
+
+    def request(self, method, path, **kwargs):
+        """Send one request to a fresh app and return (status, JSON body)."""
+        async def run():
+            app = create_app(FakeMatcher().match_descriptions, max_delay=0.001)
+            async with TestClient(TestServer(app)) as client:
+                response = await client.request(method, path, **kwargs)
+                body = await response.json() if response.status == 200 else None
+                return response.status, body
+
+        return asyncio.run(run())
+
+    def test_match(self):
+        """Test that a single description is matched."""
+        status, body = self.request("POST", "/match", json={"description": "Golf GTI"})
+
+        assert status == 200
+        assert body["vehicle_id"] == "1"
+        assert body["confidence"] == 2
+        assert body["vehicle"]["model"] == "Golf"
+
+    def test_match_batch(self):
+        """Test that a list of descriptions is matched in order."""
+        status, body = self.request("POST", "/match/batch",
+                                    json={"descriptions": ["Ranger", "Golf GTI"]})
+
+        assert status == 200
+        assert [result["vehicle_id"] for result in body["results"]] == [None, "1"]
+
+    def test_metrics(self):
+        """Test that batch sizes are exposed in Prometheus format."""
+        async def run():
+            metrics = MatchMetrics()
+            app = create_app(FakeMatcher().match_descriptions, max_delay=0.001, metrics=metrics)
+            async with TestClient(TestServer(app)) as client:
+                await client.post("/match", json={"description": "Golf GTI"})
+                response = await client.get("/metrics")
+                return response.status, await response.text()
+
+        status, text = asyncio.run(run())
+
+        assert status == 200
+        assert "vehicle_matcher_batch_size_count 1" in text
+
+    def test_health(self):
+        """Test the health endpoint."""
+        assert self.request("GET", "/health") == (200, {"status": "ok"})
+
+    @pytest.mark.parametrize("path, payload", [
+        ("/match", {"description": 42}),
+        ("/match", ["Golf"]),
+        ("/match/batch", {"descriptions": "Golf"}),
+    ])
+    def test_invalid_requests(self, path, payload):
+        """Test that malformed requests are rejected."""
+        status, _ = self.request("POST", path, json=payload)
+
+        assert status == 400
+
+    def test_periodic_refresh(self):
+        """Test that the matcher is refreshed in the background while the app runs."""
+        refreshes = []
+
+        async def run():
+            app = create_app(FakeMatcher().match_descriptions)
+            app.cleanup_ctx.append(periodic_refresh(lambda: refreshes.append(1) or True, 0.01))
+            async with TestClient(TestServer(app)):
+                await asyncio.sleep(0.1)
+
+        asyncio.run(run())
+
+        assert len(refreshes) >= 2
@@ -0,0 +1,235 @@
+"""
+Tests for matcher snapshots and starting a VehicleMatcher from one.
+"""
+
+import pytest
+import matcher_snapshot
+import vehicle_matcher
+from catalogue_changes import catalogue_version
+from unittest.mock import MagicMock
+from db_client import DatabaseClient
+from match_metrics import MatchMetrics
+from matcher_snapshot import (
+    SnapshotError, aliases_version, load_snapshot, prepare_snapshot, read_snapshot_header, write_snapshot,
+)
+from vehicle import Vehicle
+from vehicle_attributes import VehicleAttributes
+from vehicle_catalogue import VehicleCatalogue
+from vehicle_matcher import VehicleMatcher
+
+NEW_VEHICLE_ID = "test-snapshot-1"
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    yield db_client
+    db_client.close()
+
+
+@pytest.fixture(scope="module")
+def vehicle_attributes(db_client):
+    return VehicleAttributes(db_client, "vehicle_aliases.yaml")
+
+
+@pytest.fixture(scope="module")
+def catalogue(db_client):
+    return VehicleCatalogue.load(db_client)
+
+
+@pytest.fixture
+def snapshot_file(tmp_path, vehicle_attributes, catalogue):
+    path = str(tmp_path / "matcher.snapshot")
+    write_snapshot(path, vehicle_attributes, catalogue, "v1", "aliases-v1")
+    return path
+
+
+class TestSnapshotFile:
+    """Test cases for writing and loading snapshot files."""
+
+    def test_header_round_trip(self, snapshot_file, catalogue):
+        """Test that the versions written can be read back without loading the rest."""
+        header = read_snapshot_header(snapshot_file)
+
+        assert header.catalogue_version == "v1"
+        assert header.aliases_version == "aliases-v1"
+        assert header.vehicles == len(catalogue.ids)
+
+    def test_loaded_catalogue_matches_original(self, db_client, snapshot_file, catalogue):
+        """Test that the loaded catalogue holds the same vehicles and finds the same positions."""
+        loaded = load_snapshot(snapshot_file, db_client).catalogue
+
+        assert isinstance(loaded.listing_counts, memoryview)
+        assert [loaded.vehicle(i) for i in range(len(loaded.ids))] == \
+               [catalogue.vehicle(i) for i in range(len(catalogue.ids))]
+        assert loaded.descriptions == catalogue.descriptions
+        for matched in ({'make': ['Toyota']}, {'make': ['Toyota'], 'model': ['Camry', '86']},
+                        {'transmission_type': ['Manual'], 'fuel_type': ['Petrol']}):
+            assert loaded.find_positions(matched) == catalogue.find_positions(matched)
+
+    def test_loaded_vocabulary_matches_original(self, db_client, snapshot_file, vehicle_attributes):
+        """Test that the loaded vocabulary matches descriptions like the original."""
+        loaded = load_snapshot(snapshot_file, db_client).vehicle_attributes
+
+        assert loaded.db_client is db_client
+        description = "VW Golf 2.0 TSI automatic petrol"
+        assert loaded.find_matching_attributes(description) == \
+               vehicle_attributes.find_matching_attributes(description)
+        assert loaded.term_matcher.terms == vehicle_attributes.term_matcher.terms
+        loaded.reload(db_values=False)
+        assert loaded.term_matcher.terms == vehicle_attributes.term_matcher.terms
+
+    def test_rejects_malformed_vocabulary(self, db_client, tmp_path, vehicle_attributes, monkeypatch):
+        """Test that a vocabulary section not shaped like VehicleAttributes data is refused."""
+        path = str(tmp_path / "matcher.snapshot")
+        monkeypatch.setattr(VehicleAttributes, "to_vocabulary", lambda self: {'makes': None})
+        write_snapshot(path, vehicle_attributes, None, "v1", None)
+
+        with pytest.raises(SnapshotError, match="corrupt vocabulary"):
+            load_snapshot(path, db_client)
+
+    def test_loaded_catalogue_accepts_changes(self, db_client, snapshot_file, catalogue):
+        """Test that a memory-mapped catalogue can still be updated with with_changes."""
+        loaded = load_snapshot(snapshot_file, db_client).catalogue
+        vehicle = Vehicle("snapshot-new", "Toyota", "Camry", "GX", "Automatic", "Petrol",
+                          "Rear Wheel Drive", 7)
+
+        updated = loaded.with_changes([vehicle], [catalogue.ids[0]])
+
+        assert len(updated) == len(catalogue)
+        assert updated.vehicle(updated.find_positions({'drive_type': ['Rear Wheel Drive'],
+                                                       'model': ['Camry']})[-1]) == vehicle
+        assert 0 not in updated.find_positions({'make': [catalogue.vehicle(0).make]})
+
+    def test_vocabulary_only_snapshot(self, db_client, tmp_path, vehicle_attributes):
+        """Test that a snapshot can be written without a catalogue."""
+        path = str(tmp_path / "vocabulary.snapshot")
+        write_snapshot(path, vehicle_attributes, None, "v1", None)
+
+        snapshot = load_snapshot(path, db_client)
+
+        assert snapshot.header.vehicles is None
+        assert snapshot.catalogue is None
+
+    def test_rejects_other_files(self, db_client, tmp_path):
+        """Test that missing and foreign files raise SnapshotError."""
+        with pytest.raises(SnapshotError):
+            load_snapshot(str(tmp_path / "missing.snapshot"), db_client)
+        path = tmp_path / "other.snapshot"
+        path.write_bytes(b"not a snapshot at all")
+        with pytest.raises(SnapshotError, match="not a matcher snapshot"):
+            read_snapshot_header(str(path))
+
+
+class TestPrepareSnapshot:
+    """Test cases for prepare_snapshot function."""
+
+    def test_builds_missing_snapshot(self, db_client, tmp_path):
+        """Test that a missing snapshot is built and stamped with the version returned."""
+        path = str(tmp_path / "matcher.snapshot")
+
+        version = prepare_snapshot(path, db_client, "vehicle_aliases.yaml")
+
+        header = read_snapshot_header(path)
+        assert header.catalogue_version == version == catalogue_version(db_client)
+        assert header.vehicles is not None
+
+    def test_leaves_current_snapshot_alone(self, db_client, tmp_path, monkeypatch):
+        """Test that a current snapshot is checked on its header, without building anything."""
+        path = str(tmp_path / "matcher.snapshot")
+        prepare_snapshot(path, db_client, "vehicle_aliases.yaml", with_catalogue=False)
+        created_at = read_snapshot_header(path).created_at
+        monkeypatch.setattr(matcher_snapshot, "VehicleAttributes", MagicMock(side_effect=AssertionError))
+
+        prepare_snapshot(path, db_client, "vehicle_aliases.yaml", with_catalogue=False)
+
+        assert read_snapshot_header(path).created_at == created_at
+        with pytest.raises(AssertionError):
+            prepare_snapshot(path, db_client, "vehicle_aliases.yaml", with_catalogue=True)
+
+
+class TestVehicleMatcherSnapshot:
+    """Test cases for VehicleMatcher's snapshot_file option."""
+
+    @pytest.fixture
+    def new_vehicle(self, db_client):
+        yield NEW_VEHICLE_ID
+        db_client.query("DELETE FROM vehicle WHERE id = %s", (NEW_VEHICLE_ID,))
+
+    def test_builds_then_loads_snapshot(self, db_client, tmp_path):
+        """Test that a missing snapshot is written and then started from."""
+        path = str(tmp_path / "matcher.snapshot")
+        built = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                               snapshot_file=path)
+        header = read_snapshot_header(path)
+        assert header.catalogue_version == catalogue_version(db_client)
+        assert header.aliases_version == aliases_version("vehicle_aliases.yaml")
+
+        loaded = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                snapshot_file=path)
+
+        assert isinstance(loaded.catalogue.listing_counts, memoryview)
+        for description in ["Toyota Camry Hybrid", "VW Golf R 4Motion", "Unknown Car"]:
+            assert loaded.find_best_matching_vehicle(description) == \
+                   built.find_best_matching_vehicle(description)
+
+    def test_rebuilds_stale_snapshot(self, db_client, tmp_path, new_vehicle):
+        """Test that a snapshot of an older catalogue is ignored and replaced."""
+        path = str(tmp_path / "matcher.snapshot")
+        VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True, snapshot_file=path)
+        old_version = read_snapshot_header(path).catalogue_version
+        db_client.query(
+            "INSERT INTO vehicle (id, make, model, badge, transmission_type, fuel_type, drive_type) "
+            "VALUES (%s, 'Toyota', 'Snapmobile', 'GX', 'Automatic', 'Petrol', 'Rear Wheel Drive')",
+            (NEW_VEHICLE_ID,),
+        )
+
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 snapshot_file=path)
+
+        assert read_snapshot_header(path).catalogue_version != old_version
+        vehicle, _ = matcher.find_best_matching_vehicle("Toyota Snapmobile")
+        assert vehicle.id == NEW_VEHICLE_ID
+
+    def test_rebuilds_snapshot_for_other_aliases(self, db_client, tmp_path):
+        """Test that a snapshot built with different aliases is not used."""
+        path = str(tmp_path / "matcher.snapshot")
+        VehicleMatcher(db_client, None, use_catalogue=True, snapshot_file=path)
+
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 snapshot_file=path)
+
+        assert read_snapshot_header(path).aliases_version == aliases_version("vehicle_aliases.yaml")
+        assert matcher.vehicle_attributes.find_matching_attributes("VW").get('make') == ['Volkswagen']
+
+    def test_reads_catalogue_version_once(self, db_client, tmp_path, monkeypatch):
+        """Test that a rebuild checks and stamps the snapshot with one version query."""
+        versions = []
+
+        def counting_version(client):
+            versions.append(catalogue_version(client))
+            return versions[-1]
+
+        monkeypatch.setattr(vehicle_matcher, "catalogue_version", counting_version)
+        path = str(tmp_path / "matcher.snapshot")
+        write_snapshot(path, VehicleAttributes(db_client, "vehicle_aliases.yaml"),
+                       VehicleCatalogue.load(db_client), "stale", aliases_version("vehicle_aliases.yaml"))
+
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 snapshot_file=path)
+
+        assert len(versions) == 1
+        assert read_snapshot_header(path).catalogue_version == matcher.snapshot_version == versions[0]
+
+    def test_given_version_skips_database_check(self, db_client, tmp_path, monkeypatch):
+        """Test that a snapshot is checked against a version passed in, as workers do."""
+        path = str(tmp_path / "matcher.snapshot")
+        version = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 snapshot_file=path).snapshot_version
+        monkeypatch.setattr(vehicle_matcher, "catalogue_version", MagicMock(side_effect=AssertionError))
+
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 snapshot_file=path, snapshot_version=version,
+                                 metrics=MatchMetrics())
+
+        assert matcher.metrics.counters["snapshot_loads"] == 1
@@ -0,0 +1,41 @@
+"""
+Integration tests for the ParallelVehicleMatcher class.
+"""
+
+import pytest
+from db_client import DatabaseClient
+from match_metrics import MatchMetrics
+from parallel_matcher import ParallelVehicleMatcher
+from vehicle_matcher import VehicleMatcher
+
+
+def test_parallel_results_in_input_order():
+    with open("inputs.txt", encoding="utf-8") as file:
+        descriptions = [line.strip() for line in file if line.strip()]
+    matcher = VehicleMatcher(DatabaseClient(), yaml_file="vehicle_aliases.yaml", use_catalogue=True)
+
+    with ParallelVehicleMatcher(2, yaml_file="vehicle_aliases.yaml", use_catalogue=True,
+                                chunk_size=3) as parallel_matcher:
+        results = list(parallel_matcher.find_best_matching_vehicles(iter(descriptions)))
+
+    assert results == matcher.find_best_matching_vehicles(descriptions)
+
+def test_parallel_empty_input():
+    with ParallelVehicleMatcher(1) as parallel_matcher:
+        assert list(parallel_matcher.find_best_matching_vehicles([])) == []
+
+@pytest.mark.parametrize("workers, chunk_size", [(0, 10), (2, 0)])
+def test_parallel_rejects_invalid_settings(workers: int, chunk_size: int):
+    with pytest.raises(ValueError):
+        ParallelVehicleMatcher(workers, chunk_size=chunk_size)
+
+def test_parallel_merges_worker_metrics():
+    metrics = MatchMetrics()
+
+    with ParallelVehicleMatcher(2, yaml_file="vehicle_aliases.yaml", chunk_size=2,
+                                metrics=metrics) as parallel_matcher:
+        results = list(parallel_matcher.match_descriptions(["Golf GTI"] * 5))
+
+    assert len(results) == 5
+    assert metrics.counters["matches"] == 5
+    assert metrics.durations["attributes"].count == 5
@@ -0,0 +1,112 @@
+"""
+Integration tests for writing match results back with ResultStore.
+"""
+
+import pytest
+from db_client import DatabaseClient
+from match_result import MatchResult
+from result_store import ResultStore, migrate
+from vehicle import Vehicle
+
+RUN_ID = "test-result-store"
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    migrate(db_client)
+    yield db_client
+    db_client.close()
+
+
+@pytest.fixture(autouse=True)
+def clean_run(db_client):
+    yield
+    db_client.query("DELETE FROM match_result_staging WHERE run_id = %s", (RUN_ID,))
+    db_client.query("DELETE FROM match_result WHERE run_id = %s", (RUN_ID,))
+
+
+def make_result(description: str, vehicle_id: str = None, confidence: int = 6) -> MatchResult:
+    vehicle = None
+    if vehicle_id is not None:
+        vehicle = Vehicle(id=vehicle_id, make="Toyota", model="Camry", badge="Ascent",
+                          transmission_type="Automatic", fuel_type="Petrol",
+                          drive_type="Front Wheel Drive", listing_count=0)
+    return MatchResult(description=description, vehicle=vehicle, confidence=confidence,
+                       candidate_count=2 if vehicle else 0,
+                       matched_attributes={'model': ["Camry"]} if vehicle else {})
+
+
+def stored_results(db_client):
+    return db_client.query(
+        "SELECT input_key, vehicle_id, confidence, matched_attributes FROM match_result "
+        "WHERE run_id = %s ORDER BY input_key",
+        (RUN_ID,),
+    )
+
+
+class TestResultStore:
+    """Test cases for ResultStore class."""
+
+    def test_rejects_unknown_target(self, db_client):
+        """Test that an unknown target is rejected."""
+        with pytest.raises(ValueError, match="Unknown write-back target"):
+            ResultStore(db_client, RUN_ID, target="stdout")
+
+    def test_copies_full_batches(self, db_client):
+        """Test that results are staged every `batch_size` writes, and the rest on flush."""
+        store = ResultStore(db_client, RUN_ID, batch_size=2)
+        for key in ["a", "b", "c"]:
+            store.write(key, make_result(f"Camry, \"{key}\"\t1", "6450252131336192"))
+
+        assert store.resume_offset() == 2
+        store.flush()
+        assert store.resume_offset() == 3
+        assert store.staged == 3
+
+    def test_apply_merges_into_results(self, db_client):
+        """Test that applying upserts the latest result per key and clears the stage."""
+        store = ResultStore(db_client, RUN_ID)
+        store.write("a", make_result("Toyota Camry", "6450252131336192"))
+        store.write("b", make_result("Ford Ranger"))
+        store.write("a", make_result("Toyota Camry Ascent", "6244675534979072", confidence=8))
+
+        assert store.apply() == 2
+
+        assert [dict(row) for row in stored_results(db_client)] == [
+            {'input_key': "a", 'vehicle_id': "6244675534979072", 'confidence': 8,
+             'matched_attributes': {'model': ["Camry"]}},
+            {'input_key': "b", 'vehicle_id': None, 'confidence': 6, 'matched_attributes': {}},
+        ]
+        assert store.resume_offset() == 0
+
+    def test_resumes_after_crash(self, db_client):
+        """Test that a new store for the same run sees what was staged and applies it all."""
+        crashed = ResultStore(db_client, RUN_ID, batch_size=1)
+        crashed.write("a", make_result("Toyota Camry", "6450252131336192"))
+
+        resumed = ResultStore(db_client, RUN_ID)
+        assert resumed.resume_offset() == 1
+        resumed.write("b", make_result("Ford Ranger"))
+
+        assert resumed.apply() == 2
+        assert [row['input_key'] for row in stored_results(db_client)] == ["a", "b"]
+
+    def test_apply_updates_listings(self, db_client):
+        """Test that matched results update their listing's vehicle, unmatched ones do not."""
+        listings = db_client.query("SELECT id, vehicle_id FROM listing ORDER BY id LIMIT 2")
+        new_vehicle_id = db_client.query(
+            "SELECT id FROM vehicle WHERE id <> %s ORDER BY id LIMIT 1", (listings[0]['vehicle_id'],)
+        )[0]['id']
+        store = ResultStore(db_client, RUN_ID, target="listing")
+        store.write(listings[0]['id'], make_result("Toyota Camry", new_vehicle_id))
+        store.write(listings[1]['id'], make_result("Ford Ranger"))
+        try:
+            assert store.apply() == 1
+
+            rows = db_client.query("SELECT id, vehicle_id FROM listing WHERE id IN (%s, %s) ORDER BY id",
+                                   (listings[0]['id'], listings[1]['id']))
+            assert [row['vehicle_id'] for row in rows] == [new_vehicle_id, listings[1]['vehicle_id']]
+        finally:
+            db_client.query("UPDATE listing SET vehicle_id = %s WHERE id = %s",
+                            (listings[0]['vehicle_id'], listings[0]['id']))
@@ -0,0 +1,131 @@
+"""
+Tests for the streaming input helpers and result writers.
+"""
+
+import csv
+import io
+import json
+import pytest
+from match_result import MatchResult
+from result_writers import (
+    ResultWriter, chunked, create_result_writer, read_descriptions, read_keyed_descriptions,
+)
+from vehicle import Vehicle
+
+
+@pytest.fixture
+def results():
+    """Fixture providing one matched and one unmatched result."""
+    vehicle = Vehicle(id="4951649860714496", make="Volkswagen", model="Amarok",
+                      badge="Ultimate", transmission_type="Automatic", fuel_type="Diesel",
+                      drive_type="Four Wheel Drive", listing_count=12)
+    return [
+        MatchResult(description="VW Amarok Ultimate", vehicle=vehicle, confidence=6,
+                    candidate_count=3, elapsed_ms=0.12345),
+        MatchResult(description="Ford Ranger", vehicle=None, confidence=0),
+    ]
+
+
+class TestStreamingInput:
+    """Test cases for lazy description reading and chunking."""
+
+    def test_read_descriptions_skips_blank_lines(self):
+        """Test that lines are stripped and blank lines dropped."""
+        stream = io.StringIO("  Golf GTI \n\n   \nRAV4 GX 4x4\n")
+
+        assert list(read_descriptions(stream)) == ["Golf GTI", "RAV4 GX 4x4"]
+
+    def test_read_descriptions_is_lazy(self):
+        """Test that lines are only read as descriptions are consumed."""
+        stream = io.StringIO("Golf GTI\nRAV4 GX 4x4\n")
+        descriptions = read_descriptions(stream)
+
+        assert next(descriptions) == "Golf GTI"
+        assert stream.readline() == "RAV4 GX 4x4\n"
+
+    def test_read_keyed_descriptions(self):
+        """Test that tab-separated keys are used, and positions otherwise."""
+        stream = io.StringIO("L-1\tGolf GTI\n\nRAV4 GX 4x4\n\tCamry SL\n")
+
+        assert list(read_keyed_descriptions(stream)) == [
+            ("L-1", "Golf GTI"), ("2", "RAV4 GX 4x4"), ("3", "Camry SL"),
+        ]
+
+    def test_read_keyed_descriptions_without_positional_keys(self):
+        """Test that lines without a key are keyed by None when positions are not wanted."""
+        stream = io.StringIO("L-1\tGolf GTI\nRAV4 GX 4x4\n")
+
+        assert list(read_keyed_descriptions(stream, positional_keys=False)) == [
+            ("L-1", "Golf GTI"), (None, "RAV4 GX 4x4"),
+        ]
+
+    def test_chunked_splits_iterable(self):
+        """Test that chunks hold at most the requested number of items."""
+        assert list(chunked(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+        assert list(chunked([], 2)) == []
+
+    def test_chunked_rejects_invalid_size(self):
+        """Test that a chunk size below 1 is rejected."""
+        with pytest.raises(ValueError):
+            list(chunked([1], 0))
+
+
+class TestResultWriters:
+    """Test cases for the result writers."""
+
+    def test_jsonl_writer(self, results):
+        """Test that every result becomes one JSON object per line."""
+        stream = io.StringIO()
+        writer = create_result_writer("jsonl", stream)
+
+        for result in results:
+            writer.write(result)
+        writer.close()
+
+        records = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert records == [
+            {"input": "VW Amarok Ultimate", "vehicle_id": "4951649860714496",
+             "confidence": 6, "candidate_count": 3, "elapsed_ms": 0.123},
+            {"input": "Ford Ranger", "vehicle_id": None, "confidence": 0,
+             "candidate_count": 0, "elapsed_ms": 0.0},
+        ]
+
+    def test_csv_writer(self, results):
+        """Test that results are written as CSV rows under a header."""
+        stream = io.StringIO()
+        writer = create_result_writer("csv", stream)
+
+        for result in results:
+            writer.write(result)
+        writer.close()
+
+        rows = list(csv.DictReader(io.StringIO(stream.getvalue())))
+        assert rows[0]["vehicle_id"] == "4951649860714496"
+        assert rows[0]["confidence"] == "6"
+        assert rows[1]["vehicle_id"] == ""
+
+    def test_text_writer(self, results):
+        """Test that the text writer numbers results and reports the total."""
+        stream = io.StringIO()
+        writer = create_result_writer("text", stream)
+
+        for result in results:
+            writer.write(result)
+        writer.close()
+
+        output = stream.getvalue()
+        assert "Input 1: 'VW Amarok Ultimate'" in output
+        assert "Vehicle ID: 4951649860714496" in output
+        assert "Input 2: 'Ford Ranger'" in output
+        assert "No matching vehicles found" in output
+        assert output.endswith("Processed 2 descriptions\n")
+
+    def test_unknown_format(self):
+        """Test that an unsupported format is rejected."""
+        with pytest.raises(ValueError, match="xml"):
+            create_result_writer("xml", io.StringIO())
+
+    def test_base_writer_is_abstract(self):
+        """Test that a writer without a format cannot be created."""
+        with pytest.raises(TypeError):
+            ResultWriter(io.StringIO())
@@ -0,0 +1,136 @@
+"""
+Tests for make-sharded matching: shard planning, routing and merging.
+"""
+
+from unittest.mock import MagicMock
+import pytest
+from db_client import DatabaseClient
+from match_result import MatchResult
+from match_service import result_json
+from shard_router import MakeRouter, ShardedVehicleMatcher, plan_shards, result_from_json
+from vehicle import Vehicle
+from vehicle_matcher import VehicleMatcher
+
+SHARD_MAKES = [["Toyota"], ["Volkswagen"]]
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    yield db_client
+    db_client.close()
+
+
+@pytest.fixture(scope="module")
+def router(db_client):
+    return MakeRouter(db_client, SHARD_MAKES, "vehicle_aliases.yaml")
+
+
+def make_vehicle(vehicle_id: str, make: str, model: str, badge: str, listing_count: int = 0) -> Vehicle:
+    return Vehicle(id=vehicle_id, make=make, model=model, badge=badge, transmission_type="Automatic",
+                   fuel_type="Petrol", drive_type="Front Wheel Drive", listing_count=listing_count)
+
+
+def read_inputs():
+    with open("inputs.txt", encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip()]
+
+
+class TestPlanShards:
+    """Test cases for plan_shards function."""
+
+    def test_balances_vehicle_counts(self):
+        """Test that makes are spread largest first over the smallest shard."""
+        db_client = MagicMock()
+        db_client.query.return_value = [
+            {'make': "Toyota", 'vehicle_count': 50},
+            {'make': "Ford", 'vehicle_count': 30},
+            {'make': "Mazda", 'vehicle_count': 25},
+            {'make': "Kia", 'vehicle_count': 10},
+        ]
+
+        assert plan_shards(db_client, 2) == [["Kia", "Toyota"], ["Ford", "Mazda"]]
+        assert plan_shards(db_client, 5)[4] == []
+
+    def test_rejects_no_shards(self):
+        """Test that at least one shard is required."""
+        with pytest.raises(ValueError):
+            plan_shards(MagicMock(), 0)
+
+
+class TestMakeRouter:
+    """Test cases for MakeRouter class."""
+
+    @pytest.mark.parametrize("description, shards", [
+        ("Toyota Camry Hybrid", [0]),
+        ("VW Amarok Ultimate", [1]),
+        ("Golf GTI", [1]),
+        ("VW Golf R with engine swap from Toyota 86 GT", [0, 1]),
+        ("Automatic Diesel", [0, 1]),
+    ])
+    def test_routes_by_make_then_model(self, router, description, shards):
+        """Test that makes and their aliases pick shards, then models, then every shard."""
+        assert router.route(description) == shards
+
+
+class TestShardedVehicleMatcher:
+    """Test cases for ShardedVehicleMatcher class."""
+
+    def test_rejects_mismatched_shards(self, router):
+        """Test that the router and the shards must agree on the number of shards."""
+        with pytest.raises(ValueError):
+            ShardedVehicleMatcher(router, [lambda descriptions: []])
+
+    def test_fans_out_and_merges(self, router):
+        """Test that unrouted descriptions go to every shard and the best result wins."""
+        camry = make_vehicle("1", "Toyota", "Camry", "Ascent", listing_count=2)
+        golf = make_vehicle("2", "Volkswagen", "Golf", "GTI", listing_count=5)
+        batches = [[], []]
+
+        def shard(index, vehicle, confidence):
+            def match(descriptions):
+                batches[index].append(descriptions)
+                return [MatchResult(description, vehicle, confidence, candidate_count=3)
+                        for description in descriptions]
+            return match
+
+        with ShardedVehicleMatcher(router, [shard(0, camry, 2), shard(1, golf, 2)]) as matcher:
+            results = matcher.match_descriptions(["Camry", "Golf GTI", "GTI Automatic"])
+
+        assert batches == [[["Camry", "GTI Automatic"]], [["Golf GTI", "GTI Automatic"]]]
+        assert [result.vehicle for result in results] == [camry, golf, golf]
+        assert [result.candidate_count for result in results] == [3, 3, 6]
+
+    @pytest.mark.parametrize("use_catalogue", [True, False])
+    def test_matches_like_one_matcher(self, db_client, use_catalogue):
+        """Test that shards find the same matches as a matcher holding every make."""
+        # Descriptions naming makes held by different shards are scored per shard
+        descriptions = [description for description in read_inputs() if "Toyota" not in description
+                        or not any(alias in description for alias in ("VW", "Volkswagen"))]
+        descriptions += ["Golf GTI", "Automatic Diesel", "Ford Ranger"]
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=use_catalogue)
+
+        with ShardedVehicleMatcher.local(db_client, SHARD_MAKES, "vehicle_aliases.yaml",
+                                         use_catalogue=use_catalogue) as sharded:
+            results = sharded.find_best_matching_vehicles(descriptions)
+
+        assert results == matcher.find_best_matching_vehicles(descriptions)
+
+
+def test_shard_matcher_keeps_to_its_makes(db_client):
+    """Test that a shard's vocabulary and queries cover only its makes."""
+    matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", makes=["Toyota"], token_fallback=True)
+
+    assert matcher.find_best_matching_vehicle("VW Golf GTI") == (None, 0)
+    vehicle, _ = matcher.find_best_matching_vehicle("Automatic Diesel")
+    assert vehicle.make == "Toyota"
+    assert all(match.vehicle.make == "Toyota" for match in matcher.find_top_matches("Automatic", k=10))
+
+
+def test_result_from_json_inverts_result_json():
+    """Test that results returned by a remote shard are read back unchanged."""
+    result = MatchResult("Golf GTI", make_vehicle("2", "Volkswagen", "Golf", "GTI", listing_count=5),
+                         confidence=2, candidate_count=4, matched_attributes={'model': ["Golf"]},
+                         elapsed_ms=1.5)
+
+    assert result_from_json(result_json(result)) == result
@@ -0,0 +1,68 @@
+"""
+Tests for the TermMatcher Aho-Corasick automaton.
+"""
+
+import pytest
+from term_matcher import TermMatcher
+
+
+class TestTermMatcher:
+    """Test cases for TermMatcher class."""
+
+    @pytest.fixture
+    def term_matcher(self):
+        """Fixture providing a TermMatcher over a small vocabulary."""
+        return TermMatcher([
+            ('make', 'Volkswagen', 'Volkswagen'),
+            ('make', 'Volkswagen', 'VW'),
+            ('fuel_type', 'Petrol', 'Petrol'),
+            ('fuel_type', 'Hybrid-Petrol', 'Hybrid-Petrol'),
+            ('transmission_type', 'Automatic', 'Automatic'),
+            ('transmission_type', 'Automatic', 'Auto'),
+            ('transmission_type', 'Automatic', 'AT'),
+        ])
+
+    def test_find_all_reports_spans(self, term_matcher):
+        """Test that matches carry their attribute type, canonical name and span."""
+        matches = term_matcher.find_all("VW Golf Petrol")
+
+        assert [(m.attribute_type, m.name, m.term, m.start, m.end) for m in matches] == [
+            ('make', 'Volkswagen', 'VW', 0, 2),
+            ('fuel_type', 'Petrol', 'Petrol', 8, 14),
+        ]
+
+    def test_find_all_is_case_insensitive(self, term_matcher):
+        """Test that terms match regardless of case."""
+        matches = term_matcher.find_all("volkSWAGEN")
+
+        assert [m.name for m in matches] == ['Volkswagen']
+
+    def test_find_all_reports_overlapping_terms(self, term_matcher):
+        """Test that terms contained in other terms are all reported."""
+        matches = term_matcher.find_all("Hybrid-Petrol Automatic")
+
+        assert sorted(m.term for m in matches) == \
+            ['AT', 'Auto', 'Automatic', 'Hybrid-Petrol', 'Petrol']
+
+    def test_find_all_reports_repeated_occurrences(self, term_matcher):
+        """Test that a term found twice is reported twice."""
+        matches = term_matcher.find_all("vw and vw")
+
+        assert [(m.start, m.end) for m in matches] == [(0, 2), (7, 9)]
+
+    def test_find_all_follows_failure_links(self):
+        """Test that a partial match falls back to the longest matching suffix."""
+        term_matcher = TermMatcher([('model', 'ABCD', 'abcd'), ('model', 'BCE', 'bce')])
+
+        assert [m.name for m in term_matcher.find_all("abce")] == ['BCE']
+
+    def test_find_all_no_matches(self, term_matcher):
+        """Test behaviour when nothing matches."""
+        assert term_matcher.find_all("") == []
+        assert term_matcher.find_all("Ford Ranger") == []
+
+    def test_empty_terms_are_ignored(self):
+        """Test that an empty term never matches."""
+        term_matcher = TermMatcher([('model', '', '')])
+
+        assert term_matcher.find_all("anything") == []
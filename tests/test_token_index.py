@@ -0,0 +1,163 @@
+"""
+Tests for the TokenIndex and VehicleMatcher's token fallback.
+"""
+
+import pytest
+from db_client import DatabaseClient
+from token_index import TokenIndex, tokenize
+from vehicle import Vehicle
+from vehicle_catalogue import VehicleCatalogue
+from vehicle_matcher import TOKEN_MATCH_CONFIDENCE, VehicleMatcher
+
+NEW_VEHICLE_ID = "test-token-index-1"
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    yield db_client
+    db_client.close()
+
+
+def make_vehicle(id: str, model: str, badge: str) -> Vehicle:
+    return Vehicle(id=id, make="Volkswagen", model=model, badge=badge,
+                   transmission_type="Automatic", fuel_type="Petrol",
+                   drive_type="Front Wheel Drive", listing_count=0)
+
+
+class TestTokenize:
+    """Test cases for tokenize."""
+
+    def test_splits_engine_codes(self):
+        """Test that engine codes yield the whole code and its letter and digit runs."""
+        assert tokenize("110TSI") == {"110tsi", "110", "tsi"}
+
+    def test_punctuated_words(self):
+        """Test that punctuated words yield the joined word and its parts."""
+        assert tokenize("R-Line") == {"rline", "r", "line"}
+        assert tokenize("R Line") <= tokenize("R-Line")
+
+    def test_ignores_punctuation_only_words(self):
+        """Test that words without letters or digits yield nothing."""
+        assert tokenize(" - / ") == set()
+
+
+class TestTokenIndex:
+    """Test cases for TokenIndex class."""
+
+    @pytest.fixture
+    def index(self):
+        """Fixture providing an index of eight vehicles keyed by number."""
+        return TokenIndex([
+            (0, ["Golf", "110TSI Comfortline"]),
+            (1, ["Golf", "110TSI Highline"]),
+            (2, ["Golf", "GTI"]),
+            (3, ["Tiguan", "132TSI R-Line Edition"]),
+            (4, ["Tiguan", "162TSI Highline"]),
+            (5, ["Tiguan", "110TSI Trendline"]),
+            (6, ["Amarok", "TDI550 Highline"]),
+            (7, ["Amarok", "TDI580 Ultimate"]),
+        ], max_document_frequency=0.5)
+
+    def test_rare_tokens_outweigh_common_ones(self, index):
+        """Test that the vehicle sharing the rarest token ranks first."""
+        assert index.search("162TSI Highline")[0] == 4
+
+    def test_requires_the_most_informative_token(self, index):
+        """Test that vehicles sharing only common tokens are not returned."""
+        assert index.search("162TSI Highline") == [4]
+
+    def test_matches_split_engine_codes(self, index):
+        """Test that an engine code written with a space still matches."""
+        assert index.search("110 TSI Comfortline") == [0]
+
+    def test_limit(self, index):
+        """Test that at most `limit` vehicles are returned, best first."""
+        assert index.search("Highline", limit=2) == [1, 4]
+
+    def test_drops_too_common_tokens(self, index):
+        """Test that tokens carried by too many vehicles are not indexed."""
+        assert "tsi" not in index.postings
+        assert index.search("TSI") == []
+
+    def test_no_shared_token(self, index):
+        """Test that a description sharing no token finds nothing."""
+        assert index.search("Unknown Car") == []
+
+    def test_from_catalogue_skips_removed_vehicles(self):
+        """Test that a catalogue is indexed by position without removed vehicles."""
+        catalogue = VehicleCatalogue([
+            make_vehicle("a", "Golf", "GTI"),
+            make_vehicle("b", "Golf", "R"),
+        ]).with_changes([make_vehicle("a", "Golf", "GTI Performance")])
+
+        index = TokenIndex.from_catalogue(catalogue)
+
+        assert len(index) == 2
+        assert index.search("GTI") == [2]
+
+
+class TestVehicleMatcherTokenFallback:
+    """Test cases for VehicleMatcher(token_fallback=True)."""
+
+    @pytest.fixture
+    def new_vehicle(self, db_client):
+        yield NEW_VEHICLE_ID
+        db_client.query("DELETE FROM vehicle WHERE id = %s", (NEW_VEHICLE_ID,))
+
+    @pytest.mark.parametrize("use_catalogue", [True, False])
+    def test_matches_description_without_attributes(self, db_client, use_catalogue):
+        """Test that a badge-only description is matched through the token index."""
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=use_catalogue,
+                                 token_fallback=True)
+
+        vehicle, confidence = matcher.find_best_matching_vehicle("162TSI Highline")
+        [result] = matcher.match_descriptions(["162TSI Highline"])
+
+        assert vehicle.model == "Tiguan"
+        assert vehicle.badge.startswith("162TSI Highline")
+        assert confidence == TOKEN_MATCH_CONFIDENCE
+        assert (result.vehicle, result.confidence) == (vehicle, confidence)
+        assert result.candidate_count == 2
+
+    def test_top_matches_fall_back_to_tokens(self, db_client):
+        """Test that top matches of a badge-only description come from the token index."""
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 token_fallback=True)
+
+        matches = matcher.find_top_matches("162TSI Highline", k=5)
+
+        assert [match.vehicle.model for match in matches] == ["Tiguan", "Tiguan"]
+        assert {match.confidence for match in matches} == {TOKEN_MATCH_CONFIDENCE}
+
+    def test_disabled_by_default(self, db_client):
+        """Test that without the fallback such descriptions stay unmatched."""
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True)
+
+        assert matcher.token_index is None
+        assert matcher.find_best_matching_vehicle("162TSI Highline") == (None, 0)
+
+    def test_unknown_tokens_stay_unmatched(self, db_client):
+        """Test that a description sharing no token is still unmatched."""
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True,
+                                 token_fallback=True)
+
+        assert matcher.find_best_matching_vehicle("Unknown Car") == (None, 0)
+
+    @pytest.mark.parametrize("use_catalogue", [True, False])
+    def test_refresh_indexes_new_vehicles(self, db_client, new_vehicle, use_catalogue):
+        """Test that vehicles added since loading are found after a refresh."""
+        matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=use_catalogue,
+                                 cache_size=10, track_changes=True, token_fallback=True)
+        assert matcher.find_best_matching_vehicle("Zephyrline 999X") == (None, 0)
+        db_client.query(
+            "INSERT INTO vehicle (id, make, model, badge, transmission_type, fuel_type, drive_type) "
+            "VALUES (%s, 'Toyota', 'Camry', 'Zephyrline', 'Automatic', 'Petrol', 'Front Wheel Drive')",
+            (NEW_VEHICLE_ID,),
+        )
+
+        assert matcher.refresh()
+
+        vehicle, confidence = matcher.find_best_matching_vehicle("Zephyrline 999X")
+        assert vehicle.id == NEW_VEHICLE_ID
+        assert confidence == TOKEN_MATCH_CONFIDENCE
@@ -0,0 +1,117 @@
+"""
+Integration tests for the trigram retrieval backend of VehicleMatcher.
+
+The backend needs the pg_trgm extension; the database tests are skipped when the
+server does not provide it. They run against a copy of the vehicles and listings in a
+throwaway schema, so the migration never touches the shared tables.
+"""
+
+import json
+import os
+import psycopg2
+import pytest
+from db_client import DatabaseClient
+from trigram_index import INDEX_NAME, is_available, migrate
+from vehicle_matcher import TOP_CANDIDATES_STATEMENTS, VehicleMatcher
+
+TRIGRAM_SCHEMA = f"test_trigram_{os.getpid()}"
+
+COPY_TABLES_SQL = f"""
+CREATE SCHEMA {TRIGRAM_SCHEMA};
+CREATE TABLE {TRIGRAM_SCHEMA}.vehicle (LIKE public.vehicle INCLUDING ALL);
+INSERT INTO {TRIGRAM_SCHEMA}.vehicle (id, make, model, badge, transmission_type, fuel_type, drive_type)
+SELECT id, make, model, badge, transmission_type, fuel_type, drive_type FROM public.vehicle;
+CREATE TABLE {TRIGRAM_SCHEMA}.listing (LIKE public.listing INCLUDING ALL);
+INSERT INTO {TRIGRAM_SCHEMA}.listing (id, vehicle_id, url, price, kms)
+SELECT id, vehicle_id, url, price, kms FROM public.listing;
+"""
+
+
+@pytest.fixture(scope="module")
+def db_client():
+    db_client = DatabaseClient()
+    yield db_client
+    db_client.close()
+
+
+@pytest.fixture(scope="module")
+def trigram_db_client(db_client):
+    """A client resolving tables in a migrated copy of the catalogue, dropped afterwards.
+    pg_trgm is installed into that schema too, unless the database already has it."""
+    db_client.query(COPY_TABLES_SQL)
+    trigram_db_client = DatabaseClient(dsn=f"{db_client.dsn} options='-c search_path={TRIGRAM_SCHEMA},public'")
+    try:
+        try:
+            migrate(trigram_db_client)
+        except psycopg2.Error as e:
+            pytest.skip(f"pg_trgm is not available: {e}")
+        yield trigram_db_client
+    finally:
+        trigram_db_client.close()
+        db_client.query(f"DROP SCHEMA {TRIGRAM_SCHEMA} CASCADE")
+
+
+class TestTrigramRetrieval:
+    """Test cases for VehicleMatcher(retrieval='trigram')."""
+
+    def test_rejects_unknown_backend(self, db_client):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError, match="Unknown retrieval backend"):
+            VehicleMatcher(db_client, retrieval="elastic")
+
+    def test_rejects_catalogue(self, db_client):
+        """Test that the trigram backend cannot be combined with the catalogue."""
+        with pytest.raises(ValueError, match="catalogue"):
+            VehicleMatcher(db_client, use_catalogue=True, retrieval="trigram")
+
+    def test_requires_trigram_index(self, db_client):
+        """Test that the backend is refused when the database lacks the trigram index."""
+        if is_available(db_client):
+            pytest.skip("the trigram index is installed")
+        with pytest.raises(ValueError, match="trigram_index.py migrate"):
+            VehicleMatcher(db_client, retrieval="trigram")
+
+    def test_fetches_only_the_top_vehicle(self, trigram_db_client):
+        """Test that one row crosses the wire, while all candidates are still counted."""
+        matcher = VehicleMatcher(trigram_db_client, "vehicle_aliases.yaml", retrieval="trigram")
+        python_matcher = VehicleMatcher(trigram_db_client, "vehicle_aliases.yaml")
+
+        [result] = matcher.match_descriptions(["Toyota Camry Hybrid"])
+        [python_result] = python_matcher.match_descriptions(["Toyota Camry Hybrid"])
+
+        assert result.vehicle.model == "Camry"
+        assert result.vehicle.fuel_type == "Hybrid-Petrol"
+        assert result.candidate_count == python_result.candidate_count
+        assert result.confidence == python_result.confidence
+
+    def test_top_k_rescored_like_python(self, trigram_db_client):
+        """Test that with every candidate fetched, the result matches the Python path."""
+        matcher = VehicleMatcher(trigram_db_client, "vehicle_aliases.yaml", retrieval="trigram",
+                                 trigram_top_k=1000)
+        python_matcher = VehicleMatcher(trigram_db_client, "vehicle_aliases.yaml")
+        descriptions = ["VW Golf R 4Motion", "Toyota 86 GTS manual", "Unknown Car"]
+
+        assert matcher.find_best_matching_vehicles(descriptions) == \
+               python_matcher.find_best_matching_vehicles(descriptions)
+        for description in descriptions:
+            assert matcher.find_best_matching_vehicle(description) == \
+                   python_matcher.find_best_matching_vehicle(description)
+
+    def test_top_vehicles_are_read_from_the_index(self, trigram_db_client):
+        """Test that the nearest vehicles are read from the trigram index in distance
+        order, rather than sorted after filtering."""
+        statement = TOP_CANDIDATES_STATEMENTS[False]
+        requests = json.dumps([{'request_id': 0, 'description': "toyota camry hybrid", 'make': ["Toyota"]}])
+        with trigram_db_client.connection() as conn:
+            with conn.cursor() as cur:
+                # The test catalogue is small enough for a sequential scan to win otherwise
+                cur.execute("SET LOCAL enable_seqscan = off")
+                cur.execute("PREPARE explain_top_candidates (jsonb, int) AS " + statement.sql)
+                try:
+                    cur.execute("EXPLAIN EXECUTE explain_top_candidates (%s, 1)", (requests,))
+                    plan = "\n".join(row[0] for row in cur.fetchall())
+                finally:
+                    cur.execute("DEALLOCATE explain_top_candidates")
+
+        assert f"Index Scan using {INDEX_NAME}" in plan
+        assert "Order By: (k.description <-> r.description)" in plan
@@ -149,3 +149,42 @@ class TestVehicleAttributes:
         assert result.get('model') == ['Camry']
         assert result.get('fuel_type') == ['Petrol']
         assert result.get('transmission_type') == ['Automatic']
+
+    def test_find_term_matches_reports_spans(self, vehicle_attributes):
+        """Test that term matches carry the character span in the description."""
+        matches = vehicle_attributes.find_term_matches("2021 Toyota Camry")
+
+        spans = {(m.attribute_type, m.name): (m.start, m.end) for m in matches}
+        assert spans[('make', 'Toyota')] == (5, 11)
+        assert spans[('model', 'Camry')] == (12, 17)
+
+    def test_find_matching_attributes_fuzzy_tolerates_typos(self, vehicle_attributes):
+        """Test that misspelled attributes are matched, with their edit cost."""
+        result, edit_cost = vehicle_attributes.find_matching_attributes_fuzzy("Toyta Camri")
+
+        assert result == {'make': ['Toyota'], 'model': ['Camry']}
+        assert edit_cost == 2
+
+    def test_find_matching_attributes_fuzzy_prefers_exact_matches(self, vehicle_attributes):
+        """Test that types found exactly are not fuzzy matched, and cost nothing."""
+        description = "Toyota Camry Petrol"
+
+        result, edit_cost = vehicle_attributes.find_matching_attributes_fuzzy(description)
+
+        assert result == vehicle_attributes.find_matching_attributes(description)
+        assert edit_cost == 0
+
+
+def test_reload_keeps_vocabulary_on_errors(tmp_path):
+    """Test that a failed reload raises and leaves the previous vocabulary in use."""
+    yaml_file = tmp_path / "aliases.yaml"
+    yaml_file.write_text("make:\n  - name: Volkswagen\n    aliases: [VW]\n")
+    vehicle_attributes = VehicleAttributes(DatabaseClient(), str(yaml_file))
+    term_matcher = vehicle_attributes.term_matcher
+
+    yaml_file.write_text("make:\n  - aliases: [VW]\n")
+    with pytest.raises(ValueError):
+        vehicle_attributes.reload(db_values=False)
+
+    assert vehicle_attributes.term_matcher is term_matcher
+    assert vehicle_attributes.find_matching_attributes("VW Golf")['make'] == ['Volkswagen']
@@ -0,0 +1,118 @@
+"""
+Tests for the VehicleCatalogue in-memory snapshot.
+"""
+
+import pytest
+from unittest.mock import MagicMock
+from vehicle import Vehicle
+from vehicle_catalogue import VehicleCatalogue
+
+
+def make_vehicle(id: str, make: str, model: str, badge: str = "Base",
+                 transmission_type: str = "Automatic", fuel_type: str = "Petrol",
+                 drive_type: str = "Front Wheel Drive", listing_count: int = 0) -> Vehicle:
+    return Vehicle(id=id, make=make, model=model, badge=badge,
+                   transmission_type=transmission_type, fuel_type=fuel_type,
+                   drive_type=drive_type, listing_count=listing_count)
+
+
+class TestVehicleCatalogue:
+    """Test cases for VehicleCatalogue class."""
+
+    @pytest.fixture
+    def catalogue(self):
+        """Fixture providing a small catalogue."""
+        return VehicleCatalogue([
+            make_vehicle("1", "Toyota", "Camry", fuel_type="Hybrid-Petrol", listing_count=3),
+            make_vehicle("2", "Toyota", "Camry", listing_count=5),
+            make_vehicle("3", "Toyota", "86", transmission_type="Manual",
+                         drive_type="Rear Wheel Drive"),
+            make_vehicle("4", "Volkswagen", "Golf", transmission_type="Manual"),
+        ])
+
+    def test_find_vehicles_intersects_attribute_types(self, catalogue):
+        """Test that every matched attribute type must match."""
+        result = catalogue.find_vehicles({'make': ['Toyota'], 'transmission_type': ['Manual']})
+
+        assert [vehicle.id for vehicle in result] == ["3"]
+
+    def test_find_vehicles_unions_values_of_one_type(self, catalogue):
+        """Test that any of several values for one attribute type matches."""
+        result = catalogue.find_vehicles({'model': ['Camry', 'Golf']})
+
+        assert [vehicle.id for vehicle in result] == ["1", "2", "4"]
+
+    def test_find_vehicles_no_match(self, catalogue):
+        """Test that an unknown value returns no vehicles."""
+        assert catalogue.find_vehicles({'make': ['Toyota'], 'model': ['Golf']}) == []
+        assert catalogue.find_vehicles({'make': ['Ford']}) == []
+
+    def test_find_vehicles_keeps_listing_counts(self, catalogue):
+        """Test that listing counts are carried on the returned vehicles."""
+        result = catalogue.find_vehicles({'model': ['Camry']})
+
+        assert [vehicle.listing_count for vehicle in result] == [3, 5]
+
+    def test_find_vehicles_unknown_attribute_type(self, catalogue):
+        """Test that an attribute type without an index is rejected."""
+        with pytest.raises(ValueError, match="badge"):
+            catalogue.find_vehicles({'badge': ['Base']})
+
+    def test_find_positions_in_catalogue_order(self, catalogue):
+        """Test that positions are ascending and any value of the smallest type matches."""
+        assert catalogue.find_positions({'model': ['Golf', 'Camry'], 'make': ['Toyota', 'Volkswagen']}) == [0, 1, 3]
+        assert catalogue.find_positions({'fuel_type': ['Petrol'], 'model': ['Camry']}) == [1]
+        assert catalogue.find_positions({}) == []
+
+    def test_vehicle_materialises_stored_columns(self, catalogue):
+        """Test that a position is turned back into an equal Vehicle."""
+        vehicle = catalogue.vehicle(2)
+
+        assert vehicle == make_vehicle("3", "Toyota", "86")
+        assert (vehicle.transmission_type, vehicle.drive_type) == ("Manual", "Rear Wheel Drive")
+
+    def test_attribute_values_are_dictionary_encoded(self, catalogue):
+        """Test that each distinct value is stored once and vehicles hold codes."""
+        assert catalogue.values['make'] == ["Toyota", "Volkswagen"]
+        assert list(catalogue.codes['make']) == [0, 0, 0, 1]
+        assert [list(positions) for positions in catalogue.postings['model']] == [[0, 1], [2], [3]]
+
+    def test_descriptions_are_normalised_once(self, catalogue):
+        """Test that the scored descriptions are precomputed at load."""
+        assert catalogue.descriptions[3] == "volkswagen golf base manual petrol front wheel drive"
+
+    def test_with_changes_adds_replaces_and_removes(self, catalogue):
+        """Test that a changed copy is built while the original is left intact."""
+        updated = catalogue.with_changes(
+            [make_vehicle("2", "Toyota", "Camry", transmission_type="Manual", listing_count=6),
+             make_vehicle("5", "Ford", "Ranger", transmission_type="Manual")],
+            removed_ids=["3"],
+        )
+
+        assert len(updated) == 4
+        assert [v.id for v in updated.find_vehicles({'transmission_type': ['Manual']})] == ["4", "2", "5"]
+        assert [v.id for v in updated.find_vehicles({'model': ['Camry']})] == ["1", "2"]
+        assert updated.find_vehicles({'model': ['Camry']})[1].listing_count == 6
+        assert updated.find_vehicles({'model': ['86']}) == []
+        # Positions of the original still refer to the same vehicles
+        assert updated.vehicle(1) == catalogue.vehicle(1)
+        assert updated.vehicle(1).listing_count == 5
+        assert len(catalogue) == 4
+        assert [v.id for v in catalogue.find_vehicles({'transmission_type': ['Manual']})] == ["3", "4"]
+        assert catalogue.find_vehicles({'make': ['Ford']}) == []
+
+    def test_load_queries_database_once(self):
+        """Test that loading runs a single query and converts every row."""
+        db_client = MagicMock()
+        db_client.query.return_value = [{
+            'id': "1", 'make': "Toyota", 'model': "Camry", 'badge': "SL",
+            'transmission_type': "Automatic", 'fuel_type': "Petrol",
+            'drive_type': "Front Wheel Drive", 'listing_count': 2,
+        }]
+
+        catalogue = VehicleCatalogue.load(db_client)
+
+        db_client.query.assert_called_once()
+        assert len(catalogue) == 1
+        assert catalogue.find_vehicles({'make': ['Toyota']})[0].badge == "SL"
+        assert catalogue.listing_counts[0] == 2
@@ -4,6 +4,7 @@ Integration tests for the VehicleMatcher class.
 
 import pytest
 from db_client import DatabaseClient
+from match_metrics import MatchMetrics
 from vehicle_matcher import VehicleMatcher
 from vehicle import Vehicle
 
@@ -49,3 +50,149 @@ def test_find_matching_vehicles_with_vw_golf_comfortline(vehicle_matcher: Vehicl
     assert match.drive_type == "Front Wheel Drive"
     assert match.badge == "110TSI Comfortline"
     assert score == 9
+
+def test_catalogue_snapshot_matches_database_queries(db_client: DatabaseClient, vehicle_matcher: VehicleMatcher):
+    catalogue_matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", use_catalogue=True)
+
+    with open("inputs.txt", encoding="utf-8") as file:
+        descriptions = [line.strip() for line in file if line.strip()]
+
+    for description in descriptions:
+        assert catalogue_matcher.find_best_matching_vehicle(description) == \
+            vehicle_matcher.find_best_matching_vehicle(description)
+
+def test_find_best_matching_vehicles_matches_single_lookups(vehicle_matcher: VehicleMatcher):
+    with open("inputs.txt", encoding="utf-8") as file:
+        descriptions = [line.strip() for line in file if line.strip()]
+    descriptions += ["Ford Ranger", "Toyota Camry Hybrid"]
+
+    results = vehicle_matcher.find_best_matching_vehicles(descriptions)
+
+    assert len(results) == len(descriptions)
+    for description, (match, score) in zip(descriptions, results):
+        assert (match, score) == vehicle_matcher.find_best_matching_vehicle(description)
+
+def test_find_best_matching_vehicles_uses_one_query(db_client: DatabaseClient, vehicle_matcher: VehicleMatcher, monkeypatch):
+    queries = []
+    original_execute = db_client.execute_prepared
+    monkeypatch.setattr(db_client, "execute_prepared",
+                        lambda *args: queries.append(args) or original_execute(*args))
+
+    results = vehicle_matcher.find_best_matching_vehicles(
+        ["Toyota Camry Hybrid", "VW Amarok Ultimate", "toyota camry hybrid", "Ford Ranger"]
+    )
+
+    assert len(queries) == 1
+    assert results[0] == results[2]
+    assert results[1][0].model == "Amarok"
+    assert results[3] == (None, 0)
+
+def test_single_lookups_share_one_prepared_statement():
+    with DatabaseClient(max_connections=1) as db_client:
+        matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", listing_count_max_age=None)
+        for description in ["Toyota Camry Hybrid", "VW Amarok Ultimate", "Golf GTI", "Toyota 86 GTS manual"]:
+            matcher.find_best_matching_vehicle(description)
+
+        prepared = db_client.query("SELECT name FROM pg_prepared_statements")
+
+    assert [row['name'] for row in prepared] == ["vehicle_candidates_live"]
+
+def test_match_descriptions_reports_candidates(vehicle_matcher: VehicleMatcher):
+    matched, unmatched = vehicle_matcher.match_descriptions(["Toyota Camry Hybrid", "Ford Ranger"])
+
+    assert matched.vehicle.model == "Camry"
+    assert matched.confidence == 6
+    assert matched.candidate_count > 1
+    assert matched.matched_attributes['model'] == ["Camry"]
+    assert unmatched.vehicle is None
+    assert unmatched.candidate_count == 0
+
+def test_cached_matcher_reuses_results(db_client: DatabaseClient, monkeypatch):
+    matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", cache_size=100)
+    first = matcher.find_best_matching_vehicle("Toyota Camry Hybrid")
+    monkeypatch.setattr(db_client, "query", lambda *args: pytest.fail("cache miss"))
+    monkeypatch.setattr(db_client, "execute_prepared", lambda *args: pytest.fail("cache miss"))
+
+    assert matcher.find_best_matching_vehicle("toyota  camry hybrid") == first
+    assert matcher.find_best_matching_vehicles(["TOYOTA CAMRY HYBRID"]) == [first]
+    assert matcher.cache.stats.hits == 2
+    assert matcher.cache.stats.misses == 1
+
+@pytest.mark.parametrize("first, second", [
+    ("Toyota 86 GT M T", "Toyota 86 GT M/T"),
+    ("Toyota Kluger A T", "Toyota Kluger A/T"),
+    ("Toyota Camry Hybrid Front  Wheel Drive", "toyota camry hybrid front wheel drive"),
+])
+def test_cached_results_do_not_depend_on_order(db_client: DatabaseClient, vehicle_matcher: VehicleMatcher,
+                                               first: str, second: str):
+    """Test that descriptions matched alike share a cache entry and others do not."""
+    matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", cache_size=100)
+
+    assert matcher.find_best_matching_vehicle(first) == vehicle_matcher.find_best_matching_vehicle(first)
+    assert matcher.find_best_matching_vehicle(second) == vehicle_matcher.find_best_matching_vehicle(second)
+    assert matcher.match_descriptions([second])[0].vehicle == vehicle_matcher.find_best_matching_vehicle(second)[0]
+
+def test_reload_invalidates_cache(db_client: DatabaseClient):
+    matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", cache_size=100)
+    matcher.find_best_matching_vehicles(["Toyota Camry Hybrid", "Golf GTI"])
+
+    matcher.reload()
+
+    assert len(matcher.cache) == 0
+    assert matcher.find_best_matching_vehicle("Golf GTI")[0].model == "Golf"
+
+def test_metrics_record_stages_rows_and_cache(db_client: DatabaseClient):
+    metrics = MatchMetrics()
+    matcher = VehicleMatcher(db_client, yaml_file="vehicle_aliases.yaml", cache_size=100,
+                             metrics=metrics)
+
+    matcher.find_best_matching_vehicle("Toyota Camry Hybrid")
+    matcher.find_best_matching_vehicles(["toyota camry hybrid", "Golf GTI", "nothing to see"])
+
+    assert {"attributes", "query", "convert", "scoring", "match"} <= set(metrics.durations)
+    assert metrics.counters["matches"] == 4
+    assert metrics.counters["cache_hits"] == 1
+    assert metrics.counters["cache_misses"] == 3
+    assert metrics.counters["queries"] == 2
+    assert metrics.counters["unmatched_descriptions"] == 1
+    assert metrics.sizes["candidates"].count == 2
+    assert metrics.sizes["rows_fetched"].sum == metrics.sizes["candidates"].sum
+
+
+def test_fuzzy_terms_match_misspelled_attributes(db_client: DatabaseClient):
+    """Test that a misspelled model narrows the candidates and lowers the confidence."""
+    fuzzy_matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True, fuzzy_terms=True)
+    exact_matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=True)
+    description = "VW Amrok TDI550 Highline"
+
+    [fuzzy] = fuzzy_matcher.match_descriptions([description])
+    [exact] = exact_matcher.match_descriptions([description])
+
+    assert fuzzy.matched_attributes == {'make': ['Volkswagen'], 'model': ['Amarok']}
+    assert fuzzy.candidate_count < exact.candidate_count
+    assert fuzzy.vehicle.badge == "TDI550 Highline"
+    assert fuzzy.confidence == exact_matcher.attribute_match_confidence_score(fuzzy.matched_attributes) - 1
+    assert fuzzy_matcher.find_best_matching_vehicle(description) == (fuzzy.vehicle, fuzzy.confidence)
+
+
+@pytest.mark.parametrize("use_catalogue", [True, False])
+def test_find_top_matches_ranks_alternatives(db_client: DatabaseClient, use_catalogue: bool):
+    """Test that the top matches start with the best match and are ranked by score, then listings."""
+    matcher = VehicleMatcher(db_client, "vehicle_aliases.yaml", use_catalogue=use_catalogue)
+    best, confidence = matcher.find_best_matching_vehicle("VW Golf Automatic")
+
+    matches = matcher.find_top_matches("VW Golf Automatic", k=3)
+
+    assert len(matches) == 3
+    assert matches[0].vehicle == best
+    assert {match.confidence for match in matches} == {confidence}
+    assert all(match.vehicle.model == "Golf" for match in matches)
+    ranks = [(match.score, match.listing_count) for match in matches]
+    assert ranks == sorted(ranks, reverse=True)
+
+
+def test_find_top_matches_unmatched(vehicle_matcher: VehicleMatcher):
+    """Test that descriptions matching nothing have no top matches, and k is validated."""
+    assert vehicle_matcher.find_top_matches("Ford Ranger") == []
+    with pytest.raises(ValueError):
+        vehicle_matcher.find_top_matches("Golf GTI", k=0)
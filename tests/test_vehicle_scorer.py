@@ -0,0 +1,115 @@
+"""
+Tests for the VehicleScorer batched fuzzy scoring.
+"""
+
+from unittest.mock import MagicMock
+import pytest
+from thefuzz import fuzz
+import vehicle_scorer
+from vehicle import Vehicle
+from vehicle_scorer import VehicleScorer
+
+
+def make_vehicle(id: str, badge: str, listing_count: int = 0, model: str = "Golf") -> Vehicle:
+    return Vehicle(id=id, make="Volkswagen", model=model, badge=badge,
+                   transmission_type="Automatic", fuel_type="Petrol",
+                   drive_type="Front Wheel Drive", listing_count=listing_count)
+
+
+class TestVehicleScorer:
+    """Test cases for VehicleScorer class."""
+
+    @pytest.fixture
+    def vehicles(self):
+        """Fixture providing Golf variants."""
+        return [
+            make_vehicle("1", "110TSI Comfortline", listing_count=4),
+            make_vehicle("2", "GTI", listing_count=2),
+            make_vehicle("3", "GTI", listing_count=9),
+            make_vehicle("4", "R", listing_count=9),
+            make_vehicle("5", "Alltrack 132TSI Premium"),
+        ]
+
+    @pytest.mark.parametrize("description", [
+        "Golf GTI",
+        "VW Golf R with engine swap from Toyota 86 GT",
+        "Volkswagen Golf 110TSI Comfortline Petrol Automatic Front Wheel Drive",
+        "golf   gti!!",
+        "Gölf Älltrack",
+        "",
+    ])
+    def test_scores_match_thefuzz(self, vehicles, description):
+        """Test that batched scores equal per-vehicle thefuzz token_set_ratio scores."""
+        scorer = VehicleScorer()
+
+        expected = [fuzz.token_set_ratio(description, vehicle.get_description())
+                    for vehicle in vehicles]
+        assert scorer.score(description, vehicles) == expected
+
+    def test_best_vehicle_breaks_ties_on_listing_count(self, vehicles):
+        """Test that the most listed of the top scoring vehicles wins."""
+        vehicle, score = VehicleScorer().best_vehicle("Golf GTI", vehicles)
+
+        assert vehicle.id == "3"
+        assert score == 100
+
+    def test_best_vehicle_keeps_first_of_full_ties(self):
+        """Test that the earliest vehicle wins a tie on score and listing count."""
+        vehicles = [make_vehicle("1", "GTI", 5), make_vehicle("2", "GTI", 5)]
+
+        vehicle, _ = VehicleScorer().best_vehicle("Golf GTI", vehicles)
+
+        assert vehicle.id == "1"
+
+    def test_best_vehicle_requires_candidates(self):
+        """Test that picking from no vehicles is rejected."""
+        with pytest.raises(ValueError):
+            VehicleScorer().best_vehicle("Golf GTI", [])
+
+    def test_prepared_descriptions_are_cached(self, vehicles, monkeypatch):
+        """Test that prepared descriptions are reused until cleared."""
+        scorer = VehicleScorer(vehicles)
+        monkeypatch.setattr(vehicle_scorer, "preprocess", MagicMock(side_effect=AssertionError))
+
+        assert scorer.vehicle_description(vehicles[1]) == "volkswagen golf gti automatic petrol front wheel drive"
+        scorer.clear()
+        with pytest.raises(AssertionError):
+            scorer.vehicle_description(vehicles[1])
+
+    def test_changed_vehicles_get_new_descriptions(self, vehicles):
+        """Test that a vehicle whose attributes changed is not described as before."""
+        scorer = VehicleScorer(vehicles)
+        vehicles[1].badge = "GTI Performance"
+
+        assert "performance" in scorer.vehicle_description(vehicles[1])
+
+    def test_best_choice_on_normalised_descriptions(self, vehicles):
+        """Test picking among precomputed descriptions with listing count tie-breaks."""
+        scorer = VehicleScorer()
+        choices = [scorer.vehicle_description(vehicle) for vehicle in vehicles]
+
+        index, score = scorer.best_choice("Golf GTI", choices, [v.listing_count for v in vehicles])
+
+        assert (index, score) == (2, 100)
+        with pytest.raises(ValueError):
+            scorer.best_choice("Golf GTI", [], [])
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 64])
+    @pytest.mark.parametrize("description", ["Golf GTI", "Golf 132TSI Alltrack", "Tiguan", ""])
+    def test_top_choices_match_full_ranking(self, vehicles, description, chunk_size):
+        """Test that pruned top-k ranking equals sorting every score."""
+        scorer = VehicleScorer()
+        choices = [scorer.vehicle_description(vehicle) for vehicle in vehicles]
+        listing_counts = [vehicle.listing_count for vehicle in vehicles]
+        scores = scorer.score_choices(description, choices)
+        ranked = sorted(range(len(choices)), key=lambda i: (-scores[i], -listing_counts[i], i))
+
+        top = scorer.top_choices(description, choices, listing_counts, 3, chunk_size=chunk_size)
+
+        assert top == [(index, scores[index]) for index in ranked[:3]]
+        assert top[0] == scorer.best_choice(description, choices, listing_counts)
+
+    def test_top_choices_rejects_invalid_k(self, vehicles):
+        """Test that asking for fewer than one choice is rejected."""
+        with pytest.raises(ValueError):
+            VehicleScorer().top_choices("Golf GTI", ["volkswagen golf gti"], [0], 0)